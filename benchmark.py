@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Benchmark
+Mengukur throughput dan latensi chat/file lewat transport lokal (TCP/Unix)
+Author: Terminal Chat Bluetooth
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from delta import SIGNATURE
+from renderer import get_renderer
+from session import ChatSession
+from transport import get_transport
+from wire import (WIRE_BINARY, WIRE_JSON, WIRE_NAMES, decode_binary, decode_json, encode_binary,
+                  encode_json, timestamp_now)
+
+DEFAULT_FILE_SIZES = "1K,64K,1M,16M,64M"
+DEFAULT_THRESHOLD = 0.15
+WAIT_TIMEOUT = 600
+# Batas waktu menunggu ack terakhir setelah semua pesan diterima
+ACK_TIMEOUT = 5
+# Jumlah encode/decode per pesan contoh di skenario codec
+CODEC_ITERATIONS = 20000
+
+
+def parse_size(text):
+    """'64K' -> 65536, '1G' -> 1073741824"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit, factor in (('G', 1024 ** 3), ('M', 1024 ** 2), ('K', 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """RSS puncak proses ini dalam MB, None jika tidak tersedia"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KB, macOS melaporkan byte
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 2)
+
+
+class BenchSession(ChatSession):
+    """ChatSession yang mencatat waktu penerimaan pesan dan file"""
+
+    def __init__(self, **options):
+        super().__init__(engine='thread', **options)
+        self.hello = threading.Event()
+        self.file_done = threading.Event()
+        self.done = threading.Event()
+        self.expected = 0
+        self.latencies = []
+        self.last_received = None
+
+    def handle_message(self, message):
+        msg_type = message.get('type')
+        if msg_type == 'text':
+            # Nomor urut diproses seperti sesi biasa agar ack mengosongkan buffer kirim ulang pengirim
+            if 'seq' in message and not self.accept_sequenced(message['seq']):
+                return False
+            now = time.perf_counter()
+            _, sent_at = message['content'].split(' ', 1)
+            self.latencies.append(now - float(sent_at))
+            self.last_received = now
+            if len(self.latencies) >= self.expected:
+                self.done.set()
+            return True
+
+        accepted = super().handle_message(message)
+        if msg_type == 'hello':
+            self.hello.set()
+        return accepted
+
+    def receive_file(self, message):
+        super().receive_file(message)
+        self.file_done.set()
+
+
+class Link:
+    """Server dan client ChatSession yang terhubung lewat transport lokal"""
+
+    def __init__(self, transport_name, options, downloads_dir):
+        self.transport = get_transport(transport_name)
+        self.options = options
+        self.downloads_dir = downloads_dir
+        if transport_name == 'unix':
+            self.address = os.path.join(downloads_dir, "bench.sock")
+            self.port = None
+        else:
+            self.address = None
+            self.port = 0
+        self.listener = self.transport.listen(self.port, 1, self.address)
+        if transport_name == 'tcp':
+            self.port = self.listener.getsockname()[1]
+        self.server = None
+        self.client = None
+
+    def connect(self):
+        """Membuka koneksi dan menunggu hello dari kedua sisi, return detik"""
+        started = time.perf_counter()
+        client_sock = self.transport.connect(self.address, self.port)
+        server_sock, _ = self.listener.accept()
+        self.transport.configure(server_sock)
+
+        self.server = self._start(server_sock)
+        self.client = self._start(client_sock)
+        if not (self.server.hello.wait(WAIT_TIMEOUT) and self.client.hello.wait(WAIT_TIMEOUT)):
+            raise TimeoutError("Hello tidak diterima")
+        return time.perf_counter() - started
+
+    def _start(self, sock):
+        session = BenchSession(**self.options)
+        session.attach(sock)
+        session.writer = session.make_socket_writer()
+        session.downloads_dir = self.downloads_dir
+        session.running = True
+        threading.Thread(target=session.receive_messages, daemon=True).start()
+        session.send_hello()
+        return session
+
+    def disconnect(self):
+        for session in (self.client, self.server):
+            if session is not None:
+                session.running = False
+                session.socket.close()
+        self.client = self.server = None
+
+    def close(self):
+        self.disconnect()
+        self.listener.close()
+        self.transport.cleanup()
+
+
+class LineStream:
+    """Pengganti stdin pipe untuk mode --bulk: baris dibuat saat dibaca"""
+
+    def __init__(self, count):
+        self.count = count
+        self.next = 0
+
+    def read1(self, size):
+        lines = []
+        total = 0
+        while self.next < self.count and total < size:
+            line = f"{self.next} {time.perf_counter()!r}\n".encode()
+            lines.append(line)
+            total += len(line)
+            self.next += 1
+        return b''.join(lines)
+
+
+def bench_text(link, count, bulk=False):
+    """Pesan teks kecil: pesan/detik dan latensi p50/p95/p99"""
+    link.connect()
+    receiver = link.server
+    receiver.expected = count
+
+    started = time.perf_counter()
+    if bulk:
+        link.client.send_bulk(LineStream(count))
+    else:
+        for i in range(count):
+            link.client.send_text_message(f"{i} {time.perf_counter()!r}")
+    if not receiver.done.wait(WAIT_TIMEOUT):
+        raise TimeoutError("Pesan tidak diterima semua")
+    elapsed = receiver.last_received - started
+
+    # Ack terakhir biasanya dikirim oleh timer sesi; benchmark tidak menjalankan timer
+    receiver.ack_tick()
+    deadline = time.monotonic() + ACK_TIMEOUT
+    while link.client.delivery.pending() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    latencies = receiver.latencies
+    return {
+        'messages': count,
+        'unacked': len(link.client.delivery.pending()),
+        'messages_per_sec': round(count / elapsed, 1),
+        'latency_p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'latency_p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'latency_p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def bench_file(link, size, workdir):
+    """Transfer satu file: MB/s, waktu CPU per MB dan RSS puncak"""
+    source = os.path.join(workdir, f"bench-{size}.bin")
+    with open(source, 'wb') as f:
+        remaining = size
+        while remaining:
+            block = min(remaining, 1024 * 1024)
+            f.write(os.urandom(block))
+            remaining -= block
+
+    link.connect()
+    rss_before = peak_rss_mb()
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    link.client.send_file(source)
+    if not link.server.file_done.wait(WAIT_TIMEOUT):
+        raise TimeoutError("File tidak diterima")
+    elapsed = time.perf_counter() - started
+    # Waktu CPU pengirim + penerima (keduanya di proses ini) per MB
+    cpu = time.process_time() - cpu_started
+
+    os.remove(source)
+    return {
+        'bytes': size,
+        'mb_per_sec': round(size / elapsed / (1024 * 1024), 2),
+        'cpu_per_mb_ms': round(cpu * 1000 / (size / (1024 * 1024)), 3),
+        'peak_rss_mb': peak_rss_mb(),
+        'rss_before_mb': rss_before,
+    }
+
+
+def bench_connect(link, count):
+    """Waktu membuka koneksi sampai hello dari kedua sisi diterima"""
+    samples = []
+    for _ in range(count):
+        samples.append(link.connect())
+        link.disconnect()
+    return {
+        'connections': count,
+        'connect_p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+        'connect_p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+    }
+
+
+def codec_samples():
+    """Pesan contoh untuk skenario codec: chat, kontrol, tawaran file dan signature delta"""
+    return {
+        'text': {'type': 'text', 'content': "halo, file-nya sudah sampai?",
+                 'timestamp': timestamp_now(), 'seq': 1234},
+        'ack': {'type': 'ack', 'seq': 1234},
+        'file_offer': {'type': 'file_offer', 'transfer_id': 7, 'filename': "foto/liburan-01.jpg",
+                       'size': 3456789, 'sha256': "ab" * 32, 'chunk_size': 65536,
+                       'timestamp': timestamp_now(), 'dir_id': 3},
+        # 256 blok: signature file lama ~64 MB
+        'file_delta': {'type': 'file_delta', 'transfer_id': 7, 'block_size': 8192,
+                       'signatures': os.urandom(SIGNATURE.size * 256)},
+    }
+
+
+def bench_codec(iterations=CODEC_ITERATIONS):
+    """Biaya encode/decode per pesan (mikrodetik) dan byte payload untuk JSON dan biner"""
+    codecs = {WIRE_JSON: (encode_json, decode_json), WIRE_BINARY: (encode_binary, decode_binary)}
+    names = {wire: name for name, wire in WIRE_NAMES.items()}
+    result = {}
+    for sample, message in codec_samples().items():
+        for wire, (encode, decode) in codecs.items():
+            started = time.perf_counter()
+            for _ in range(iterations):
+                payload = encode(message)
+            encoded = time.perf_counter() - started
+            started = time.perf_counter()
+            for _ in range(iterations):
+                decode(payload)
+            decoded = time.perf_counter() - started
+            prefix = f"{sample}_{names[wire]}"
+            result[f"{prefix}_encode_us"] = round(encoded / iterations * 1e6, 3)
+            result[f"{prefix}_decode_us"] = round(decoded / iterations * 1e6, 3)
+            result[f"{prefix}_bytes"] = len(payload)
+    return result
+
+
+def run_scenario(args):
+    """Menjalankan satu skenario di proses ini dan mencetak hasilnya sebagai JSON"""
+    output = sys.stdout
+    workdir = tempfile.mkdtemp(prefix="bluetooth-chat-bench-")
+    if args.scenario == 'codec':
+        # Tanpa koneksi: hanya biaya codec pesan di proses ini
+        json.dump(bench_codec(), sys.stdout)
+        return
+    options = {'compression': args.compress, 'batch_delay': args.batch_delay / 1000,
+               'wire': WIRE_NAMES[args.wire]}
+    try:
+        with open(os.devnull, 'w') as devnull:
+            # Output chat tidak diukur; terminal yang lambat akan merusak angka
+            sys.stdout = devnull
+            # Renderer menulis dari thread sendiri, bisa setelah stdout dikembalikan
+            get_renderer().stream = devnull
+            # Penerima menyimpan ke folder sendiri agar file sumber tidak dianggap versi lama
+            downloads_dir = os.path.join(workdir, "downloads")
+            os.makedirs(downloads_dir)
+            link = Link(args.transport, options, downloads_dir)
+            try:
+                if args.scenario == 'text':
+                    result = bench_text(link, args.messages)
+                elif args.scenario == 'text_bulk':
+                    result = bench_text(link, args.messages, bulk=True)
+                elif args.scenario == 'connect':
+                    result = bench_connect(link, args.connects)
+                else:
+                    result = bench_file(link, parse_size(args.scenario[len('file_'):]), workdir)
+            finally:
+                link.close()
+                sys.stdout = output
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    json.dump(result, output)
+
+
+def scenarios(args):
+    names = ['codec', 'connect', 'text', 'text_bulk']
+    for size in args.file_sizes.split(','):
+        if size.strip():
+            names.append(f"file_{format_size(parse_size(size))}")
+    return names
+
+
+def run_all(args):
+    """Menjalankan setiap skenario di proses terpisah agar RSS puncak terpisah"""
+    results = {}
+    for name in scenarios(args):
+        command = [sys.executable, os.path.abspath(__file__), '--scenario', name,
+                   '--transport', args.transport, '--compress', args.compress, '--wire', args.wire,
+                   '--messages', str(args.messages), '--connects', str(args.connects),
+                   '--batch-delay', str(args.batch_delay)]
+        print(f"▶ {name} ...", file=sys.stderr, flush=True)
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Skenario {name} gagal:\n{completed.stderr}")
+        results[name] = json.loads(completed.stdout)
+        print(f"  {results[name]}", file=sys.stderr, flush=True)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'transport': args.transport,
+            'compression': args.compress,
+            'wire': args.wire,
+            'batch_delay_ms': args.batch_delay,
+        },
+        'results': results,
+    }
+
+
+def higher_is_better(metric):
+    return metric.endswith('_per_sec')
+
+
+def compare(report, baseline, threshold):
+    """Daftar regresi yang lebih buruk dari baseline melebihi threshold"""
+    regressions = []
+    for scenario, metrics in report['results'].items():
+        base_metrics = baseline.get('results', {}).get(scenario, {})
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if not metric.endswith(('_per_sec', '_ms', '_us', '_rss_mb')) or not base or value is None:
+                continue
+            if higher_is_better(metric):
+                change = (base - value) / base
+            else:
+                change = (value - base) / base
+            if change > threshold:
+                regressions.append(f"{scenario}.{metric}: {base} -> {value} ({change:+.1%} lebih buruk)")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Bluetooth Chat lewat transport lokal")
+    parser.add_argument('--transport', choices=['unix', 'tcp'],
+                        default='unix' if hasattr(os, 'fork') else 'tcp',
+                        help="Transport pengganti Bluetooth")
+    parser.add_argument('--compress', default='none', help="Codec kompresi (default: none)")
+    parser.add_argument('--wire', choices=list(WIRE_NAMES), default='binary',
+                        help="Format pesan yang ditawarkan kedua sisi (default: binary)")
+    parser.add_argument('--messages', type=int, default=20000, help="Jumlah pesan teks")
+    parser.add_argument('--batch-delay', type=float, default=0,
+                        help="Tahan pesan keluar paling lama N milidetik untuk digabung (default: 0)")
+    parser.add_argument('--connects', type=int, default=50, help="Jumlah koneksi yang diukur")
+    parser.add_argument('--file-sizes', default=DEFAULT_FILE_SIZES,
+                        help=f"Ukuran file dipisah koma, mis. 1K,1M,1G (default: {DEFAULT_FILE_SIZES})")
+    parser.add_argument('--output', help="Simpan hasil sebagai JSON")
+    parser.add_argument('--baseline', help="Bandingkan dengan hasil JSON sebelumnya")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Toleransi regresi relatif (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.scenario:
+        run_scenario(args)
+        return 0
+
+    report = run_all(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print("❌ Regresi performa:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print("✅ Tidak ada regresi dibanding baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
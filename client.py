@@ -5,239 +5,170 @@ Aplikasi chat dan transfer file menggunakan koneksi Bluetooth
 Author: Terminal Chat Bluetooth
 """
 
-import bluetooth
-import threading
-import os
-import json
-import base64
-from datetime import datetime
+import argparse
+import sys
 from colorama import init, Fore, Back, Style
-import time
+
+from devices import DEFAULT_CACHE_PATH, DeviceCache, DeviceDiscovery
+from renderer import flush as flush_output
+from session import ChatSession, add_session_arguments, configure_output, session_options
+from transport import DEFAULT_TRANSPORT, add_transport_arguments, get_transport
 
 # Initialize colorama
 init()
 
-class BluetoothChatClient:
-    def __init__(self):
-        self.socket = None
-        self.running = False
-        
-    def discover_devices(self):
-        """Mencari perangkat Bluetooth yang tersedia"""
-        print(f"{Fore.YELLOW}🔍 Mencari perangkat Bluetooth...{Style.RESET_ALL}")
+class BluetoothChatClient(ChatSession):
+    peer_label = "Server"
+    role = 'client'
+    can_reconnect = True
+
+    def __init__(self, transport=DEFAULT_TRANSPORT, device_cache=None, discover=None, **options):
+        super().__init__(**options)
+        self.transport = get_transport(transport)
+        self.device_cache = device_cache or DeviceCache()
+        # Fungsi pencarian bisa diganti, misalnya dengan daftar perangkat palsu untuk pengujian
+        self.discovery = DeviceDiscovery(self.device_cache, discover or self.transport.discover_devices)
+        self.server_addr = None
+        self.server_port = None
         
-        try:
-            devices = bluetooth.discover_devices(duration=8, lookup_names=True)
-            
+    def select_device(self):
+        """Memilih perangkat Bluetooth: daftar dari cache langsung tampil,
+        pencarian perangkat berjalan di latar belakang"""
+        devices = self.device_cache.entries()
+        if self.device_cache.is_stale() or not devices:
+            self.discovery.start(self.report_discovery)
+
+        if not devices:
+            print(f"{Fore.YELLOW}🔍 Mencari perangkat Bluetooth...{Style.RESET_ALL}")
+            devices = self.wait_discovery()
             if not devices:
                 print(f"{Fore.RED}❌ Tidak ada perangkat Bluetooth ditemukan{Style.RESET_ALL}")
                 return None
-            
-            print(f"{Fore.GREEN}📱 Perangkat ditemukan:{Style.RESET_ALL}")
-            for i, (addr, name) in enumerate(devices):
-                print(f"{Fore.CYAN}  {i+1}. {name} ({addr}){Style.RESET_ALL}")
-            
-            while True:
-                try:
-                    choice = input(f"\n{Fore.YELLOW}Pilih perangkat (1-{len(devices)}) atau 'q' untuk keluar: {Style.RESET_ALL}")
-                    
-                    if choice.lower() == 'q':
-                        return None
-                    
-                    index = int(choice) - 1
-                    if 0 <= index < len(devices):
-                        return devices[index][0]  # Return MAC address
-                    else:
-                        print(f"{Fore.RED}❌ Pilihan tidak valid{Style.RESET_ALL}")
-                        
-                except ValueError:
-                    print(f"{Fore.RED}❌ Masukkan angka yang valid{Style.RESET_ALL}")
-                    
-        except Exception as e:
-            print(f"{Fore.RED}❌ Error mencari perangkat: {e}{Style.RESET_ALL}")
-            return None
-    
-    def connect_to_server(self, server_addr, port=3):
-        """Menghubungkan ke server Bluetooth"""
-        try:
-            self.socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-            print(f"{Fore.YELLOW}🔗 Menghubungkan ke {server_addr}...{Style.RESET_ALL}")
-            
-            self.socket.connect((server_addr, port))
-            print(f"{Fore.GREEN}✅ Terhubung ke server!{Style.RESET_ALL}")
-            
-            self.running = True
-            
-            # Start receiving thread
-            receive_thread = threading.Thread(target=self.receive_messages)
-            receive_thread.daemon = True
-            receive_thread.start()
-            
-            # Start sending thread
-            self.send_messages()
-            
-        except Exception as e:
-            print(f"{Fore.RED}❌ Error menghubungkan ke server: {e}{Style.RESET_ALL}")
-        finally:
-            self.cleanup()
-    
-    def receive_messages(self):
-        """Menerima pesan dari server"""
-        while self.running:
-            try:
-                data = self.socket.recv(4096).decode('utf-8')
-                if not data:
-                    break
-                
-                message = json.loads(data)
-                self.handle_message(message)
-                
-            except Exception as e:
-                if self.running:
-                    print(f"{Fore.RED}❌ Error menerima pesan: {e}{Style.RESET_ALL}")
-                break
-    
-    def handle_message(self, message):
-        """Menangani pesan yang diterima"""
-        msg_type = message.get('type')
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        
-        if msg_type == 'text':
-            print(f"{Fore.CYAN}[{timestamp}] Server: {message['content']}{Style.RESET_ALL}")
-        
-        elif msg_type == 'file':
-            self.receive_file(message)
-        
-        elif msg_type == 'disconnect':
-            print(f"{Fore.YELLOW}Server telah terputus{Style.RESET_ALL}")
-            self.running = False
-    
-    def receive_file(self, message):
-        """Menerima file dari server"""
-        try:
-            filename = message['filename']
-            file_data = base64.b64decode(message['data'])
-            
-            # Create downloads directory if not exists
-            downloads_dir = "downloads"
-            if not os.path.exists(downloads_dir):
-                os.makedirs(downloads_dir)
-            
-            file_path = os.path.join(downloads_dir, filename)
-            
-            with open(file_path, 'wb') as f:
-                f.write(file_data)
-            
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"{Fore.GREEN}[{timestamp}] 📁 File diterima: {filename} ({len(file_data)} bytes){Style.RESET_ALL}")
-            print(f"{Fore.GREEN}   Disimpan di: {file_path}{Style.RESET_ALL}")
-            
-        except Exception as e:
-            print(f"{Fore.RED}❌ Error menerima file: {e}{Style.RESET_ALL}")
-    
-    def send_messages(self):
-        """Mengirim pesan ke server"""
-        print(f"{Fore.GREEN}✅ Terhubung! Ketik pesan atau gunakan perintah:{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}  /file <path> - Kirim file{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}  /quit - Keluar{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}  Atau ketik pesan biasa untuk chat{Style.RESET_ALL}")
-        print("-" * 50)
-        
-        while self.running:
+        elif self.discovery.running:
+            print(f"{Fore.YELLOW}🔍 Memperbarui daftar perangkat di latar belakang...{Style.RESET_ALL}")
+
+        self.print_devices(devices)
+        while True:
             try:
-                user_input = input()
+                choice = input(f"\n{Fore.YELLOW}Pilih perangkat (1-{len(devices)}), 'r' untuk mencari ulang, "
+                               f"atau 'q' untuk keluar: {Style.RESET_ALL}").strip()
                 
-                if user_input.lower() == '/quit':
-                    self.send_disconnect()
-                    break
+                if choice.lower() == 'q':
+                    return None
                 
-                elif user_input.startswith('/file '):
-                    file_path = user_input[6:].strip()
-                    self.send_file(file_path)
+                if choice.lower() == 'r':
+                    if not self.discovery.running:
+                        self.discovery.start()
+                    print(f"{Fore.YELLOW}🔍 Mencari perangkat Bluetooth...{Style.RESET_ALL}")
+                    devices = self.wait_discovery() or devices
+                    self.print_devices(devices)
+                    continue
                 
+                index = int(choice) - 1
+                if 0 <= index < len(devices):
+                    return devices[index][0]  # Return MAC address
                 else:
-                    self.send_text_message(user_input)
+                    print(f"{Fore.RED}❌ Pilihan tidak valid{Style.RESET_ALL}")
                     
-            except KeyboardInterrupt:
-                self.send_disconnect()
-                break
-            except Exception as e:
-                print(f"{Fore.RED}❌ Error mengirim pesan: {e}{Style.RESET_ALL}")
+            except ValueError:
+                print(f"{Fore.RED}❌ Masukkan angka yang valid{Style.RESET_ALL}")
+
+    def wait_discovery(self):
+        """Menunggu pencarian yang berjalan, return daftar perangkat terbaru"""
+        # Daftar langsung ditampilkan, jadi petunjuk dari pencarian latar belakang tidak perlu
+        self.discovery.on_done = None
+        self.discovery.wait()
+        if self.discovery.error is not None:
+            print(f"{Fore.RED}❌ Error mencari perangkat: {self.discovery.error}{Style.RESET_ALL}")
+        return self.device_cache.entries()
+
+    def report_discovery(self, discovery):
+        """Dipanggil dari thread pencarian latar belakang"""
+        if discovery.new:
+            print(f"\n{Fore.GREEN}🔄 {len(discovery.new)} perangkat baru ditemukan, "
+                  f"ketik 'r' untuk menampilkan daftar terbaru{Style.RESET_ALL}")
+
+    def print_devices(self, devices):
+        print(f"{Fore.GREEN}📱 Perangkat:{Style.RESET_ALL}")
+        for i, (addr, name) in enumerate(devices):
+            print(f"{Fore.CYAN}  {i+1}. {name} ({addr}){Style.RESET_ALL}")
+
+    def resolve_name(self, name):
+        """Alamat perangkat bernama `name`: dari cache, atau lewat pencarian jika belum dikenal"""
+        addr = self.device_cache.find(name)
+        if addr is None:
+            print(f"{Fore.YELLOW}🔍 {name} belum dikenal, mencari perangkat Bluetooth...{Style.RESET_ALL}")
+            self.discovery.start()
+            self.wait_discovery()
+            addr = self.device_cache.find(name)
+        if addr is None:
+            print(f"{Fore.RED}❌ Perangkat tidak ditemukan: {name}{Style.RESET_ALL}")
+        return addr
     
-    def send_text_message(self, text):
-        """Mengirim pesan teks"""
+    def connect_to_server(self, server_addr, port=None):
+        """Menghubungkan ke server Bluetooth, return True jika sesi berjalan tanpa error"""
         try:
-            message = {
-                'type': 'text',
-                'content': text,
-                'timestamp': datetime.now().isoformat()
-            }
+            where = server_addr or self.transport.describe(server_addr, port)
+            print(f"{Fore.YELLOW}🔗 Menghubungkan ke {where}...{Style.RESET_ALL}")
             
-            data = json.dumps(message).encode('utf-8')
-            self.socket.send(data)
+            self.server_addr = server_addr
+            self.server_port = port
+            self.socket = self.transport.connect(server_addr, port)
+            print(f"{Fore.GREEN}✅ Terhubung ke server!{Style.RESET_ALL}")
+            if self.transport.name == 'rfcomm':
+                self.remember_device(server_addr)
+            self.notify_ready()
             
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"{Fore.MAGENTA}[{timestamp}] Anda: {text}{Style.RESET_ALL}")
+            self.start_session()
+            return True
             
         except Exception as e:
-            print(f"{Fore.RED}❌ Error mengirim pesan: {e}{Style.RESET_ALL}")
+            print(f"{Fore.RED}❌ Error menghubungkan ke server: {e}{Style.RESET_ALL}")
+            return False
+        finally:
+            self.cleanup()
     
-    def send_file(self, file_path):
-        """Mengirim file ke server"""
-        try:
-            if not os.path.exists(file_path):
-                print(f"{Fore.RED}❌ File tidak ditemukan: {file_path}{Style.RESET_ALL}")
-                return
-            
-            filename = os.path.basename(file_path)
-            
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-            
-            file_b64 = base64.b64encode(file_data).decode('utf-8')
-            
-            message = {
-                'type': 'file',
-                'filename': filename,
-                'data': file_b64,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            data = json.dumps(message).encode('utf-8')
-            self.socket.send(data)
-            
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"{Fore.GREEN}[{timestamp}] 📁 File terkirim: {filename} ({len(file_data)} bytes){Style.RESET_ALL}")
-            
-        except Exception as e:
-            print(f"{Fore.RED}❌ Error mengirim file: {e}{Style.RESET_ALL}")
+    def open_link(self):
+        """Reconnect ke server yang sama, tanpa pencarian perangkat ulang"""
+        return self.transport.connect(self.server_addr, self.server_port)
     
-    def send_disconnect(self):
-        """Mengirim pesan disconnect"""
+    def remember_device(self, addr):
+        """Perangkat yang berhasil dihubungi tampil paling atas di pilihan berikutnya"""
+        self.device_cache.connected(addr)
         try:
-            message = {
-                'type': 'disconnect',
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            data = json.dumps(message).encode('utf-8')
-            self.socket.send(data)
-            
-        except Exception as e:
-            pass
-        
-        self.running = False
+            self.device_cache.save()
+        except OSError as e:
+            print(f"{Fore.YELLOW}⚠️  Gagal menyimpan cache perangkat: {e}{Style.RESET_ALL}")
     
     def cleanup(self):
         """Membersihkan resource"""
         self.running = False
+        # Pesan yang masih di antrean riwayat ditulis sebelum proses keluar
+        if self.history is not None:
+            self.history.flush()
+        # Output sesi yang masih di antrean render ditulis sebelum pesan penutup
+        flush_output()
         
         if self.socket:
             self.socket.close()
         
         print(f"{Fore.YELLOW}🔴 Koneksi terputus{Style.RESET_ALL}")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bluetooth Chat Client")
+    add_transport_arguments(parser, "Alamat server (MAC Bluetooth, host TCP, atau path socket Unix)")
+    parser.add_argument('--name', default=None,
+                        help="Nama perangkat Bluetooth server; alamat diambil dari cache perangkat")
+    parser.add_argument('--device-cache', default=DEFAULT_CACHE_PATH,
+                        help=f"File cache perangkat Bluetooth (default: {DEFAULT_CACHE_PATH})")
+    add_session_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None, on_ready=None):
+    """Menjalankan client, return exit status (0 jika berhasil)"""
+    args = parse_args(argv)
+    configure_output(args)
+    
     print(f"{Fore.BLUE}╔══════════════════════════════════════════════════════╗{Style.RESET_ALL}")
     print(f"{Fore.BLUE}║              BLUETOOTH CHAT CLIENT                   ║{Style.RESET_ALL}")
     print(f"{Fore.BLUE}║            Chat & File Transfer via Bluetooth       ║{Style.RESET_ALL}")
@@ -245,19 +176,27 @@ def main():
     print()
     
     try:
-        client = BluetoothChatClient()
+        client = BluetoothChatClient(args.transport, DeviceCache(args.device_cache),
+                                     **session_options(args))
+        client.on_ready = on_ready
         
-        # Discover and select device
-        server_addr = client.discover_devices()
-        if server_addr:
-            client.connect_to_server(server_addr)
-        else:
-            print(f"{Fore.YELLOW}Operasi dibatalkan{Style.RESET_ALL}")
+        # Select device (cache + pencarian latar belakang); transport non-Bluetooth langsung terhubung
+        server_addr = args.addr
+        if server_addr is None and args.name and args.transport == 'rfcomm':
+            server_addr = client.resolve_name(args.name)
+        elif server_addr is None and args.transport == 'rfcomm':
+            server_addr = client.select_device()
+        if server_addr or args.transport != 'rfcomm':
+            return 0 if client.connect_to_server(server_addr, args.port) else 1
+        print(f"{Fore.YELLOW}Operasi dibatalkan{Style.RESET_ALL}")
+        return 1
             
     except KeyboardInterrupt:
         print(f"\n{Fore.YELLOW}🔴 Client dihentikan oleh user{Style.RESET_ALL}")
+        return 130
     except Exception as e:
         print(f"{Fore.RED}❌ Error: {e}{Style.RESET_ALL}")
+        return 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Compression
+Kompresi adaptif untuk payload frame (zlib, lzma, bz2)
+Author: Terminal Chat Bluetooth
+"""
+
+import zlib
+
+try:
+    import lzma
+except ImportError:  # Python tanpa modul _lzma
+    lzma = None
+
+try:
+    import bz2
+except ImportError:  # Python tanpa modul _bz2
+    bz2 = None
+
+# Id codec dikirim di header frame; 0 berarti tidak dikompresi
+CODEC_NONE = 0
+CODEC_IDS = {'zlib': 1, 'lzma': 2, 'bz2': 3}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+
+DEFAULT_CODEC = 'zlib'
+DEFAULT_LEVEL = 6
+# Payload lebih kecil dari ini tidak sebanding dengan biaya kompresi
+MIN_COMPRESS_SIZE = 512
+# Sampel dengan rasio di atas ini dianggap sudah terkompresi (JPEG, ZIP, ...)
+MAX_SAMPLE_RATIO = 0.9
+SAMPLE_SIZE = 64 * 1024
+# Error yang dilempar dekompresor untuk data rusak (bz2 memakai OSError)
+CODEC_ERRORS = (zlib.error, OSError) + ((lzma.LZMAError,) if lzma is not None else ())
+
+
+def available_codecs():
+    """Daftar codec yang tersedia di interpreter ini"""
+    codecs = ['zlib']
+    if lzma is not None:
+        codecs.append('lzma')
+    if bz2 is not None:
+        codecs.append('bz2')
+    return codecs
+
+
+def _compressor(name, level):
+    if name == 'zlib':
+        return zlib.compressobj(level)
+    if name == 'lzma':
+        return lzma.LZMACompressor(preset=level)
+    if name == 'bz2':
+        return bz2.BZ2Compressor(max(level, 1))
+    raise ValueError(f"Codec tidak dikenal: {name}")
+
+
+class DecompressError(ValueError):
+    """Payload terkompresi rusak atau hasilnya melebihi batas"""
+
+
+def _decompressor(name):
+    if name == 'zlib':
+        return zlib.decompressobj()
+    if name == 'lzma' and lzma is not None:
+        return lzma.LZMADecompressor()
+    if name == 'bz2' and bz2 is not None:
+        return bz2.BZ2Decompressor()
+    return None
+
+
+def decompress(codec_id, data, max_size):
+    """Mendekompresi payload frame sesuai id codec di header
+
+    Hasil dibatasi `max_size` byte: dekompresor berhenti di max_size + 1 byte
+    sehingga payload kecil yang mengembang sangat besar tidak memenuhi memori.
+    """
+    decompressor = _decompressor(CODEC_NAMES.get(codec_id))
+    if decompressor is None:
+        raise DecompressError(f"Codec tidak didukung: {codec_id}")
+    try:
+        output = decompressor.decompress(data, max_size + 1)
+    except CODEC_ERRORS as e:
+        raise DecompressError(f"Payload terkompresi rusak: {e}") from e
+    if len(output) > max_size:
+        raise DecompressError(f"Hasil dekompresi melebihi {max_size} bytes")
+    if not decompressor.eof:
+        raise DecompressError("Payload terkompresi terpotong")
+    return output
+
+
+def make_compressor(name, level=DEFAULT_LEVEL):
+    """Membuat Compressor, atau None jika kompresi dimatikan"""
+    if not name or name == 'none':
+        return None
+    return Compressor(name, level)
+
+
+class Compressor:
+    """Kompresi payload frame dengan codec dan level yang dipilih"""
+
+    def __init__(self, name=DEFAULT_CODEC, level=DEFAULT_LEVEL):
+        if name not in available_codecs():
+            raise ValueError(f"Codec tidak tersedia: {name}")
+        self.name = name
+        self.level = level
+        self.codec_id = CODEC_IDS[name]
+
+    def compress(self, *parts):
+        """Mengompresi gabungan beberapa bagian payload tanpa menyalinnya dulu"""
+        compressor = _compressor(self.name, self.level)
+        output = [compressor.compress(part) for part in parts]
+        output.append(compressor.flush())
+        return b''.join(output)
+
+    def maybe_compress(self, *parts):
+        """Return (codec_id, payload); payload mentah jika kompresi tidak menghemat"""
+        size = sum(len(part) for part in parts)
+        if size >= MIN_COMPRESS_SIZE:
+            compressed = self.compress(*parts)
+            if len(compressed) < size:
+                return self.codec_id, compressed
+        return CODEC_NONE, None
+
+    @staticmethod
+    def is_compressible(sample):
+        """Menguji sampel dengan zlib cepat; False untuk data yang sudah terkompresi"""
+        sample = sample[:SAMPLE_SIZE]
+        if len(sample) < MIN_COMPRESS_SIZE:
+            return False
+        return len(zlib.compress(sample, 1)) < len(sample) * MAX_SAMPLE_RATIO
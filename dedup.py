@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Dedup Index
+Index hash isi file di downloads/ agar file yang sudah ada tidak dikirim ulang
+Author: Terminal Chat Bluetooth
+"""
+
+import json
+import os
+import shutil
+import threading
+
+from transfer import file_sha256, unique_path
+
+INDEX_NAME = ".index.jsonl"
+# Tulis ulang file index jika baris usang sebanyak ini melebihi entri yang masih hidup
+COMPACT_SLACK = 1000
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def open_index(downloads_dir):
+    """Index bersama untuk satu folder downloads (dipakai semua sesi di proses ini)"""
+    index = _indexes.get(downloads_dir)
+    if index is not None:
+        return index
+    key = os.path.realpath(downloads_dir)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ContentIndex(downloads_dir)
+        _indexes[downloads_dir] = index
+        return index
+
+
+class ContentIndex:
+    """Index SHA-256 -> file di downloads/, disimpan sebagai JSON lines
+
+    Saat dibuka hanya file index yang dibaca, folder tidak dipindai ulang. Entri
+    ditambahkan satu baris setiap ada file baru. Entri yang filenya sudah diubah
+    atau dihapus (ukuran/mtime berbeda) diabaikan saat dicari.
+    """
+
+    def __init__(self, downloads_dir):
+        self.downloads_dir = downloads_dir
+        self.path = os.path.join(downloads_dir, INDEX_NAME)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.by_hash = {}
+        self.lines = 0
+        self.file = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    self.lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._remember(entry)
+        except FileNotFoundError:
+            return
+        if self.lines > len(self.entries) + COMPACT_SLACK:
+            self._compact()
+
+    def _remember(self, entry):
+        old = self.entries.get(entry['path'])
+        if old is not None:
+            self.by_hash.get(old['sha256'], set()).discard(entry['path'])
+        self.entries[entry['path']] = entry
+        self.by_hash.setdefault(entry['sha256'], set()).add(entry['path'])
+
+    def _forget(self, relative):
+        entry = self.entries.pop(relative, None)
+        if entry is not None:
+            self.by_hash.get(entry['sha256'], set()).discard(relative)
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, separators=(',', ':')) + "\n")
+        os.replace(temp_path, self.path)
+        self.lines = len(self.entries)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _is_current(self, entry):
+        try:
+            stat = os.stat(os.path.join(self.downloads_dir, entry['path']))
+        except OSError:
+            return False
+        return stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']
+
+    def add(self, file_path, sha256):
+        """Mencatat file yang baru selesai diterima atau disalin"""
+        relative = os.path.relpath(file_path, self.downloads_dir)
+        stat = os.stat(file_path)
+        entry = {'sha256': sha256, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                 'path': relative}
+        with self.lock:
+            self._remember(entry)
+            if self.file is None:
+                self.file = open(self.path, 'a')
+            self.file.write(json.dumps(entry, separators=(',', ':')) + "\n")
+            self.file.flush()
+            self.lines += 1
+
+    def lookup(self, sha256, size):
+        """Path file di downloads/ dengan isi yang sama, None jika tidak ada"""
+        with self.lock:
+            for relative in list(self.by_hash.get(sha256, ())):
+                entry = self.entries[relative]
+                if entry['size'] == size and self._is_current(entry):
+                    return os.path.join(self.downloads_dir, relative)
+                self._forget(relative)
+        return None
+
+    def _holds(self, target, sha256, size):
+        """True jika `target` sudah berisi file dengan hash ini
+
+        Entri index yang masih berlaku dipercaya; file yang belum tercatat
+        (atau entrinya usang) dan ukurannya sama di-hash ulang.
+        """
+        with self.lock:
+            entry = self.entries.get(os.path.relpath(target, self.downloads_dir))
+            if entry is not None and self._is_current(entry):
+                return entry['sha256'] == sha256
+        try:
+            if not os.path.isfile(target) or os.path.getsize(target) != size:
+                return False
+            return file_sha256(target) == sha256
+        except OSError:
+            return False
+
+    def materialize(self, existing, target, sha256):
+        """Menyediakan isi `existing` di path `target` (hard link, atau salinan)
+
+        Jika target sudah berisi file yang sama, target dipakai apa adanya. Jika
+        target dipakai file lain, nama baru dipilih agar tidak ada yang tertimpa.
+        """
+        if os.path.exists(target):
+            if (os.path.samefile(existing, target)
+                    or self._holds(target, sha256, os.path.getsize(existing))):
+                return target
+            target = unique_path(target)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            os.link(existing, target)
+        except OSError:
+            shutil.copyfile(existing, target)
+        return target
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Delta Sync
+Transfer ala rsync: hanya bagian file yang berubah yang dikirim
+Author: Terminal Chat Bluetooth
+"""
+
+import base64
+import hashlib
+import math
+import mmap
+import struct
+import zlib
+
+# File lama yang lebih kecil dari ini dikirim ulang utuh
+DELTA_MIN_SIZE = 1024 * 1024
+MIN_BLOCK_SIZE = 2 * 1024
+MAX_BLOCK_SIZE = 64 * 1024
+# Setelah sekian byte berturut-turut tanpa blok yang cocok, pencarian per byte
+# (lambat di Python) diganti pencocokan per blok sampai ada blok yang cocok lagi
+MAX_ROLLING_BYTES = 4 * 1024 * 1024
+# Data baru dilepas per potongan ini agar pengiriman mulai sebelum seluruh file dibandingkan
+MAX_LITERAL_RUN = 1024 * 1024
+ADLER_MOD = 65521
+# Per blok: checksum lemah (Adler-32) dan hash kuat (BLAKE2b 16 byte)
+SIGNATURE = struct.Struct('!I16s')
+
+
+def block_size_for(size):
+    """Ukuran blok ~ akar ukuran file, dibulatkan ke KB (seperti rsync)"""
+    block_size = int(math.sqrt(size)) // 1024 * 1024
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, block_size))
+
+
+def strong_hash(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def make_signatures(path, block_size):
+    """Signature setiap blok penuh file lama sebagai bytes mentah
+
+    Codec JSON mengirimnya sebagai base64 (lihat wire.py), codec biner apa adanya.
+    """
+    packed = bytearray()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(block_size)
+            if len(block) < block_size:
+                break
+            packed += SIGNATURE.pack(zlib.adler32(block), strong_hash(block))
+    return bytes(packed)
+
+
+def parse_signatures(signatures):
+    """Tabel checksum lemah -> {hash kuat: nomor blok}
+
+    `signatures` berupa bytes mentah (codec biner) atau string base64 (codec JSON).
+    """
+    if isinstance(signatures, str):
+        signatures = base64.b64decode(signatures)
+    table = {}
+    for index, (weak, strong) in enumerate(SIGNATURE.iter_unpack(signatures)):
+        table.setdefault(weak, {}).setdefault(strong, index)
+    return table
+
+
+def compute_delta(path, block_size, table):
+    """Membandingkan file baru dengan signature file lama
+
+    Yield ('literal', offset, panjang) untuk data baru dan ('copy', offset, blok,
+    jumlah) untuk rangkaian blok yang bisa disalin dari file lama. Offset adalah
+    posisi di file baru; operasi berurutan dan menutupi seluruh file.
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from _delta_ops(data, size, block_size, table)
+
+
+def _delta_ops(data, size, block_size, table):
+    pos = 0
+    literal_start = 0
+    rolled = 0
+    copy = None
+    weak = zlib.adler32(data[0:block_size]) if size >= block_size else None
+
+    while pos + block_size <= size:
+        candidates = table.get(weak)
+        index = None
+        if candidates is not None:
+            index = candidates.get(strong_hash(data[pos:pos + block_size]))
+
+        if index is not None:
+            if literal_start < pos:
+                if copy:
+                    yield copy
+                    copy = None
+                yield ('literal', literal_start, pos - literal_start)
+            if copy and copy[2] + copy[3] == index:
+                copy = ('copy', copy[1], copy[2], copy[3] + 1)
+            else:
+                if copy:
+                    yield copy
+                copy = ('copy', pos, index, 1)
+            pos += block_size
+            literal_start = pos
+            rolled = 0
+            if pos + block_size <= size:
+                weak = zlib.adler32(data[pos:pos + block_size])
+            continue
+
+        if pos - literal_start >= MAX_LITERAL_RUN:
+            if copy:
+                yield copy
+                copy = None
+            yield ('literal', literal_start, pos - literal_start)
+            literal_start = pos
+
+        if rolled >= MAX_ROLLING_BYTES:
+            # Hanya blok sejajar yang dicocokkan; cukup untuk perubahan di tempat
+            pos += block_size
+            if pos + block_size <= size:
+                weak = zlib.adler32(data[pos:pos + block_size])
+            continue
+
+        # Geser jendela satu byte: Adler-32 bisa diperbarui tanpa menghitung ulang
+        if pos + block_size < size:
+            out_byte = data[pos]
+            a = weak & 0xFFFF
+            b = weak >> 16
+            a = (a - out_byte + data[pos + block_size]) % ADLER_MOD
+            b = (b - block_size * out_byte + a - 1) % ADLER_MOD
+            weak = (b << 16) | a
+        pos += 1
+        rolled += 1
+
+    if copy:
+        yield copy
+    if literal_start < size:
+        yield ('literal', literal_start, size - literal_start)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Device Cache
+Cache perangkat yang pernah ditemukan atau dihubungi, dan pencarian perangkat di latar belakang
+Author: Terminal Chat Bluetooth
+"""
+
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".bluetooth-chat", "devices.json")
+# Perangkat yang tidak ditemukan maupun dihubungi selama ini dihapus dari cache
+DEVICE_TTL = 30 * 24 * 3600
+# Hasil pencarian yang lebih tua dari ini diperbarui di latar belakang
+REFRESH_AFTER = 5 * 60
+
+
+class DeviceCache:
+    """Daftar perangkat yang dikenal, disimpan sebagai file JSON
+
+    Setiap entri menyimpan nama perangkat, kapan terakhir ditemukan lewat
+    pencarian (`seen`) dan kapan terakhir berhasil dihubungi (`connected`).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEVICE_TTL, clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.devices = {}
+        self.last_discovery = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.last_discovery = data.get('last_discovery', 0)
+        now = self.clock()
+        for addr, entry in data.get('devices', {}).items():
+            if now - self._last_used(entry) <= self.ttl:
+                self.devices[addr] = entry
+
+    @staticmethod
+    def _last_used(entry):
+        return max(entry.get('seen', 0), entry.get('connected', 0))
+
+    def save(self):
+        """Menulis cache secara atomik (file sementara lalu rename)"""
+        with self.lock:
+            data = {'last_discovery': self.last_discovery, 'devices': dict(self.devices)}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def entries(self):
+        """Daftar (alamat, nama); yang terakhir dihubungi lebih dulu, lalu yang terakhir ditemukan"""
+        with self.lock:
+            items = sorted(self.devices.items(),
+                           key=lambda item: (item[1].get('connected', 0), item[1].get('seen', 0)),
+                           reverse=True)
+        return [(addr, entry.get('name') or addr) for addr, entry in items]
+
+    def update(self, devices):
+        """Mencatat hasil pencarian perangkat, return alamat yang belum pernah dikenal"""
+        now = self.clock()
+        new = []
+        with self.lock:
+            for addr, name in devices:
+                entry = self.devices.get(addr)
+                if entry is None:
+                    entry = self.devices[addr] = {}
+                    new.append(addr)
+                if name:
+                    entry['name'] = name
+                entry['seen'] = now
+            self.last_discovery = now
+        return new
+
+    def connected(self, addr, name=None):
+        """Mencatat koneksi yang berhasil ke `addr`"""
+        with self.lock:
+            entry = self.devices.setdefault(addr, {})
+            if name:
+                entry['name'] = name
+            entry['connected'] = self.clock()
+
+    def is_stale(self):
+        return self.clock() - self.last_discovery > REFRESH_AFTER
+
+    def find(self, name):
+        """Alamat perangkat dengan nama `name` (tanpa beda huruf besar/kecil, atau
+        bagian nama yang hanya cocok dengan satu perangkat), None jika tidak ada"""
+        wanted = name.lower()
+        entries = self.entries()
+        for addr, device_name in entries:
+            if device_name.lower() == wanted or addr.lower() == wanted:
+                return addr
+        matches = [addr for addr, device_name in entries if wanted in device_name.lower()]
+        return matches[0] if len(matches) == 1 else None
+
+
+class DeviceDiscovery:
+    """Menjalankan pencarian perangkat (blocking) di thread latar belakang
+
+    `discover` adalah fungsi tanpa argumen yang mengembalikan daftar (alamat,
+    nama), biasanya transport.discover_devices; untuk pengujian bisa diganti
+    dengan fungsi yang mengembalikan daftar perangkat palsu.
+    """
+
+    def __init__(self, cache, discover):
+        self.cache = cache
+        self.discover = discover
+        self.on_done = None
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.done.set()
+        self.new = []
+        self.error = None
+
+    @property
+    def running(self):
+        return not self.done.is_set()
+
+    def start(self, on_done=None):
+        """Memulai pencarian jika belum berjalan; on_done(discovery) dipanggil setelah selesai"""
+        with self.lock:
+            if self.running:
+                return
+            self.done.clear()
+            self.on_done = on_done
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        self.error = None
+        self.new = []
+        try:
+            self.new = self.cache.update(self.discover())
+        except Exception as e:
+            self.error = e
+        else:
+            try:
+                self.cache.save()
+            except OSError:
+                # Cache tetap dipakai di memori meski tidak bisa disimpan
+                pass
+        finally:
+            self.done.set()
+        if self.on_done is not None:
+            self.on_done(self)
+
+    def wait(self, timeout=None):
+        """Menunggu pencarian yang sedang berjalan, return False jika timeout"""
+        return self.done.wait(timeout)
+
+    def run(self):
+        """Pencarian blocking: mulai (jika belum) lalu tunggu sampai selesai"""
+        self.start()
+        self.wait()
+        if self.error is not None:
+            raise self.error
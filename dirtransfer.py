@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Directory Transfer
+Mengirim satu folder: file berikutnya dibaca, di-hash dan dikompresi di thread pool
+sementara file sebelumnya sedang dikirim
+Author: Terminal Chat Bluetooth
+"""
+
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from colorama import Fore, Style
+
+from protocol import bulk_channel, encode_chunk_frame, frame_size
+from renderer import show
+from transfer import TransferError, chunk_checksum, file_sha256
+
+# File sampai ukuran ini dibaca utuh dan frame-nya disiapkan di thread pool
+PRELOAD_SIZE = 256 * 1024
+# Jumlah file yang disiapkan dan ditawarkan di depan file yang sedang dikirim
+READ_AHEAD = 64
+DIR_WORKERS = min(4, os.cpu_count() or 1)
+PROGRESS_INTERVAL = 1.0
+
+
+def iter_directory(root):
+    """Yield (path, path relatif berawalan nama folder, ukuran) untuk setiap file"""
+    base = os.path.basename(os.path.normpath(root))
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path) or not os.path.isfile(path):
+                continue
+            relative = os.path.relpath(path, root).replace(os.sep, '/')
+            yield path, f"{base}/{relative}", os.path.getsize(path)
+
+
+class PreparedFile:
+    """File yang sudah di-hash; file kecil sekalian berisi frame chunk yang siap kirim"""
+
+    def __init__(self, path, relative, size, transfer):
+        self.path = path
+        self.relative = relative
+        self.size = size
+        self.transfer = transfer
+        self.sha256 = None
+        self.frames = None
+
+
+def prepare_file(entry, transfer, compressor, chunk_size):
+    """Dijalankan di thread pool: hash, dan untuk file kecil baca + kompresi"""
+    path, relative, size = entry
+    prepared = PreparedFile(path, relative, size, transfer)
+    if size > PRELOAD_SIZE:
+        prepared.sha256 = file_sha256(path, chunk_size)
+        return prepared
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    prepared.sha256 = hashlib.sha256(data).hexdigest()
+    prepared.size = len(data)
+    if compressor is not None and data and not compressor.is_compressible(data[:chunk_size]):
+        compressor = None
+
+    view = memoryview(data)
+    prepared.frames = []
+    for offset in range(0, len(data), chunk_size):
+        piece = view[offset:offset + chunk_size]
+        prepared.frames.append(encode_chunk_frame(transfer.transfer_id, offset,
+                                                  chunk_checksum(piece), piece, compressor))
+    return prepared
+
+
+class DirectorySender:
+    """Pipeline /senddir: siapkan di depan, tawarkan di depan, kirim berurutan
+
+    Tawaran file dikirim sebelum chunk file-file sebelumnya, sehingga jawaban
+    penerima (offset awal) sudah tiba saat giliran file itu dikirim dan tidak ada
+    round trip per file. Semua frame folder memakai satu kanal bulk, jadi urutan
+    dir_offer, file dan dir_end tetap sama seperti saat ditulis.
+    """
+
+    def __init__(self, session, root):
+        self.session = session
+        self.root = root
+        self.name = os.path.basename(os.path.normpath(root))
+        self.entries = list(iter_directory(root))
+        self.total_size = sum(size for _, _, size in self.entries)
+        self.sent_files = 0
+        self.sent_bytes = 0
+        self.wire_bytes = 0
+        self.failed = 0
+        self.deduplicated = 0
+        self.started = None
+        self.last_progress = 0
+
+    def send(self):
+        session = self.session
+        dir_id = session.allocate_transfer_id()
+        channel = bulk_channel(dir_id)
+        compressor = session.peer_compressor
+        entries = iter(self.entries)
+        preparing = deque()
+        offered = deque()
+        self.started = time.monotonic()
+
+        session.send_message({'type': 'dir_offer', 'dir_id': dir_id, 'name': self.name,
+                              'files': len(self.entries), 'size': self.total_size}, channel=channel)
+
+        def fill():
+            while len(preparing) + len(offered) < READ_AHEAD:
+                entry = next(entries, None)
+                if entry is None:
+                    return
+                transfer = session.new_transfer(channel)
+                future = pool.submit(prepare_file, entry, transfer, compressor, session.chunk_size)
+                preparing.append((future, transfer, entry[1]))
+
+        with ThreadPoolExecutor(DIR_WORKERS, thread_name_prefix="senddir") as pool:
+            try:
+                fill()
+                while preparing or offered:
+                    # Tawarkan semua file yang sudah siap; tunggu hanya jika belum ada yang bisa dikirim
+                    while preparing and (preparing[0][0].done() or not offered):
+                        future, transfer, relative = preparing.popleft()
+                        try:
+                            prepared = future.result()
+                        except OSError as e:
+                            self.skip(transfer, relative, e)
+                        else:
+                            session.send_file_offer(transfer, prepared.relative, prepared.size,
+                                                    prepared.sha256, dir_id=dir_id)
+                            offered.append(prepared)
+                        fill()
+
+                    if offered:
+                        self.send_prepared(offered.popleft())
+                        fill()
+                        self.report_progress()
+            finally:
+                for future, transfer, _ in preparing:
+                    future.cancel()
+                    session.outgoing.pop(transfer.transfer_id, None)
+                for prepared in offered:
+                    session.outgoing.pop(prepared.transfer.transfer_id, None)
+
+        session.send_message({'type': 'dir_end', 'dir_id': dir_id,
+                              'files': self.sent_files, 'size': self.sent_bytes}, channel=channel)
+        self.report_done()
+
+    def send_prepared(self, prepared):
+        """Mengirim satu file yang sudah ditawarkan"""
+        session = self.session
+        transfer = prepared.transfer
+        try:
+            start = session.wait_file_accept(transfer)
+            if transfer.already_have:
+                self.deduplicated += 1
+                self.sent_files += 1
+                return
+            if prepared.frames is not None and start == 0:
+                transfer.progress()
+                parts = []
+                for frame in prepared.frames:
+                    session.metrics.record_sent('chunk', frame_size(frame))
+                    parts.extend(frame)
+                # Semua chunk file kecil masuk dalam satu write
+                if parts:
+                    session.writer.write(parts, channel=transfer.channel)
+                wire_bytes = frame_size(parts)
+                transfer.progress(prepared.size)
+            else:
+                wire_bytes = session.send_file_data(transfer, prepared.path, start)
+            session.send_file_end(transfer, prepared.size)
+        except TransferError as e:
+            self.skip(transfer, prepared.relative, e)
+            return
+        finally:
+            session.outgoing.pop(transfer.transfer_id, None)
+
+        self.sent_files += 1
+        self.sent_bytes += prepared.size - start
+        self.wire_bytes += wire_bytes
+
+    def skip(self, transfer, relative, error):
+        self.session.outgoing.pop(transfer.transfer_id, None)
+        self.failed += 1
+        show(f"{Fore.RED}❌ Gagal mengirim {relative}: {error}{Style.RESET_ALL}")
+
+    def throughput(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return elapsed, self.sent_bytes / elapsed / (1024 * 1024)
+
+    def report_progress(self):
+        now = time.monotonic()
+        if now - self.last_progress < PROGRESS_INTERVAL:
+            return
+        self.last_progress = now
+        _, throughput = self.throughput()
+        show(f"{Fore.YELLOW}📦 {self.name}: {self.sent_files}/{len(self.entries)} file, "
+              f"{self.sent_bytes / (1024 * 1024):.1f}/{self.total_size / (1024 * 1024):.1f} MB, "
+              f"{throughput:.2f} MB/s{Style.RESET_ALL}")
+
+    def report_done(self):
+        elapsed, throughput = self.throughput()
+        self.session.metrics.record_transfer('sent', self.sent_bytes, elapsed, self.sent_files)
+        ratio = self.wire_bytes / self.sent_bytes if self.sent_bytes else 1.0
+        failed = f", {self.failed} gagal" if self.failed else ""
+        deduplicated = f", {self.deduplicated} sudah ada di penerima" if self.deduplicated else ""
+        show(f"{Fore.GREEN}📦 Folder terkirim: {self.name} ({self.sent_files} file, {self.sent_bytes} bytes"
+              f"{deduplicated}{failed}, rasio {ratio:.1%}, {elapsed:.2f} s, {throughput:.2f} MB/s){Style.RESET_ALL}")
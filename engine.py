@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Async Engine
+Menjalankan socket, stdin dan timer sebuah sesi dari satu event loop asyncio
+Author: Terminal Chat Bluetooth
+"""
+
+import asyncio
+import os
+import stat
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from colorama import Fore, Style
+
+from protocol import CHANNEL_CONTROL, DEFAULT_BATCH_SIZE, FileRegion, FrameScheduler, coalesce, frame_size
+from renderer import show
+
+# Batas byte dalam antrean keluar sebelum thread pengirim file ditahan
+MAX_QUEUED_BYTES = 1024 * 1024
+# Waktu maksimum mengosongkan antrean keluar saat keluar
+DRAIN_TIMEOUT = 5
+# Panjang maksimum satu baris stdin; baris yang lebih panjang dibuang utuh
+MAX_INPUT_LINE = 1024 * 1024
+
+
+class QueueFullError(ConnectionError):
+    """Antrean keluar peer melewati batas; peer dianggap terlalu lambat"""
+
+
+class QueueWriter:
+    """Antrean frame keluar yang dikirim oleh satu task penulis di event loop
+
+    write() aman dipanggil dari thread mana pun. Thread lain (misalnya thread
+    pengirim file) ditahan selama antrean penuh, sedangkan event loop sendiri
+    tidak pernah diblokir. Jika `limit` diisi, tulisan dari event loop yang
+    melewatinya ditolak dengan QueueFullError.
+
+    Frame yang sudah mengantre dikirim bersama dalam satu write (maksimal
+    `max_batch` byte), diambil menurut prioritas kanalnya (lihat
+    FrameScheduler): chat tidak menunggu di belakang chunk file yang mengantre.
+    Dengan `max_delay` > 0 task penulis menunggu sebentar agar lebih banyak
+    frame terkumpul, kecuali flush() dipanggil.
+
+    Bagian frame (termasuk memoryview ke buffer chunk file) disimpan apa adanya
+    sampai terkirim, jadi pemanggil tidak boleh mengisi ulang buffernya.
+    """
+
+    # Bagian frame dipegang sampai terkirim (lihat FileSource.detach())
+    retains_parts = True
+
+    def __init__(self, loop, sock, max_bytes=MAX_QUEUED_BYTES, limit=None, metrics=None,
+                 max_delay=0, max_batch=DEFAULT_BATCH_SIZE):
+        self.loop = loop
+        self.sock = sock
+        self.metrics = metrics
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.max_bytes = max_bytes
+        self.limit = limit
+        self.frames = FrameScheduler()
+        # Termasuk frame yang sudah diambil tetapi belum selesai dikirim
+        self.queued_bytes = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.wakeup = asyncio.Event()
+        self.flush_now = asyncio.Event()
+        self.loop_thread = threading.get_ident()
+
+    @property
+    def queued_frames(self):
+        """Jumlah frame yang masih mengantre"""
+        return len(self.frames)
+
+    def write(self, parts, on_sent=None, blocking=True, channel=CHANNEL_CONTROL):
+        """Memasukkan frame ke antrean; on_sent dipanggil setelah frame terkirim
+
+        Dengan blocking=False, return False alih-alih menunggu antrean yang penuh.
+        """
+        size = frame_size(parts)
+        in_loop = threading.get_ident() == self.loop_thread
+
+        with self.condition:
+            if not in_loop:
+                while self.queued_bytes >= self.max_bytes and not self.closed:
+                    if not blocking:
+                        return False
+                    self.condition.wait()
+            if self.closed:
+                raise ConnectionError("Koneksi sudah ditutup")
+            if in_loop and self.limit is not None and self.queued_bytes + size > self.limit:
+                raise QueueFullError(f"Antrean keluar penuh ({self.queued_bytes} bytes)")
+            self.frames.push((parts, on_sent), size, channel)
+            self.queued_bytes += size
+
+        if in_loop:
+            self.wakeup.set()
+        else:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+        return True
+
+    def _pop_batch(self):
+        """Mengambil frame berikutnya menurut prioritas sampai max_batch byte (minimal satu)"""
+        with self.condition:
+            return self.frames.pop_batch(self.max_batch)
+
+    def _sent(self, size):
+        with self.condition:
+            self.queued_bytes -= size
+            self.condition.notify_all()
+
+    def flush(self):
+        """Mengirim frame yang tertahan tanpa menunggu max_delay"""
+        if threading.get_ident() == self.loop_thread:
+            self.flush_now.set()
+        else:
+            self.loop.call_soon_threadsafe(self.flush_now.set)
+
+    async def run(self):
+        """Task penulis: mengirim frame dalam antrean secara berurutan"""
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                if self.max_delay > 0 and self.queued_bytes < self.max_batch:
+                    try:
+                        await asyncio.wait_for(self.flush_now.wait(), self.max_delay)
+                    except asyncio.TimeoutError:
+                        pass
+                self.flush_now.clear()
+                while True:
+                    batch = self._pop_batch()
+                    if not batch:
+                        break
+                    parts = [part for (frame_parts, _), _ in batch for part in frame_parts]
+                    started = time.perf_counter()
+                    for data in coalesce(parts, self.max_batch):
+                        if isinstance(data, FileRegion):
+                            await self.loop.sock_sendfile(self.sock, data.file, data.offset, data.count)
+                        else:
+                            await self.loop.sock_sendall(self.sock, data)
+                    if self.metrics is not None:
+                        self.metrics.record_time('socket_send', time.perf_counter() - started)
+                    for (_, on_sent), size in batch:
+                        self._sent(size)
+                        if on_sent is not None:
+                            on_sent()
+        finally:
+            self.close()
+
+    async def drain(self):
+        """Menunggu sampai antrean keluar kosong"""
+        while self.queued_bytes and not self.closed:
+            await asyncio.sleep(0.01)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class AsyncStdin:
+    """Membaca baris stdin secara async
+
+    Di POSIX stdin (pipe, socket atau terminal) dipasang langsung ke event loop;
+    jika tidak bisa (Windows, file biasa, /dev/null), baris dibaca oleh thread
+    daemon agar tidak menahan shutdown.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.reader = None
+        self.queue = None
+        self.fd = None
+
+    async def start(self):
+        try:
+            fd = sys.stdin.fileno()
+            mode = os.fstat(fd).st_mode
+            if not (os.isatty(fd) or stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)):
+                # File biasa dan /dev/null tidak bisa dipantau oleh event loop
+                raise ValueError("stdin bukan pipe atau terminal")
+            self.reader = asyncio.StreamReader(limit=MAX_INPUT_LINE)
+            protocol = asyncio.StreamReaderProtocol(self.reader)
+            await self.loop.connect_read_pipe(lambda: protocol, sys.stdin)
+            self.fd = fd
+        except (ValueError, OSError, NotImplementedError, AttributeError):
+            self.reader = None
+            self.queue = asyncio.Queue()
+            thread = threading.Thread(target=self._read_lines, daemon=True)
+            thread.start()
+
+    def _read_lines(self):
+        while True:
+            line = sys.stdin.readline()
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, line)
+            if not line:
+                break
+
+    async def readline(self):
+        """Satu baris tanpa newline, None jika stdin ditutup"""
+        if self.reader is not None:
+            line = await self._read_line()
+            line = line.decode('utf-8', errors='replace')
+        else:
+            line = await self.queue.get()
+        if not line:
+            return None
+        return line.rstrip('\r\n')
+
+    async def _read_line(self):
+        while True:
+            try:
+                return await self.reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                # stdin ditutup; sisa tanpa newline tetap dipakai
+                return e.partial
+            except asyncio.LimitOverrunError as e:
+                show(f"{Fore.YELLOW}⚠️  Baris input lebih dari {MAX_INPUT_LINE} bytes, dibuang{Style.RESET_ALL}")
+                await self._skip_line(e.consumed)
+
+    async def _skip_line(self, consumed):
+        """Membuang baris yang terlalu panjang sampai newline berikutnya"""
+        while True:
+            try:
+                await self.reader.readexactly(consumed)
+                await self.reader.readuntil(b'\n')
+                return
+            except asyncio.LimitOverrunError as e:
+                consumed = e.consumed
+            except asyncio.IncompleteReadError:
+                # stdin ditutup di tengah baris; readline berikutnya mengembalikan None
+                return
+
+    def close(self):
+        # connect_read_pipe membuat stdin non-blocking; kembalikan untuk shell
+        if self.fd is not None:
+            try:
+                os.set_blocking(self.fd, True)
+            except OSError:
+                pass
+
+
+class AsyncChatEngine:
+    """Menggerakkan ChatSession dari satu event loop, tanpa thread per tugas"""
+
+    def __init__(self, session, max_workers=2):
+        self.session = session
+        self.loop = None
+        self.writer = None
+        self.stdin = None
+        self.timers = []
+        self.background = set()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transfer")
+
+    async def run(self):
+        session = self.session
+        self.loop = asyncio.get_running_loop()
+        session.async_engine = self
+        session.running = True
+        session.start_timers()
+
+        input_task = asyncio.create_task(self.input_loop())
+        writer_task = receive_task = None
+        try:
+            while True:
+                writer_task, receive_task = self.start_link()
+                await asyncio.wait({receive_task, input_task}, return_when=asyncio.FIRST_COMPLETED)
+                if input_task.done() or not session.link_down():
+                    break
+                await self.stop_link(writer_task, receive_task)
+                writer_task = receive_task = None
+                # Input tetap berjalan selama koneksi dibuka ulang di thread tersendiri
+                reconnect = self.run_in_thread(session.reconnect)
+                await asyncio.wait({reconnect, input_task}, return_when=asyncio.FIRST_COMPLETED)
+                if not reconnect.done() or not reconnect.result():
+                    break
+            session.running = False
+            if writer_task is not None:
+                await self.drain()
+        except (asyncio.CancelledError, KeyboardInterrupt):
+            # Ctrl+C membatalkan task ini: peer tetap diberi tahu seperti di engine
+            # thread agar tidak menunggu reconnect, lalu pembatalan diteruskan
+            session.running = False
+            if writer_task is not None:
+                session.send_disconnect()
+                try:
+                    await self.drain()
+                except asyncio.CancelledError:
+                    pass
+            raise
+        finally:
+            session.running = False
+            if writer_task is not None:
+                await self.stop_link(writer_task, receive_task)
+            for task in [input_task] + self.timers:
+                task.cancel()
+            await asyncio.gather(input_task, *self.timers, return_exceptions=True)
+            if self.stdin is not None:
+                self.stdin.close()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            session.async_engine = None
+
+    async def drain(self):
+        """Menunggu antrean keluar terkirim, paling lama DRAIN_TIMEOUT"""
+        try:
+            await asyncio.wait_for(self.writer.drain(), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+
+    def start_link(self):
+        """Task penulis dan penerima untuk socket sesi saat ini, lalu kirim hello"""
+        session = self.session
+        session.socket.setblocking(False)
+        self.writer = QueueWriter(self.loop, session.socket, metrics=session.metrics,
+                                  max_delay=session.batch_delay, max_batch=session.batch_size)
+        session.writer = self.writer
+        writer_task = asyncio.create_task(self.writer.run())
+        receive_task = asyncio.create_task(self.receive_loop(session))
+        session.send_hello()
+        return writer_task, receive_task
+
+    async def stop_link(self, writer_task, receive_task):
+        self.writer.close()
+        for task in (writer_task, receive_task):
+            task.cancel()
+        await asyncio.gather(writer_task, receive_task, return_exceptions=True)
+
+    def run_in_thread(self, func):
+        """Menjalankan fungsi blocking di thread daemon, return future di event loop
+
+        Berbeda dengan executor, thread ini tidak ditunggu saat event loop
+        selesai (mis. accept() yang masih menunggu client).
+        """
+        future = self.loop.create_future()
+
+        def resolve(result, error):
+            if not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+        def target():
+            result = error = None
+            try:
+                result = func()
+            except Exception as e:
+                error = e
+            try:
+                self.loop.call_soon_threadsafe(resolve, result, error)
+            except RuntimeError:
+                # Event loop sudah ditutup
+                pass
+
+        threading.Thread(target=target, daemon=True).start()
+        return future
+
+    async def receive_loop(self, session):
+        """Membaca dan menangani frame masuk untuk satu sesi"""
+        try:
+            while session.running:
+                frame = await session.reader.read_frame_async(self.loop)
+                if frame is None:
+                    break
+                session.dispatch_frame(*frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            session.report_receive_error(e)
+        finally:
+            session.close_incoming()
+
+    async def input_loop(self):
+        """Membaca stdin dan menjalankan perintah tanpa memblokir socket"""
+        session = self.session
+        if session.bulk:
+            # Baris stdin dibaca per blok di thread dan dikirim sebagai batch
+            await self.loop.run_in_executor(self.executor, session.send_bulk)
+            session.send_disconnect()
+            return
+        if session.headless:
+            # Tanpa stdin: sesi berakhir saat receive_loop selesai
+            await self.loop.create_future()
+
+        self.stdin = AsyncStdin(self.loop)
+        await self.stdin.start()
+        session.print_help()
+
+        while session.running:
+            line = await self.stdin.readline()
+            if line is None or line.lower() == '/quit':
+                # Transfer yang masih berjalan diselesaikan sebelum keluar
+                await self.wait_background()
+            if line is None:
+                session.send_disconnect()
+                break
+            if not session.handle_command(line):
+                break
+            # Beri giliran ke task lain walau stdin berisi banyak baris
+            await asyncio.sleep(0)
+
+    def run_background(self, func, *args):
+        """Menjalankan pekerjaan blocking (transfer file) di thread pool"""
+        future = self.loop.run_in_executor(self.executor, func, *args)
+        self.background.add(future)
+        future.add_done_callback(self.background.discard)
+
+    async def wait_background(self):
+        """Menunggu semua pekerjaan latar belakang selesai"""
+        if self.background:
+            show(f"{Fore.YELLOW}⏳ Menunggu {len(self.background)} transfer selesai...{Style.RESET_ALL}")
+            await asyncio.gather(*self.background, return_exceptions=True)
+
+    def schedule_every(self, interval, callback):
+        """Memanggil callback setiap `interval` detik di event loop"""
+        async def tick():
+            while True:
+                await asyncio.sleep(interval)
+                callback()
+
+        self.timers.append(self.loop.create_task(tick()))
+
+
+def run_engine(session):
+    """Menjalankan sesi di engine asyncio sampai selesai"""
+    asyncio.run(AsyncChatEngine(session).run())
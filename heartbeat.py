@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Heartbeat
+Ping/pong berkala, estimasi RTT dan deteksi peer yang tidak merespons
+Author: Terminal Chat Bluetooth
+"""
+
+import threading
+import time
+
+# Interval ping default; 0 mematikan heartbeat
+DEFAULT_HEARTBEAT_INTERVAL = 5.0
+# Peer dianggap mati jika tidak ada frame apa pun selama ini
+DEFAULT_HEARTBEAT_TIMEOUT = 20.0
+# Batas bawah dan atas timeout transfer yang dihitung dari RTT
+MIN_TRANSFER_TIMEOUT = 10.0
+MAX_TRANSFER_TIMEOUT = 60.0
+# Timeout transfer = kelipatan RTO (seperti retransmission timeout TCP)
+TRANSFER_RTO_FACTOR = 16
+
+
+class RttEstimator:
+    """Estimasi RTT bergulir (SRTT/RTTVAR, RFC 6298)"""
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+
+    def __init__(self):
+        self.srtt = None
+        self.rttvar = None
+        self.last = None
+        self.min = None
+        self.samples = 0
+
+    def update(self, rtt):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.last = rtt
+        self.min = rtt if self.min is None else min(self.min, rtt)
+        self.samples += 1
+
+    @property
+    def rto(self):
+        """Retransmission timeout: SRTT + 4 * RTTVAR, None jika belum ada sampel"""
+        if self.srtt is None:
+            return None
+        return self.srtt + 4 * self.rttvar
+
+
+class Heartbeat:
+    """Status heartbeat satu koneksi
+
+    Setiap frame yang diterima memperbarui `last_seen`. tick() dipanggil setiap
+    `interval` detik dan memutuskan apakah perlu ping atau peer sudah mati.
+    """
+
+    def __init__(self, interval=DEFAULT_HEARTBEAT_INTERVAL, timeout=DEFAULT_HEARTBEAT_TIMEOUT):
+        self.interval = interval
+        # Timeout minimal dua interval agar satu ping yang terlambat tidak memutus koneksi
+        self.timeout = max(timeout, 2 * interval)
+        self.rtt = RttEstimator()
+        self.last_seen = time.monotonic()
+        self.peer_enabled = False
+        self.next_ping_id = 1
+        self.probes = set()
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.interval > 0
+
+    def seen(self):
+        self.last_seen = time.monotonic()
+
+    def silence(self):
+        """Detik sejak frame terakhir dari peer"""
+        return time.monotonic() - self.last_seen
+
+    def is_dead(self):
+        # Peer lama yang tidak mengirim ping tidak bisa dinilai dari diamnya
+        return self.peer_enabled and self.silence() > self.timeout
+
+    def make_ping(self, probe=False):
+        with self.lock:
+            ping_id = self.next_ping_id
+            self.next_ping_id += 1
+            if probe:
+                self.probes.add(ping_id)
+        return {'type': 'ping', 'id': ping_id, 'sent': time.monotonic()}
+
+    def handle_pong(self, message):
+        """Mencatat sampel RTT dari pong, return (rtt, probe)"""
+        rtt = time.monotonic() - message['sent']
+        self.rtt.update(rtt)
+        with self.lock:
+            probe = message.get('id') in self.probes
+            self.probes.discard(message.get('id'))
+        return rtt, probe
+
+    def transfer_timeout(self, default):
+        """Timeout menunggu peer selama transfer, disesuaikan dengan RTT terukur"""
+        rto = self.rtt.rto
+        if rto is None:
+            return default
+        return min(MAX_TRANSFER_TIMEOUT, max(MIN_TRANSFER_TIMEOUT, TRANSFER_RTO_FACTOR * rto))
+
+    def summary(self):
+        rtt = self.rtt
+        if not rtt.samples:
+            return "belum ada sampel RTT"
+        return (f"RTT terakhir {rtt.last * 1000:.2f} ms, rata-rata {rtt.srtt * 1000:.2f} ms, "
+                f"variasi {rtt.rttvar * 1000:.2f} ms, min {rtt.min * 1000:.2f} ms "
+                f"({rtt.samples} sampel)")
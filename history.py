@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Chat History
+Riwayat chat persisten: log append-only bersegmen dengan index offset per pesan
+Author: Terminal Chat Bluetooth
+"""
+
+import bisect
+import json
+import os
+import queue
+import struct
+import threading
+from collections import deque, namedtuple
+from datetime import datetime
+from colorama import Fore, Style
+
+try:
+    import fcntl
+except ImportError:  # Windows: tanpa kunci antarproses
+    fcntl = None
+
+from renderer import show
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".bluetooth-chat", "history")
+# Segmen log baru dibuat setelah segmen aktif melewati ukuran ini
+SEGMENT_SIZE = 4 * 1024 * 1024
+# Jumlah pesan terakhir yang disimpan di memori
+CACHE_SIZE = 1000
+# Batas pesan yang menunggu ditulis; jika disk tertinggal sejauh ini, pesan baru tidak dicatat
+QUEUE_LIMIT = 100000
+DEFAULT_HISTORY_COUNT = 20
+SEARCH_LIMIT = 20
+# File kunci: satu folder riwayat hanya ditulis oleh satu proses
+LOCK_FILE = ".lock"
+
+# Satu entri index: offset awal baris pesan di file log segmen
+OFFSET = struct.Struct('<I')
+# Panjang awalan baris log sampai akhir timestamp: ["YYYY-MM-DDTHH:MM:SS",
+TIMESTAMP_PREFIX = 23
+
+# Satu baris log adalah JSON array [timestamp, pengirim, teks]
+HistoryEntry = namedtuple('HistoryEntry', 'timestamp sender text')
+
+_histories = {}
+_histories_lock = threading.Lock()
+
+
+class HistoryLocked(OSError):
+    """Folder riwayat sedang dipakai proses lain"""
+
+
+def open_history(directory, role=None):
+    """Riwayat bersama untuk satu folder (dipakai semua sesi di proses ini)
+
+    Jika folder sedang dipakai proses lain (mis. server dan client di host
+    yang sama), riwayat disimpan di subfolder `role` ('server'/'client');
+    jika subfolder itu juga terkunci, HistoryLocked dinaikkan.
+    """
+    with _histories_lock:
+        try:
+            return _shared_history(directory)
+        except HistoryLocked:
+            if role is None:
+                raise
+            return _shared_history(os.path.join(directory, role))
+
+
+def _shared_history(directory):
+    key = os.path.realpath(directory)
+    history = _histories.get(key)
+    if history is None:
+        history = _histories[key] = ChatHistory(directory)
+    return history
+
+
+class Segment:
+    """Satu pasangan file NNNNNNNN.log (JSON lines) dan NNNNNNNN.idx (offset)"""
+
+    def __init__(self, directory, number, first):
+        self.number = number
+        self.first = first
+        base = os.path.join(directory, f"{number:08d}")
+        self.log_path = base + ".log"
+        self.index_path = base + ".idx"
+
+    def count(self):
+        try:
+            return os.path.getsize(self.index_path) // OFFSET.size
+        except OSError:
+            return 0
+
+    def offset(self, position):
+        """Offset byte pesan ke-`position` di segmen ini"""
+        with open(self.index_path, 'rb') as f:
+            f.seek(position * OFFSET.size)
+            return OFFSET.unpack(f.read(OFFSET.size))[0]
+
+    def repair(self):
+        """Membuang ekor log yang tidak tercatat di index (mis. setelah crash)"""
+        count = self.count()
+        with open(self.index_path, 'r+b') as index:
+            index.truncate(count * OFFSET.size)
+        if count == 0:
+            end = 0
+        else:
+            start = self.offset(count - 1)
+            with open(self.log_path, 'rb') as f:
+                f.seek(start)
+                line = f.readline()
+            if line.endswith(b"\n"):
+                end = start + len(line)
+            else:
+                # Baris terakhir terpotong: entri index-nya ikut dibuang
+                end = start
+                with open(self.index_path, 'r+b') as index:
+                    index.truncate((count - 1) * OFFSET.size)
+        with open(self.log_path, 'r+b') as f:
+            f.truncate(end)
+
+
+class ChatHistory:
+    """Log chat append-only, dibagi per segmen, dengan index offset per pesan
+
+    Pesan ke-n dicari lewat daftar segmen (di memori, satu entri per segmen)
+    lalu offset-nya dibaca dari file index, jadi memori tidak bertambah
+    seiring jumlah pesan. append() hanya memasukkan pesan ke cache dan antrean;
+    penulisan ke disk dilakukan thread tersendiri. Folder dikunci dengan flock
+    selama riwayat terbuka, jadi proses lain tidak ikut menulis ke segmen yang sama.
+    """
+
+    def __init__(self, directory, segment_size=SEGMENT_SIZE, cache_size=CACHE_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.recent = deque(maxlen=cache_size)
+        self.lock = threading.Lock()
+        self.pending = queue.Queue(QUEUE_LIMIT)
+        self.dropped = 0
+        self.segments = []
+        self.stored = 0
+        self.log = None
+        self.index = None
+        os.makedirs(directory, exist_ok=True)
+        self.lock_file = self._lock(directory)
+        self._load()
+        self.writer = threading.Thread(target=self._write_loop, name="history", daemon=True)
+        self.writer.start()
+
+    @staticmethod
+    def _lock(directory):
+        """Mengunci folder untuk proses ini; kunci lepas sendiri saat proses berakhir"""
+        lock_file = open(os.path.join(directory, LOCK_FILE), 'a')
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise HistoryLocked(f"Folder riwayat {directory} sedang dipakai proses lain")
+        return lock_file
+
+    def _load(self):
+        numbers = sorted(int(name[:-4]) for name in os.listdir(self.directory)
+                         if name.endswith(".idx") and name[:-4].isdigit())
+        for number in numbers:
+            segment = Segment(self.directory, number, self.stored)
+            if number == numbers[-1]:
+                segment.repair()
+            self.segments.append(segment)
+            self.stored += segment.count()
+
+    @property
+    def total(self):
+        """Jumlah pesan yang sudah dicatat (termasuk yang belum ditulis ke disk)"""
+        with self.lock:
+            return self.stored + self.pending.qsize()
+
+    def append(self, sender, text):
+        """Mencatat satu pesan tanpa menunggu disk"""
+        entry = HistoryEntry(datetime.now().isoformat(timespec='seconds'), sender, text)
+        with self.lock:
+            try:
+                self.pending.put_nowait(entry)
+            except queue.Full:
+                self.dropped += 1
+                if self.dropped == 1:
+                    show(f"{Fore.YELLOW}⚠️  Penulisan riwayat chat tertinggal, "
+                          f"sebagian pesan tidak dicatat{Style.RESET_ALL}")
+                return
+            self.recent.append(entry)
+
+    def flush(self):
+        """Menunggu semua pesan dalam antrean tertulis ke disk"""
+        self.pending.join()
+
+    def _write_loop(self):
+        while True:
+            batch = [self.pending.get()]
+            while len(batch) < 1000:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except OSError as e:
+                show(f"{Fore.RED}❌ Gagal menulis riwayat chat: {e}{Style.RESET_ALL}")
+            finally:
+                for _ in batch:
+                    self.pending.task_done()
+
+    def _write(self, batch):
+        if self.log is None or self.log.tell() >= self.segment_size:
+            self._rotate()
+        # Offset dari posisi akhir file sebenarnya, bukan dari hitungan di memori
+        position = self.log.seek(0, os.SEEK_END)
+        lines = []
+        offsets = []
+        for entry in batch:
+            line = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+            offsets.append(OFFSET.pack(position))
+            lines.append(line)
+            position += len(line)
+        # Log ditulis lebih dulu, jadi setiap offset di index menunjuk baris yang utuh
+        self.log.write(b"".join(lines))
+        self.log.flush()
+        self.index.write(b"".join(offsets))
+        self.index.flush()
+        with self.lock:
+            self.stored += len(batch)
+
+    def _rotate(self):
+        for f in (self.log, self.index):
+            if f is not None:
+                f.close()
+        last = self.segments[-1] if self.segments else None
+        if last is None or os.path.getsize(last.log_path) >= self.segment_size:
+            number = last.number + 1 if last else 1
+            with self.lock:
+                last = Segment(self.directory, number, self.stored)
+                self.segments.append(last)
+        self.log = open(last.log_path, 'ab')
+        self.index = open(last.index_path, 'ab')
+
+    def _segment_at(self, position):
+        with self.lock:
+            firsts = [segment.first for segment in self.segments]
+            return self.segments[bisect.bisect_right(firsts, position) - 1]
+
+    def last(self, count):
+        """`count` pesan terakhir, urut dari yang paling lama
+
+        Dari cache jika cukup; selain itu dibaca bertahap dari disk tanpa
+        memuat semuanya ke memori.
+        """
+        if count <= 0:
+            return []
+        with self.lock:
+            if count <= len(self.recent):
+                return list(self.recent)[-count:]
+        self.flush()
+        start = max(0, self.stored - count)
+        return self.read(start, self.stored - start)
+
+    def read(self, start, count):
+        """Membaca `count` pesan mulai dari pesan ke-`start` di disk"""
+        if count <= 0:
+            return
+        segment = self._segment_at(start)
+        offset = segment.offset(start - segment.first)
+        with self.lock:
+            segments = self.segments[self.segments.index(segment):]
+        for segment in segments:
+            with open(segment.log_path, 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    yield HistoryEntry(*json.loads(line))
+                    count -= 1
+                    if count == 0:
+                        return
+            offset = 0
+
+    def search(self, term, limit=SEARCH_LIMIT):
+        """Pesan terbaru yang pengirim atau isinya memuat `term`, urut dari yang paling lama
+
+        Setiap segmen dicari dengan satu pencarian substring atas byte log;
+        baris pesan untuk setiap hasil ditemukan lewat index offset. Huruf
+        besar/kecil diabaikan untuk huruf ASCII.
+        """
+        self.flush()
+        wanted = term.lower()
+        # Teks dicari dalam bentuk yang sama dengan yang tertulis di JSON
+        needle = json.dumps(wanted, ensure_ascii=False)[1:-1].encode('utf-8')
+        matches = []
+        with self.lock:
+            segments = list(self.segments)
+        for segment in reversed(segments):
+            with open(segment.log_path, 'rb') as f:
+                data = f.read().lower()
+            with open(segment.index_path, 'rb') as f:
+                index = f.read()
+            offsets = struct.unpack(f'<{len(index) // OFFSET.size}I', index)
+            # Dicari mundur dari akhir segmen agar pesan terbaru ditemukan lebih dulu
+            position = data.rfind(needle)
+            while position != -1:
+                line = bisect.bisect_right(offsets, position) - 1
+                end = position + len(needle) - 1
+                if position - offsets[line] >= TIMESTAMP_PREFIX:
+                    entry = self._read_entry(segment, offsets[line])
+                    if wanted in entry.text.lower() or wanted in entry.sender.lower():
+                        matches.append(entry)
+                        if len(matches) == limit:
+                            return matches[::-1]
+                    # Satu hasil per pesan: lanjut dari baris sebelumnya
+                    end = offsets[line]
+                position = data.rfind(needle, 0, end)
+        return matches[::-1]
+
+    @staticmethod
+    def _read_entry(segment, offset):
+        with open(segment.log_path, 'rb') as f:
+            f.seek(offset)
+            return HistoryEntry(*json.loads(f.readline()))
+
+
+def format_entry(entry):
+    timestamp = entry.timestamp.replace('T', ' ')
+    return f"{Fore.CYAN}  [{timestamp}] {entry.sender}: {entry.text}{Style.RESET_ALL}"
+
+
+def print_history(history, count=DEFAULT_HISTORY_COUNT):
+    """Perintah /history [n]"""
+    total = history.total
+    if not total:
+        show(f"{Fore.YELLOW}Riwayat chat masih kosong{Style.RESET_ALL}")
+        return
+    lines = [f"{Fore.GREEN}📜 {min(count, total)} pesan terakhir (dari {total}):{Style.RESET_ALL}"]
+    lines.extend(format_entry(entry) for entry in history.last(count))
+    # Satu print agar tidak tercampur dengan output perintah lain yang berjalan bersamaan
+    show("\n".join(lines))
+
+
+def print_search(history, term):
+    """Perintah /search <kata>"""
+    matches = history.search(term)
+    if not matches:
+        show(f"{Fore.YELLOW}Tidak ada pesan yang memuat '{term}'{Style.RESET_ALL}")
+        return
+    lines = [f"{Fore.GREEN}🔎 {len(matches)} pesan terbaru yang memuat '{term}':{Style.RESET_ALL}"]
+    lines.extend(format_entry(entry) for entry in matches)
+    show("\n".join(lines))
+
+
+def is_history_command(user_input):
+    return user_input.split(' ', 1)[0] in ('/history', '/search')
+
+
+def handle_command(history, user_input, run_background):
+    """Perintah /history [n] dan /search <kata>; pembacaan disk lewat run_background"""
+    command, _, argument = user_input.partition(' ')
+    argument = argument.strip()
+    if command == '/search' and argument:
+        run_background(print_search, history, argument)
+    elif command == '/history' and (not argument or argument.isdigit()):
+        run_background(print_history, history, int(argument) if argument else DEFAULT_HISTORY_COUNT)
+    else:
+        show(f"{Fore.RED}❌ Format: /history [n] atau /search <kata>{Style.RESET_ALL}")
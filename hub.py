@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Hub Mode
+Server yang terus menerima koneksi dan menyebarkan chat ke banyak client
+Author: Terminal Chat Bluetooth
+"""
+
+import asyncio
+import os
+import socket
+import time
+from collections import deque
+from datetime import datetime
+from colorama import Fore, Style
+
+from compression import DEFAULT_CODEC, DEFAULT_LEVEL, make_compressor
+from engine import DRAIN_TIMEOUT, AsyncChatEngine, AsyncStdin, QueueWriter, QueueFullError
+from heartbeat import DEFAULT_HEARTBEAT_INTERVAL
+from history import handle_command as handle_history_command, is_history_command
+from metrics import MetricsDumper
+from protocol import CHANNEL_CHAT, CHANNEL_FINAL, FrameReader, encode_message_frame
+from reliable import ACK_INTERVAL
+from renderer import show
+from session import PROGRESS_INTERVAL, ChatSession
+from wire import timestamp_now
+
+# Batas antrean keluar per client; client yang lebih lambat diputus
+PEER_QUEUE_LIMIT = 4 * 1024 * 1024
+# Jumlah sampel latensi fan-out yang disimpan
+LATENCY_SAMPLES = 1000
+
+
+def percentile(samples, fraction):
+    """Nilai persentil dari daftar sampel"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FanoutTracker:
+    """Mengukur waktu dari broadcast sampai frame terkirim ke semua client"""
+
+    def __init__(self, samples, pending):
+        self.samples = samples
+        self.pending = pending
+        self.started = time.perf_counter()
+
+    def sent(self):
+        self.pending -= 1
+        if self.pending == 0:
+            self.samples.append(time.perf_counter() - self.started)
+
+
+class HubPeer(ChatSession):
+    """Satu client yang terhubung ke hub"""
+
+    role = 'server'
+
+    def __init__(self, hub, peer_id, sock, address):
+        # Buffer kirim ulang hanya di memori; journal --outbox milik satu sesi saja
+        super().__init__(**dict(hub.session_options, outbox_path=None))
+        self.hub = hub
+        self.peer_id = peer_id
+        self.address = address
+        self.peer_label = f"Client {peer_id}"
+        self.metrics.label = self.peer_label
+        self.compressor = hub.compressor
+        self.socket = sock
+        self.reader = FrameReader(sock)
+        self.connected = True
+        self.writer = QueueWriter(hub.loop, sock, limit=PEER_QUEUE_LIMIT, metrics=self.metrics,
+                                  max_delay=self.batch_delay, max_batch=self.batch_size)
+        self.async_engine = hub
+
+    def find_delivery(self, peer_session):
+        """Client yang menyambung ulang memakai state dedup yang sama dengan koneksi sebelumnya"""
+        return self.hub.deliveries.setdefault(peer_session, self.delivery)
+
+    def handle_message(self, message):
+        """Menangani pesan client dan meneruskan chat ke client lain
+
+        Pesan yang dikirim ulang setelah reconnect dan sudah pernah diterima
+        tidak diteruskan lagi.
+        """
+        accepted = super().handle_message(message)
+        if accepted and message.get('type') == 'text':
+            self.hub.broadcast_text(message['content'], sender=self.peer_label, exclude=self)
+        return accepted
+
+    async def serve(self):
+        self.running = True
+        self.socket.setblocking(False)
+        writer_task = asyncio.create_task(self.writer.run())
+        try:
+            self.send_hello()
+            await self.hub.receive_loop(self)
+        finally:
+            self.running = False
+            try:
+                await asyncio.wait_for(self.writer.drain(), 1)
+            except asyncio.TimeoutError:
+                pass
+            self.writer.close()
+            writer_task.cancel()
+            await asyncio.gather(writer_task, return_exceptions=True)
+            self.socket.close()
+            self.hub.remove_peer(self)
+
+    def disconnect(self):
+        """Memutus client dari sisi hub
+
+        Socket hanya di-shutdown: penerima dan penulis yang sedang menunggu di
+        event loop selesai dengan sendirinya, lalu serve() menutup socket-nya.
+        """
+        self.running = False
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class ChatHub(AsyncChatEngine):
+    """Hub chat: banyak client, satu event loop, antrean keluar per client"""
+
+    def __init__(self, server_socket, session_options, max_clients, transport=None):
+        super().__init__(None, max_workers=8)
+        self.server_socket = server_socket
+        self.transport = transport
+        self.session_options = session_options
+        self.max_clients = max_clients
+        self.compressor = make_compressor(session_options.get('compression', DEFAULT_CODEC),
+                                          session_options.get('compression_level', DEFAULT_LEVEL))
+        self.peers = {}
+        self.next_peer_id = 1
+        self.fanout_latency = deque(maxlen=LATENCY_SAMPLES)
+        # State pengiriman andal per sesi client, bertahan saat client menyambung ulang
+        self.deliveries = {}
+        self.history = HubPeer.open_history(session_options.get('history_dir'))
+        self.running = False
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.server_socket.setblocking(False)
+        self.running = True
+
+        metrics_file = self.session_options.get('metrics_file')
+        if metrics_file:
+            dumper = MetricsDumper(metrics_file, lambda: [peer.metrics for peer in self.peers.values()])
+            self.schedule_every(self.session_options['metrics_interval'], dumper.dump)
+        self.schedule_every(ACK_INTERVAL, self.ack_tick)
+        self.schedule_every(PROGRESS_INTERVAL, self.progress_tick)
+        heartbeat_interval = self.session_options.get('heartbeat_interval', DEFAULT_HEARTBEAT_INTERVAL)
+        if heartbeat_interval > 0:
+            self.schedule_every(heartbeat_interval, self.heartbeat_tick)
+
+        accept_task = asyncio.create_task(self.accept_loop())
+        try:
+            await self.input_loop()
+        finally:
+            self.running = False
+            for task in [accept_task] + self.timers:
+                task.cancel()
+            await asyncio.gather(accept_task, *self.timers, return_exceptions=True)
+            for peer in list(self.peers.values()):
+                peer.disconnect()
+            if self.stdin is not None:
+                self.stdin.close()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            # Pesan yang masih di antrean riwayat ditulis sebelum proses keluar
+            if self.history is not None:
+                self.history.flush()
+
+    async def accept_loop(self):
+        """Terus menerima client baru"""
+        while self.running:
+            sock, address = await self.loop.sock_accept(self.server_socket)
+            if self.transport is not None:
+                self.transport.configure(sock)
+            if len(self.peers) >= self.max_clients:
+                show(f"{Fore.RED}❌ Client ditolak, hub penuh: {address}{Style.RESET_ALL}")
+                sock.close()
+                continue
+
+            peer = HubPeer(self, self.next_peer_id, sock, address)
+            self.next_peer_id += 1
+            self.peers[peer.peer_id] = peer
+            show(f"{Fore.GREEN}✅ {peer.peer_label} terhubung: {address} ({len(self.peers)} client){Style.RESET_ALL}")
+            self.loop.create_task(peer.serve())
+
+    def ack_tick(self):
+        for peer in list(self.peers.values()):
+            peer.ack_tick()
+
+    def progress_tick(self):
+        for peer in list(self.peers.values()):
+            peer.progress_tick()
+
+    def heartbeat_tick(self):
+        """Ping semua client dan putuskan yang tidak merespons"""
+        for peer in list(self.peers.values()):
+            peer.heartbeat_tick()
+
+    def remove_peer(self, peer):
+        if self.peers.pop(peer.peer_id, None) is not None:
+            show(f"{Fore.YELLOW}👥 {len(self.peers)} client terhubung{Style.RESET_ALL}")
+
+    def broadcast_text(self, text, sender=None, exclude=None):
+        """Mengirim satu pesan teks ke semua client, return jumlah penerima"""
+        message = {
+            'type': 'text',
+            'content': text,
+            'timestamp': timestamp_now()
+        }
+        if sender:
+            message['sender'] = sender
+        return self.broadcast(message, exclude)
+
+    def broadcast(self, message, exclude=None):
+        """Menyebarkan pesan ke semua client tanpa menunggu client yang lambat"""
+        peers = [peer for peer in self.peers.values() if peer is not exclude]
+        if not peers:
+            return 0
+
+        # Frame di-encode sekali per format pesan dan compressor, bukan sekali per client
+        frames = {}
+        tracker = FanoutTracker(self.fanout_latency, len(peers))
+        channel = CHANNEL_FINAL if message['type'] == 'disconnect' else CHANNEL_CHAT
+        for peer in peers:
+            key = (peer.peer_wire, peer.peer_compressor)
+            if key not in frames:
+                frames[key] = encode_message_frame(message, key[1], key[0])
+            try:
+                # Chat mendahului chunk file yang mengantre; disconnect menunggu semuanya
+                peer.writer.write(frames[key], tracker.sent, channel=channel)
+            except QueueFullError:
+                show(f"{Fore.RED}❌ {peer.peer_label} terlalu lambat, koneksi diputus{Style.RESET_ALL}")
+                tracker.pending -= 1
+                peer.disconnect()
+            except ConnectionError:
+                tracker.pending -= 1
+        return len(peers)
+
+    def print_help(self):
+        show(f"{Fore.GREEN}✅ Hub aktif! Ketik pesan atau gunakan perintah:{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /file <path> - Kirim file ke semua client{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /sendto <id> <path> - Kirim file ke satu client{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /senddir <path> - Kirim folder ke semua client{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /peers - Daftar client{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /transfers - Progres transfer per client{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /latency - Latensi fan-out pesan{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /ping - Ukur RTT ke semua client{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /stats - Statistik koneksi per client{Style.RESET_ALL}")
+        if self.history is not None:
+            show(f"{Fore.YELLOW}  /history [n] - Tampilkan n pesan terakhir{Style.RESET_ALL}")
+            show(f"{Fore.YELLOW}  /search <kata> - Cari pesan di riwayat{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /quit - Keluar{Style.RESET_ALL}")
+        show("-" * 50)
+
+    async def input_loop(self):
+        if self.session_options.get('headless'):
+            # Tanpa stdin: hub berjalan sampai dihentikan (Ctrl+C atau SIGTERM)
+            show(f"{Fore.GREEN}✅ Hub aktif tanpa input (headless){Style.RESET_ALL}")
+            await self.loop.create_future()
+
+        self.stdin = AsyncStdin(self.loop)
+        await self.stdin.start()
+        self.print_help()
+
+        while self.running:
+            line = await self.stdin.readline()
+            if line is None or line.lower() == '/quit':
+                await self.wait_background()
+                self.broadcast({'type': 'disconnect', 'timestamp': timestamp_now()})
+                await self.drain_peers()
+                break
+            try:
+                self.handle_command(line)
+            except Exception as e:
+                show(f"{Fore.RED}❌ Error: {e}{Style.RESET_ALL}")
+            # Beri giliran ke task penulis walau stdin berisi banyak baris
+            await asyncio.sleep(0)
+
+    async def drain_peers(self):
+        """Menunggu antrean semua client terkirim; client yang macet diputus setelah DRAIN_TIMEOUT"""
+        drains = [peer.writer.drain() for peer in self.peers.values()]
+        try:
+            await asyncio.wait_for(asyncio.gather(*drains), DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            for peer in list(self.peers.values()):
+                if peer.writer.queued_bytes:
+                    show(f"{Fore.YELLOW}⚠️  {peer.peer_label} tidak membaca data, koneksi ditutup{Style.RESET_ALL}")
+                    peer.disconnect()
+
+    def handle_command(self, user_input):
+        if user_input.startswith('/file '):
+            file_path = user_input[6:].strip()
+            if not os.path.exists(file_path):
+                show(f"{Fore.RED}❌ File tidak ditemukan: {file_path}{Style.RESET_ALL}")
+                return
+            for peer in self.peers.values():
+                self.run_background(peer.send_file, file_path)
+
+        elif user_input.startswith('/senddir '):
+            dir_path = user_input[9:].strip()
+            if not os.path.isdir(dir_path):
+                show(f"{Fore.RED}❌ Folder tidak ditemukan: {dir_path}{Style.RESET_ALL}")
+                return
+            for peer in self.peers.values():
+                self.run_background(peer.send_directory, dir_path)
+
+        elif user_input.startswith('/sendto '):
+            parts = user_input[8:].strip().split(None, 1)
+            if len(parts) != 2 or not parts[0].isdigit():
+                show(f"{Fore.RED}❌ Format: /sendto <id> <path>{Style.RESET_ALL}")
+                return
+            peer = self.peers.get(int(parts[0]))
+            if peer is None:
+                show(f"{Fore.RED}❌ Client {parts[0]} tidak ditemukan{Style.RESET_ALL}")
+                return
+            self.run_background(peer.send_file, parts[1])
+
+        elif user_input == '/peers':
+            show(f"{Fore.GREEN}👥 {len(self.peers)} client terhubung:{Style.RESET_ALL}")
+            for peer in self.peers.values():
+                queued = peer.writer.queued_bytes
+                show(f"{Fore.CYAN}  {peer.peer_id}. {peer.address} (antrean {queued} bytes){Style.RESET_ALL}")
+
+        elif user_input == '/transfers':
+            if not self.peers:
+                show(f"{Fore.YELLOW}Belum ada client terhubung{Style.RESET_ALL}")
+            for peer in self.peers.values():
+                peer.print_transfers()
+
+        elif user_input == '/latency':
+            self.print_latency()
+
+        elif user_input == '/ping':
+            for peer in self.peers.values():
+                peer.send_ping()
+
+        elif user_input == '/stats':
+            if not self.peers:
+                show(f"{Fore.YELLOW}Belum ada client terhubung{Style.RESET_ALL}")
+            for peer in self.peers.values():
+                peer.print_stats()
+
+        elif is_history_command(user_input) and self.history is not None:
+            handle_history_command(self.history, user_input, self.run_background)
+
+        else:
+            count = self.broadcast_text(user_input)
+            timestamp = datetime.now().strftime('%H:%M:%S')
+            show(f"{Fore.MAGENTA}[{timestamp}] Anda → {count} client: {user_input}{Style.RESET_ALL}")
+            if self.history is not None:
+                self.history.append("Anda", user_input)
+
+    def print_latency(self):
+        samples = list(self.fanout_latency)
+        if not samples:
+            show(f"{Fore.YELLOW}Belum ada pesan yang disebarkan{Style.RESET_ALL}")
+            return
+        p50, p95, p99 = (percentile(samples, f) * 1000 for f in (0.5, 0.95, 0.99))
+        show(f"{Fore.GREEN}📊 Latensi fan-out ({len(samples)} pesan): "
+              f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, "
+              f"max {max(samples) * 1000:.2f} ms{Style.RESET_ALL}")
+
+
+def run_hub(server_socket, session_options, max_clients, transport=None):
+    """Menjalankan hub sampai pengguna keluar"""
+    asyncio.run(ChatHub(server_socket, session_options, max_clients, transport).run())
@@ -5,15 +5,77 @@ Aplikasi chat dan transfer file menggunakan koneksi Bluetooth
 Author: Terminal Chat Bluetooth
 """
 
-import sys
+import time
+
+# Titik awal pengukuran startup; diambil sebelum modul lain dimuat
+STARTED = time.perf_counter()
+
+import argparse
 import os
-from colorama import init, Fore, Style
+import signal
+import sys
+
+MODES = ('server', 'client')
+
+
+def process_age():
+    """Detik sejak proses (interpreter) dimulai, None jika tidak bisa dibaca (non-Linux)"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Field setelah nama proses; starttime adalah field ke-22
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """Mengukur waktu cold start: impor modul mode dan waktu sampai siap"""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.import_time = None
+        self.reported = False
+
+    def imported(self, started):
+        self.import_time = time.perf_counter() - started
+
+    def ready(self):
+        """Dipanggil sesi saat server sudah listen atau client sudah terhubung"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        from colorama import Fore, Style
+        elapsed = time.perf_counter() - STARTED
+        age = process_age()
+        since_exec = f", {age * 1000:.0f} ms sejak proses dimulai" if age is not None else ""
+        print(f"{Fore.CYAN}⏱️  Startup: impor {self.import_time * 1000:.1f} ms, "
+              f"siap {elapsed * 1000:.1f} ms sejak main.py dimulai{since_exec}{Style.RESET_ALL}",
+              flush=True)
+
+
+def handle_sigterm(signum, frame):
+    """SIGTERM (mis. dari supervisor) diperlakukan seperti Ctrl+C agar resource dibersihkan"""
+    raise KeyboardInterrupt
+
+
+def run_mode(mode, argv, timer):
+    """Menjalankan server atau client di proses ini, return exit status"""
+    started = time.perf_counter()
+    # Modul mode (dan dependensinya) baru dimuat di sini, bukan saat main.py dibuka
+    if mode == 'server':
+        import server as module
+    else:
+        import client as module
+    timer.imported(started)
+    return module.main(argv, on_ready=timer.ready)
 
-# Initialize colorama
-init()
 
 def show_menu():
     """Menampilkan menu utama"""
+    from colorama import Fore, Style
     print(f"{Fore.BLUE}╔══════════════════════════════════════════════════════╗{Style.RESET_ALL}")
     print(f"{Fore.BLUE}║              BLUETOOTH CHAT APPLICATION              ║{Style.RESET_ALL}")
     print(f"{Fore.BLUE}║            Chat & File Transfer via Bluetooth       ║{Style.RESET_ALL}")
@@ -25,38 +87,80 @@ def show_menu():
     print(f"{Fore.CYAN}  3. Keluar{Style.RESET_ALL}")
     print()
 
-def main():
-    """Fungsi utama aplikasi"""
+
+def run_menu(argv, timer):
+    """Menu interaktif; opsi lain di command line diteruskan ke mode yang dipilih"""
+    from colorama import init, Fore, Style
+    init()
     while True:
         show_menu()
-        
+
         try:
             choice = input(f"{Fore.YELLOW}Masukkan pilihan (1-3): {Style.RESET_ALL}")
-            
+
             if choice == '1':
                 print(f"{Fore.GREEN}🚀 Memulai Server Mode...{Style.RESET_ALL}")
                 print()
-                os.system('python3 server.py')
-                
+                status = run_mode('server', argv, timer)
+
             elif choice == '2':
                 print(f"{Fore.GREEN}🚀 Memulai Client Mode...{Style.RESET_ALL}")
                 print()
-                os.system('python3 client.py')
-                
+                status = run_mode('client', argv, timer)
+
             elif choice == '3':
                 print(f"{Fore.YELLOW}👋 Selamat tinggal!{Style.RESET_ALL}")
-                sys.exit(0)
-                
+                return 0
+
             else:
                 print(f"{Fore.RED}❌ Pilihan tidak valid. Silakan coba lagi.{Style.RESET_ALL}")
                 input(f"{Fore.YELLOW}Tekan Enter untuk melanjutkan...{Style.RESET_ALL}")
-                
-        except KeyboardInterrupt:
+                continue
+
+            if status:
+                print(f"{Fore.RED}❌ Mode selesai dengan status {status}{Style.RESET_ALL}")
+
+        except (KeyboardInterrupt, EOFError):
             print(f"\n{Fore.YELLOW}👋 Selamat tinggal!{Style.RESET_ALL}")
-            sys.exit(0)
+            return 0
         except Exception as e:
             print(f"{Fore.RED}❌ Error: {e}{Style.RESET_ALL}")
             input(f"{Fore.YELLOW}Tekan Enter untuk melanjutkan...{Style.RESET_ALL}")
 
+
+def parse_args(argv):
+    """Memisahkan mode dan opsi launcher; opsi lain diteruskan ke server.py/client.py"""
+    parser = argparse.ArgumentParser(
+        description="Bluetooth Chat - launcher server/client",
+        usage="%(prog)s [server|client] [--startup-time] [opsi server/client ...]",
+        epilog="Tanpa mode, menu interaktif ditampilkan. Opsi lain (--transport, --port, "
+               "--addr, --downloads, ...) sama dengan server.py/client.py; "
+               "lihat '%(prog)s server --help' atau '%(prog)s client --help'.",
+        add_help=False)
+    parser.add_argument('mode', nargs='?', choices=MODES,
+                        help="Mode yang dijalankan tanpa menu")
+    parser.add_argument('--startup-time', action='store_true',
+                        help="Tampilkan waktu startup (impor dan sampai siap)")
+    parser.add_argument('-h', '--help', action='store_true',
+                        help="Tampilkan bantuan ini")
+    args, rest = parser.parse_known_args(argv)
+    if args.help:
+        if args.mode is None:
+            parser.print_help()
+            sys.exit(0)
+        rest.append('--help')
+    return args, rest
+
+
+def main(argv=None):
+    """Fungsi utama aplikasi, return exit status"""
+    args, rest = parse_args(sys.argv[1:] if argv is None else argv)
+    timer = StartupTimer(args.startup_time)
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    if args.mode is None:
+        return run_menu(rest, timer)
+    return run_mode(args.mode, rest, timer)
+
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Metrics
+Instrumentasi ringan per sesi: pesan, byte, waktu encode/decode/socket, throughput
+Author: Terminal Chat Bluetooth
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+
+
+class SessionMetrics:
+    """Counter dan timer untuk satu koneksi; aman dipakai dari beberapa thread"""
+
+    def __init__(self, label="session"):
+        self.label = label
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.sent_messages = defaultdict(int)
+        self.sent_bytes = defaultdict(int)
+        self.received_messages = defaultdict(int)
+        self.received_bytes = defaultdict(int)
+        self.timings = defaultdict(float)
+        self.timing_counts = defaultdict(int)
+        self.transfers = {'sent': [0, 0.0, 0], 'received': [0, 0.0, 0]}
+        self.max_queue_bytes = 0
+        self.gauges = []
+
+    def record_sent(self, msg_type, size):
+        with self.lock:
+            self.sent_messages[msg_type] += 1
+            self.sent_bytes[msg_type] += size
+
+    def record_received(self, msg_type, size):
+        with self.lock:
+            self.received_messages[msg_type] += 1
+            self.received_bytes[msg_type] += size
+
+    def record_time(self, name, seconds):
+        with self.lock:
+            self.timings[name] += seconds
+            self.timing_counts[name] += 1
+
+    def record_transfer(self, direction, size, seconds, files=1):
+        """Mencatat file yang selesai: direction 'sent' atau 'received'"""
+        with self.lock:
+            total = self.transfers[direction]
+            total[0] += size
+            total[1] += seconds
+            total[2] += files
+
+    def add_gauge(self, name, read):
+        """Mendaftarkan fungsi yang mengembalikan nilai saat ini (misalnya kedalaman antrean)"""
+        self.gauges.append((name, read))
+
+    def gauge_values(self):
+        values = {name: read() for name, read in self.gauges}
+        queued = values.get('write_queue_bytes', 0)
+        if queued > self.max_queue_bytes:
+            self.max_queue_bytes = queued
+        values['write_queue_bytes_max'] = self.max_queue_bytes
+        return values
+
+    def snapshot(self):
+        """Semua metrik sebagai dict yang bisa di-serialize ke JSON"""
+        with self.lock:
+            timings = {
+                name: {
+                    'calls': self.timing_counts[name],
+                    'total_ms': round(total * 1000, 3),
+                    'avg_us': round(total / self.timing_counts[name] * 1e6, 2),
+                }
+                for name, total in self.timings.items()
+            }
+            transfers = {
+                direction: {
+                    'files': count,
+                    'bytes': size,
+                    'mb_per_sec': round(size / seconds / (1024 * 1024), 2) if seconds else 0.0,
+                }
+                for direction, (size, seconds, count) in self.transfers.items()
+            }
+            snapshot = {
+                'label': self.label,
+                'time': round(time.time(), 3),
+                'uptime_sec': round(time.time() - self.started, 3),
+                'sent': {'messages': dict(self.sent_messages), 'bytes': dict(self.sent_bytes)},
+                'received': {'messages': dict(self.received_messages),
+                             'bytes': dict(self.received_bytes)},
+                'timings': timings,
+                'transfers': transfers,
+            }
+        snapshot['gauges'] = self.gauge_values()
+        return snapshot
+
+    def summary_lines(self):
+        """Ringkasan singkat untuk perintah /stats"""
+        snapshot = self.snapshot()
+        lines = [f"📊 Statistik koneksi ke {self.label} (uptime {snapshot['uptime_sec']:.0f} s)"]
+        for direction, title in (('sent', "Dikirim"), ('received', "Diterima")):
+            data = snapshot[direction]
+            total_bytes = sum(data['bytes'].values())
+            detail = ", ".join(f"{msg_type} {count}" for msg_type, count in sorted(data['messages'].items()))
+            lines.append(f"  {title}: {total_bytes} bytes ({detail or '-'})")
+        for name, timing in sorted(snapshot['timings'].items()):
+            lines.append(f"  {name}: {timing['calls']} kali, total {timing['total_ms']:.1f} ms, "
+                         f"rata-rata {timing['avg_us']:.1f} µs")
+        for direction, title in (('sent', "File dikirim"), ('received', "File diterima")):
+            transfer = snapshot['transfers'][direction]
+            if transfer['files']:
+                lines.append(f"  {title}: {transfer['files']} file, {transfer['bytes']} bytes, "
+                             f"{transfer['mb_per_sec']:.2f} MB/s")
+        gauges = ", ".join(f"{name} {value}" for name, value in snapshot['gauges'].items())
+        lines.append(f"  Antrean & socket: {gauges}")
+        return lines
+
+
+class MetricsDumper:
+    """Menulis snapshot metrik sebagai JSON lines ke file secara periodik"""
+
+    def __init__(self, path, metrics_sources):
+        self.path = path
+        self.metrics_sources = metrics_sources
+        self.lock = threading.Lock()
+
+    def dump(self):
+        lines = [json.dumps(metrics.snapshot(), separators=(',', ':'))
+                 for metrics in self.metrics_sources()]
+        if not lines:
+            return
+        with self.lock, open(self.path, 'a') as f:
+            f.write("\n".join(lines) + "\n")
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Protocol
+Framing pesan dengan prefix panjang untuk koneksi stream (RFCOMM)
+Author: Terminal Chat Bluetooth
+"""
+
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+
+from compression import CODEC_NONE, DecompressError, decompress
+from wire import WIRE_BINARY, WIRE_JSON, decode_binary, decode_json, encode_binary, encode_json
+
+# Setiap frame: jenis frame (1 byte), codec kompresi (1 byte),
+# panjang payload (4 byte, big-endian), lalu payload
+HEADER = struct.Struct('!BBI')
+# Payload frame chunk: id transfer, offset di file, checksum chunk, lalu data mentah
+CHUNK_HEADER = struct.Struct('!IQI')
+
+FRAME_MESSAGE = 0
+FRAME_CHUNK = 1
+# Pesan dalam format biner (wire.py); hanya dikirim ke peer yang mengumumkannya di hello
+FRAME_BINARY = 2
+
+# Muat beberapa frame chunk sekaligus agar sisa frame jarang perlu digeser
+RECV_BUFFER_SIZE = 256 * 1024
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+# Frame kecil digabung dengan header agar terkirim dalam satu write
+SMALL_FRAME_SIZE = 16 * 1024
+# Batas byte beberapa frame kecil yang digabung menjadi satu write
+DEFAULT_BATCH_SIZE = 64 * 1024
+
+# Kanal logis di satu koneksi, urut prioritas pengiriman: kontrol (hello, ack,
+# ping, jawaban transfer), chat, lalu satu kanal bulk per transfer
+CHANNEL_CONTROL = 0
+CHANNEL_CHAT = 1
+CHANNEL_BULK = 2
+# Frame penutup (disconnect): dikirim setelah semua kanal lain kosong
+CHANNEL_FINAL = -1
+
+
+class ProtocolError(Exception):
+    """Frame yang diterima tidak valid"""
+
+
+def encode_message(message, wire=WIRE_JSON):
+    """Mengubah dict pesan menjadi payload bytes dalam format `wire`"""
+    if wire == WIRE_BINARY:
+        return encode_binary(message)
+    return encode_json(message)
+
+
+def decode_message(payload, kind=FRAME_MESSAGE):
+    """Mengubah payload bytes menjadi dict pesan sesuai jenis frame-nya"""
+    if kind == FRAME_BINARY:
+        return decode_binary(payload)
+    return decode_json(payload)
+
+
+def sendall(sock, data):
+    """Mengirim seluruh data, dengan fallback untuk socket tanpa sendall"""
+    send_all = getattr(sock, 'sendall', None)
+    if send_all is not None:
+        send_all(data)
+        return
+
+    view = memoryview(data)
+    while view:
+        sent = sock.send(view)
+        view = view[sent:]
+
+
+class FileRegion:
+    """Bagian file sebagai isi frame, dikirim kernel langsung dari page cache (sendfile)
+
+    Region memegang objek file-nya, jadi file tetap terbuka selama region masih
+    mengantre di writer.
+    """
+
+    __slots__ = ('file', 'offset', 'count')
+
+    def __init__(self, file, offset, count):
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+
+def can_sendfile(sock):
+    """True jika isi file bisa dikirim ke socket ini dengan os.sendfile"""
+    return hasattr(os, 'sendfile') and isinstance(sock, socket.socket)
+
+
+def send_part(sock, part):
+    """Mengirim satu bagian frame: bytes/memoryview, atau FileRegion lewat sendfile"""
+    if isinstance(part, FileRegion):
+        sock.sendfile(part.file, part.offset, part.count)
+    else:
+        sendall(sock, part)
+
+
+def encode_frame(kind, payload, prefix=b'', compressor=None):
+    """Menyusun satu frame berprefix panjang menjadi daftar bagian bytes"""
+    codec = CODEC_NONE
+    if compressor is not None:
+        codec, compressed = compressor.maybe_compress(prefix, payload)
+        if codec != CODEC_NONE:
+            prefix, payload = b'', compressed
+
+    size = len(prefix) + len(payload)
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolError(f"Frame terlalu besar: {size} bytes")
+
+    header = HEADER.pack(kind, codec, size) + prefix
+    if size <= SMALL_FRAME_SIZE:
+        return [header + payload]
+    return [header, payload]
+
+
+def encode_message_frame(message, compressor=None, wire=WIRE_JSON):
+    """Menyusun frame untuk dict pesan dalam format `wire`"""
+    kind = FRAME_BINARY if wire == WIRE_BINARY else FRAME_MESSAGE
+    return encode_frame(kind, encode_message(message, wire), compressor=compressor)
+
+
+def encode_chunk_frame(transfer_id, offset, checksum, data, compressor=None):
+    """Menyusun frame biner untuk satu potongan data file"""
+    return encode_frame(FRAME_CHUNK, data, CHUNK_HEADER.pack(transfer_id, offset, checksum),
+                        compressor=compressor)
+
+
+def encode_region_frame(transfer_id, offset, checksum, region):
+    """Seperti encode_chunk_frame(), tetapi data chunk tidak dibaca ke memori"""
+    header = (HEADER.pack(FRAME_CHUNK, CODEC_NONE, CHUNK_HEADER.size + len(region))
+              + CHUNK_HEADER.pack(transfer_id, offset, checksum))
+    return [header, region]
+
+
+def bulk_channel(stream_id):
+    """Kanal bulk untuk satu transfer (atau satu /senddir)"""
+    return CHANNEL_BULK + stream_id
+
+
+def frame_size(parts):
+    """Jumlah byte frame di jalur"""
+    return sum(len(part) for part in parts)
+
+
+def coalesce(parts, max_batch=DEFAULT_BATCH_SIZE):
+    """Menggabungkan bagian-bagian kecil menjadi buffer sampai max_batch byte
+
+    Bagian yang sudah sebesar max_batch (misalnya data chunk file) dan FileRegion
+    dikirim apa adanya tanpa disalin. Urutan byte tidak berubah.
+    """
+    batch = bytearray()
+    for part in parts:
+        if isinstance(part, FileRegion) or len(part) >= max_batch:
+            if batch:
+                yield batch
+                batch = bytearray()
+            yield part
+            continue
+        if len(batch) + len(part) > max_batch:
+            yield batch
+            batch = bytearray()
+        batch += part
+    if batch:
+        yield batch
+
+
+class FrameScheduler:
+    """Antrean frame keluar per kanal, diambil menurut prioritas
+
+    Frame kanal kontrol selalu diambil lebih dulu, lalu chat; kanal bulk
+    dilayani bergiliran per frame sehingga beberapa transfer berjalan
+    bersamaan dan chat tidak pernah menunggu di belakang chunk file yang
+    mengantre. Kanal final baru diambil jika semua kanal lain kosong. Urutan
+    frame dalam satu kanal tidak pernah berubah. Tidak thread-safe; writer
+    memegang lock-nya sendiri.
+    """
+
+    def __init__(self):
+        self.urgent = (deque(), deque())
+        self.bulk = OrderedDict()
+        self.final = deque()
+        self.queued_bytes = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, item, size, channel=CHANNEL_CONTROL):
+        if channel == CHANNEL_FINAL:
+            lane = self.final
+        elif channel < CHANNEL_BULK:
+            lane = self.urgent[channel]
+        else:
+            lane = self.bulk.get(channel)
+            if lane is None:
+                lane = self.bulk[channel] = deque()
+        lane.append((item, size))
+        self.queued_bytes += size
+        self.count += 1
+
+    def _next_lane(self):
+        """(antrean, kanal bulk atau None) yang mendapat giliran berikutnya"""
+        for lane in self.urgent:
+            if lane:
+                return lane, None
+        if self.bulk:
+            channel = next(iter(self.bulk))
+            return self.bulk[channel], channel
+        if self.final:
+            return self.final, None
+        return None, None
+
+    def pop(self):
+        """(item, size) berikutnya, None jika antrean kosong"""
+        lane, channel = self._next_lane()
+        if lane is None:
+            return None
+        entry = lane.popleft()
+        if channel is not None:
+            # Giliran kanal bulk berikutnya; kanal yang kosong dihapus
+            del self.bulk[channel]
+            if lane:
+                self.bulk[channel] = lane
+        self.queued_bytes -= entry[1]
+        self.count -= 1
+        return entry
+
+    def pop_batch(self, max_batch=DEFAULT_BATCH_SIZE):
+        """Entri berikutnya sampai max_batch byte (minimal satu), urut prioritas"""
+        batch = []
+        total = 0
+        while True:
+            lane, _ = self._next_lane()
+            if lane is None or (batch and total + lane[0][1] > max_batch):
+                return batch
+            entry = self.pop()
+            batch.append(entry)
+            total += entry[1]
+
+
+class SocketWriter:
+    """Menulis frame ke socket secara blocking (mode thread)
+
+    Frame yang ditulis selagi thread lain sedang mengirim ikut terkirim dalam
+    write berikutnya, bukan satu write per frame. Frame yang menunggu diambil
+    menurut prioritas kanalnya (lihat FrameScheduler), jadi chat yang diketik
+    selama transfer file hanya menunggu chunk yang sedang dikirim. Dengan
+    max_delay > 0, frame ditahan paling lama max_delay detik untuk dikumpulkan,
+    kecuali antrean sudah mencapai max_batch byte. Urutan frame dalam satu
+    kanal tidak pernah berubah.
+    """
+
+    def __init__(self, sock, metrics=None, max_delay=0, max_batch=DEFAULT_BATCH_SIZE):
+        self.sock = sock
+        self.metrics = metrics
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.pending = FrameScheduler()
+        # True selama pemegang lock masih akan mengambil frame dari antrean
+        self.sending = False
+        self.closed = False
+        self.error = None
+        self.flusher = None
+
+    @property
+    def queued_bytes(self):
+        return self.pending.queued_bytes
+
+    @property
+    def queued_frames(self):
+        """Jumlah frame yang masih mengantre (batch-delay)"""
+        return len(self.pending)
+
+    @property
+    def retains_parts(self):
+        """True jika bagian frame masih dipegang setelah write() kembali (lihat FileSource.detach())"""
+        return self.max_delay > 0
+
+    def write(self, parts, blocking=True, channel=CHANNEL_CONTROL):
+        """Menulis frame; dengan blocking=False return False jika socket sedang dipakai"""
+        if self.error is not None:
+            raise ConnectionError(f"Koneksi sudah ditutup: {self.error}")
+
+        if not blocking:
+            with self.condition:
+                if self.sending:
+                    # Thread yang sedang mengirim mengambil frame ini sebelum melepas socket
+                    self.pending.push(parts, frame_size(parts), channel)
+                    return True
+            if not self.lock.acquire(False):
+                return False
+            try:
+                self._append(parts, channel)
+                self._flush_locked()
+            finally:
+                self.lock.release()
+            return True
+
+        if self.max_delay > 0:
+            # Ditulis nanti oleh thread flusher; pengirim chunk memakai buffer baru (retains_parts)
+            self._append(parts, channel)
+            if self.queued_bytes < self.max_batch:
+                self._start_flusher()
+                return True
+        elif self.lock.acquire(False):
+            try:
+                self._append(parts, channel)
+                self._flush_locked()
+            finally:
+                self.lock.release()
+            return True
+        else:
+            # Socket sedang dipakai: frame ikut terkirim bersama frame lain yang menunggu
+            self._append(parts, channel)
+        self.flush()
+        return True
+
+    def _append(self, parts, channel):
+        with self.condition:
+            self.pending.push(parts, frame_size(parts), channel)
+            self.condition.notify()
+
+    def flush(self):
+        """Mengirim semua frame yang tertahan sekarang juga"""
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        try:
+            while True:
+                # Prioritas dicek ulang setiap batch: chat yang baru masuk mendahului chunk berikutnya
+                with self.condition:
+                    batch = self.pending.pop_batch(self.max_batch)
+                    self.sending = bool(batch)
+                if not batch:
+                    return
+                self._send([part for parts, _ in batch for part in parts])
+        finally:
+            self.sending = False
+
+    def _send(self, parts):
+        started = time.perf_counter()
+        try:
+            for data in (parts if len(parts) == 1 else coalesce(parts, self.max_batch)):
+                send_part(self.sock, data)
+        except OSError as e:
+            self.error = e
+            raise
+        if self.metrics is not None:
+            self.metrics.record_time('socket_send', time.perf_counter() - started)
+
+    def _start_flusher(self):
+        with self.condition:
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self.flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+            time.sleep(self.max_delay)
+            try:
+                self.flush()
+            except OSError:
+                return
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+def parse_chunk(payload):
+    """Memisahkan payload frame chunk menjadi (transfer_id, offset, checksum, data)"""
+    if len(payload) < CHUNK_HEADER.size:
+        raise ProtocolError("Frame chunk terlalu pendek")
+    transfer_id, offset, checksum = CHUNK_HEADER.unpack_from(payload)
+    return transfer_id, offset, checksum, memoryview(payload)[CHUNK_HEADER.size:]
+
+
+class FrameReader:
+    """Merakit frame utuh dari stream socket memakai buffer yang dipakai ulang
+
+    Buffer diisi dengan recv_into (atau recv untuk socket yang tidak
+    mendukungnya) lewat read_frame() yang blocking, atau read_frame_async()
+    di dalam event loop asyncio.
+    """
+
+    def __init__(self, sock, buffer_size=RECV_BUFFER_SIZE):
+        self.sock = sock
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self._needed = HEADER.size
+        self._recv_into = getattr(sock, 'recv_into', None)
+        self.recv_calls = 0
+        self.bytes_received = 0
+
+    def _available(self):
+        return self._end - self._start
+
+    def _reserve(self, needed):
+        """Memastikan ada ruang untuk `needed` byte mulai dari self._start"""
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        if self._start + needed <= len(self._buffer):
+            return
+
+        pending = self._available()
+        if needed <= len(self._buffer):
+            # Geser sisa data ke awal buffer
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+        else:
+            buffer = bytearray(needed)
+            buffer[:pending] = self._view[self._start:self._end]
+            self._view.release()
+            self._buffer = buffer
+            self._view = memoryview(self._buffer)
+
+        self._start = 0
+        self._end = pending
+
+    def pop_frame(self):
+        """Mengambil satu frame utuh dari buffer, None jika datanya belum lengkap
+
+        Payload chunk yang tidak dikompresi dikembalikan sebagai memoryview ke
+        buffer penerima tanpa disalin; view itu hanya valid sampai frame
+        berikutnya dibaca, jadi harus diproses (ditulis ke file) sebelumnya.
+        """
+        available = self._available()
+        if available < HEADER.size:
+            self._needed = HEADER.size
+            return None
+
+        kind, codec, size = HEADER.unpack_from(self._buffer, self._start)
+        if size > MAX_FRAME_SIZE:
+            raise ProtocolError(f"Frame terlalu besar: {size} bytes")
+        if available < HEADER.size + size:
+            self._needed = HEADER.size + size
+            return None
+
+        start = self._start + HEADER.size
+        self._start = start + size
+        self._needed = HEADER.size
+        payload = self._view[start:start + size]
+        if codec != CODEC_NONE:
+            try:
+                return kind, decompress(codec, payload, MAX_FRAME_SIZE)
+            except DecompressError as e:
+                raise ProtocolError(str(e)) from e
+        if kind == FRAME_CHUNK:
+            return kind, payload
+        return kind, bytes(payload)
+
+    def recv_buffer(self):
+        """Bagian buffer yang bisa diisi data baru dari socket"""
+        self._reserve(self._needed)
+        return self._view[self._end:]
+
+    def advance(self, count):
+        """Menandai `count` byte baru sudah ditulis ke recv_buffer()"""
+        self._end += count
+        self.recv_calls += 1
+        self.bytes_received += count
+
+    def _check_eof(self):
+        if self._available():
+            raise ProtocolError("Koneksi terputus di tengah frame")
+
+    def read_frame(self):
+        """Membaca satu frame utuh sebagai (kind, payload), None jika koneksi ditutup"""
+        while True:
+            frame = self.pop_frame()
+            if frame is not None:
+                return frame
+
+            target = self.recv_buffer()
+            if self._recv_into is not None:
+                count = self._recv_into(target)
+            else:
+                data = self.sock.recv(len(target))
+                count = len(data)
+                target[:count] = data
+
+            if not count:
+                self._check_eof()
+                return None
+            self.advance(count)
+
+    async def read_frame_async(self, loop):
+        """Seperti read_frame(), tetapi menunggu data lewat event loop"""
+        while True:
+            frame = self.pop_frame()
+            if frame is not None:
+                return frame
+
+            target = self.recv_buffer()
+            if self._recv_into is not None:
+                count = await loop.sock_recv_into(self.sock, target)
+            else:
+                data = await loop.sock_recv(self.sock, len(target))
+                count = len(data)
+                target[:count] = data
+
+            if not count:
+                self._check_eof()
+                return None
+            self.advance(count)
+
+    def frames(self):
+        """Generator (kind, payload) sampai koneksi ditutup"""
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                return
+            yield frame
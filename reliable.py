@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Reliable Delivery
+Nomor urut, ack kumulatif dan buffer kirim ulang agar chat selamat saat koneksi putus
+Author: Terminal Chat Bluetooth
+"""
+
+import json
+import os
+import random
+import threading
+import uuid
+from collections import OrderedDict
+
+# Pesan chat yang belum di-ack peer yang disimpan untuk dikirim ulang
+OUTBOX_LIMIT = 1000
+# Ack dikirim paling lambat setelah sekian detik, atau langsung setelah ACK_BATCH pesan
+ACK_INTERVAL = 0.2
+ACK_BATCH = 32
+# Tulis ulang journal jika baris usang sebanyak ini melebihi entri yang masih hidup
+COMPACT_SLACK = 1000
+
+# Jeda reconnect: mulai dari RECONNECT_INITIAL detik, dikali dua sampai RECONNECT_MAX
+RECONNECT_INITIAL = 0.5
+RECONNECT_MAX = 30.0
+RECONNECT_JITTER = 0.2
+
+
+class Backoff:
+    """Jeda eksponensial dengan jitter untuk percobaan reconnect
+
+    Percobaan pertama tanpa jeda; reset() dipanggil setelah koneksi terbukti
+    sehat, sehingga koneksi yang langsung putus lagi tetap diberi jeda.
+    """
+    def __init__(self, initial=RECONNECT_INITIAL, maximum=RECONNECT_MAX, jitter=RECONNECT_JITTER):
+        self.initial = initial
+        self.maximum = maximum
+        self.jitter = jitter
+        self.attempts = 0
+
+    def next_delay(self):
+        attempts = self.attempts
+        self.attempts += 1
+        if attempts == 0:
+            return 0
+        delay = min(self.maximum, self.initial * (2 ** (attempts - 1)))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def reset(self):
+        self.attempts = 0
+
+
+class Delivery:
+    """State pengiriman andal satu sesi chat (at-least-once dengan dedup)
+
+    Setiap pesan chat keluar diberi nomor urut (`seq`) dan disimpan sampai
+    peer mengirim ack kumulatif untuk nomor itu. Setelah koneksi tersambung
+    kembali, pesan yang belum di-ack dikirim ulang; penerima membuang pesan
+    dengan nomor yang sudah pernah diterima. Nomor berlaku per `session_id`,
+    yang diumumkan di hello.
+
+    Jika `path` diisi, state disimpan sebagai journal JSON lines sehingga
+    pesan yang belum terkirim ikut selamat saat program ditutup.
+    """
+
+    def __init__(self, path=None, limit=OUTBOX_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.acked = threading.Condition(self.lock)
+        self.session_id = uuid.uuid4().hex
+        self.next_seq = 1
+        self.unacked = OrderedDict()
+        self.peer_session = None
+        self.received = 0
+        self.ack_sent = 0
+        self.lines = 0
+        self.file = None
+        if path is not None:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    self.lines += 1
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue
+        except FileNotFoundError:
+            return
+        self.ack_sent = self.received
+        if self.lines > len(self.unacked) + COMPACT_SLACK:
+            self._compact()
+
+    def _apply(self, record):
+        if 'session' in record:
+            self.session_id = record['session']
+            self.next_seq = record['next_seq']
+        elif 'seq' in record:
+            self.unacked[record['seq']] = record['message']
+            self.next_seq = max(self.next_seq, record['seq'] + 1)
+        elif 'ack' in record:
+            self._drop_acked(record['ack'])
+        elif 'peer' in record:
+            self.peer_session = record['peer']
+            self.received = record['received']
+
+    def _journal(self, record):
+        if self.path is None:
+            return
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            new = not os.path.exists(self.path)
+            self.file = open(self.path, 'a')
+            if new:
+                self._write({'session': self.session_id, 'next_seq': self.next_seq})
+        self._write(record)
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        self.file.flush()
+        self.lines += 1
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            records = [{'session': self.session_id, 'next_seq': self.next_seq}]
+            if self.peer_session is not None:
+                records.append({'peer': self.peer_session, 'received': self.received})
+            records.extend({'seq': seq, 'message': message} for seq, message in self.unacked.items())
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + "\n")
+        os.replace(temp_path, self.path)
+        self.lines = len(records)
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _drop_acked(self, seq):
+        removed = 0
+        while self.unacked and next(iter(self.unacked)) <= seq:
+            self.unacked.popitem(last=False)
+            removed += 1
+        return removed
+
+    # Sisi pengirim
+
+    def stamp(self, message):
+        """Memberi nomor urut dan menyimpan pesan, return False jika buffer penuh
+
+        Pesan yang tidak muat tetap boleh dikirim, tapi tanpa jaminan kirim ulang.
+        """
+        with self.lock:
+            if len(self.unacked) >= self.limit:
+                return False
+            seq = self.next_seq
+            self.next_seq += 1
+            message['seq'] = seq
+            self.unacked[seq] = message
+            self._journal({'seq': seq, 'message': message})
+            return True
+
+    def ack(self, seq):
+        """Ack kumulatif dari peer: semua pesan sampai `seq` sudah diterima"""
+        with self.lock:
+            removed = self._drop_acked(seq)
+            if removed:
+                self.acked.notify_all()
+                if self.path is not None and not self.unacked and self.lines > COMPACT_SLACK:
+                    self._compact()
+                else:
+                    self._journal({'ack': seq})
+            return removed
+
+    def room(self):
+        """Jumlah pesan yang masih muat di buffer kirim ulang"""
+        with self.lock:
+            return max(self.limit - len(self.unacked), 0)
+
+    def wait_room(self, timeout):
+        """Menunggu ack sampai buffer kirim ulang punya tempat, return jumlah tempat (0 jika timeout)"""
+        with self.acked:
+            self.acked.wait_for(lambda: len(self.unacked) < self.limit, timeout)
+            return max(self.limit - len(self.unacked), 0)
+
+    def pending(self):
+        """Salinan pesan yang belum di-ack, urut dari yang paling lama"""
+        with self.lock:
+            return list(self.unacked.values())
+
+    def forget_unacked(self):
+        """Peer tidak mendukung ack: pesan tidak disimpan lagi"""
+        with self.lock:
+            last = next(reversed(self.unacked), None)
+        if last is not None:
+            self.ack(last)
+
+    # Sisi penerima
+
+    def peer_hello(self, peer_session):
+        """Mencatat sesi peer dari hello; nomor urut direset jika peer memulai sesi baru"""
+        with self.lock:
+            if peer_session != self.peer_session:
+                self.peer_session = peer_session
+                self.received = self.ack_sent = 0
+                self._journal({'peer': peer_session, 'received': 0})
+
+    def accept(self, seq):
+        """True jika pesan bernomor `seq` baru, False jika duplikat dari kirim ulang"""
+        with self.lock:
+            if seq <= self.received:
+                return False
+            self.received = seq
+            return True
+
+    def ack_due(self, force=False):
+        """Nomor yang perlu di-ack sekarang, None jika belum perlu"""
+        with self.lock:
+            waiting = self.received - self.ack_sent
+            if waiting <= 0 or (not force and waiting < ACK_BATCH):
+                return None
+            self.ack_sent = self.received
+            self._journal({'peer': self.peer_session, 'received': self.received})
+            return self.received
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Terminal Renderer
+Output terminal lewat antrean render: ditulis per frame dari thread tersendiri
+Author: Terminal Chat Bluetooth
+"""
+
+import atexit
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+# Jumlah tulisan ke terminal maksimum per detik
+DEFAULT_FPS = 30
+# Pesan dari satu pengirim dalam satu frame di atas batas ini diringkas
+FLOOD_THRESHOLD = 20
+# Pesan terakhir yang tetap ditampilkan saat banjir pesan diringkas
+FLOOD_SHOWN = 3
+# Baris yang menunggu dirender; pesan chat di atas batas ini hanya dihitung
+MAX_PENDING = 5000
+# Waktu maksimum menunggu terminal saat output dikosongkan sebelum keluar
+FLUSH_TIMEOUT = 2
+
+ANSI_CODE = re.compile(r'\x1b\[[0-9;]*m')
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """Renderer bersama untuk stdout proses ini"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = Renderer()
+            atexit.register(flush)
+        return _renderer
+
+
+def configure(fps=DEFAULT_FPS, flood_threshold=FLOOD_THRESHOLD, plain=False):
+    """Mengatur renderer bersama (dipanggil sekali dari opsi command line)"""
+    renderer = get_renderer()
+    renderer.interval = 1 / fps if fps > 0 else 0
+    renderer.flood_threshold = flood_threshold
+    renderer.plain = plain
+
+
+def show(text=""):
+    """Pengganti print() untuk output sesi: tidak pernah menunggu terminal"""
+    get_renderer().show(text)
+
+
+def show_chat(sender, text):
+    """Satu baris pesan chat; banjir pesan dari pengirim yang sama diringkas"""
+    get_renderer().show(text, group=sender)
+
+
+def flush(timeout=FLUSH_TIMEOUT):
+    """Menunggu output dalam antrean tertulis ke terminal, paling lama `timeout` detik"""
+    if _renderer is not None:
+        _renderer.flush(timeout)
+
+
+class Renderer:
+    """Antrean output yang ditulis ke terminal oleh satu thread render
+
+    show() hanya memasukkan baris ke antrean, jadi thread penerima tidak ikut
+    tertahan oleh terminal atau sesi SSH yang lambat. Thread render menulis
+    semua baris yang menunggu dalam satu write, paling banyak `1 / interval`
+    kali per detik. Baris dengan `group` (pesan chat per pengirim) yang dalam
+    satu frame melebihi `flood_threshold` diringkas menjadi satu baris jumlah
+    ditambah beberapa pesan terakhir. Dengan `plain`, kode warna ANSI dibuang.
+    """
+
+    def __init__(self, stream=None, fps=DEFAULT_FPS, flood_threshold=FLOOD_THRESHOLD,
+                 plain=False, max_pending=MAX_PENDING):
+        self.stream = stream
+        self.interval = 1 / fps if fps > 0 else 0
+        self.flood_threshold = flood_threshold
+        self.plain = plain
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.dropped = {}
+        self.condition = threading.Condition()
+        self.rendering = False
+        self.thread = None
+
+    def show(self, text, group=None):
+        with self.condition:
+            if group is not None and len(self.pending) >= self.max_pending:
+                # Terminal tertinggal jauh: pesan chat hanya dihitung untuk ringkasan
+                self.dropped[group] = self.dropped.get(group, 0) + 1
+            else:
+                self.pending.append((text, group))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="renderer", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def flush(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.pending or self.dropped or self.rendering:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.dropped:
+                    self.condition.wait()
+                items = self.pending
+                dropped = self.dropped
+                self.pending = deque()
+                self.dropped = {}
+                self.rendering = True
+            started = time.monotonic()
+            try:
+                self._write(self.render(items, dropped))
+            finally:
+                with self.condition:
+                    self.rendering = False
+                    self.condition.notify_all()
+            # Batas frame rate: baris yang masuk selama jeda ditulis bersama di frame berikutnya
+            delay = self.interval - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def render(self, items, dropped):
+        """Menggabungkan baris satu frame menjadi satu teks, banjir pesan diringkas"""
+        counts = {}
+        for _, group in items:
+            if group is not None:
+                counts[group] = counts.get(group, 0) + 1
+        # Pengirim yang membanjiri frame ini: jumlah baris yang dilewati dan
+        # jumlah total yang diringkas (termasuk yang tidak sempat masuk antrean)
+        skip = {}
+        summary = {}
+        for group in counts.keys() | dropped.keys():
+            count = counts.get(group, 0)
+            if count + dropped.get(group, 0) > self.flood_threshold:
+                skip[group] = max(0, count - FLOOD_SHOWN)
+            # Pesan yang tidak sempat masuk antrean selalu ikut diringkas
+            if skip.get(group, 0) + dropped.get(group, 0) > 0:
+                summary[group] = skip.get(group, 0) + dropped.get(group, 0)
+        lines = []
+        for text, group in items:
+            if group in summary:
+                lines.append(self._summary(group, summary.pop(group)))
+            if skip.get(group, 0) > 0:
+                skip[group] -= 1
+                continue
+            lines.append(text)
+        for group, count in summary.items():
+            lines.append(self._summary(group, count))
+        text = "\n".join(lines) + "\n"
+        return ANSI_CODE.sub('', text) if self.plain else text
+
+    @staticmethod
+    def _summary(group, count):
+        return f"💬 ... {count} pesan dari {group} diringkas (lihat /history)"
+
+    def _write(self, text):
+        stream = self.stream or sys.stdout
+        try:
+            stream.write(text)
+            stream.flush()
+        except (OSError, ValueError):
+            # Terminal tertutup (mis. SSH terputus): output dibuang, sesi tetap berjalan
+            pass
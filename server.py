@@ -5,214 +5,108 @@ Aplikasi chat dan transfer file menggunakan koneksi Bluetooth
 Author: Terminal Chat Bluetooth
 """
 
-import bluetooth
-import threading
-import os
-import json
-import base64
-from datetime import datetime
+import argparse
+import sys
 from colorama import init, Fore, Back, Style
-import time
+
+from renderer import flush as flush_output, show
+from session import ChatSession, add_session_arguments, configure_output, session_options
+from transport import DEFAULT_TRANSPORT, add_transport_arguments, get_transport
 
 # Initialize colorama
 init()
 
-class BluetoothChatServer:
-    def __init__(self, port=3):
-        self.port = port
+# Jumlah client maksimum di mode hub
+DEFAULT_MAX_CLIENTS = 32
+
+class BluetoothChatServer(ChatSession):
+    peer_label = "Client"
+    role = 'server'
+    can_reconnect = True
+
+    def __init__(self, port=None, hub=False, max_clients=DEFAULT_MAX_CLIENTS,
+                 transport=DEFAULT_TRANSPORT, address=None, **options):
+        super().__init__(**options)
+        self.options = options
+        self.transport = get_transport(transport)
+        self.address = address
+        self.port = self.transport.port(port)
+        self.hub = hub
+        self.max_clients = max_clients
         self.server_socket = None
-        self.client_socket = None
         self.client_info = None
-        self.running = False
         
     def start_server(self):
-        """Memulai server Bluetooth"""
+        """Memulai server Bluetooth, return True jika berjalan dan berhenti tanpa error"""
         try:
-            self.server_socket = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
-            self.server_socket.bind(("", self.port))
-            self.server_socket.listen(1)
+            self.server_socket = self.transport.listen(
+                self.port, self.max_clients if self.hub else 1, self.address)
             
-            print(f"{Fore.GREEN}🔵 Server Bluetooth dimulai pada port {self.port}{Style.RESET_ALL}")
+            where = self.transport.describe(self.address, self.port)
+            print(f"{Fore.GREEN}🔵 Server {self.transport.label} dimulai pada {where}{Style.RESET_ALL}")
             print(f"{Fore.YELLOW}Menunggu koneksi client...{Style.RESET_ALL}")
+            self.notify_ready()
             
-            self.client_socket, self.client_info = self.server_socket.accept()
-            print(f"{Fore.GREEN}✅ Client terhubung: {self.client_info}{Style.RESET_ALL}")
-            
-            self.running = True
+            if self.hub:
+                # asyncio dan engine hub hanya dimuat jika mode hub dipakai
+                from hub import run_hub
+                run_hub(self.server_socket, self.options, self.max_clients, self.transport)
+                return True
             
-            # Start receiving thread
-            receive_thread = threading.Thread(target=self.receive_messages)
-            receive_thread.daemon = True
-            receive_thread.start()
+            self.socket, self.client_info = self.server_socket.accept()
+            self.transport.configure(self.socket)
+            print(f"{Fore.GREEN}✅ Client terhubung: {self.client_info}{Style.RESET_ALL}")
             
-            # Start sending thread
-            self.send_messages()
+            self.start_session()
+            return True
             
         except Exception as e:
             print(f"{Fore.RED}❌ Error memulai server: {e}{Style.RESET_ALL}")
+            return False
         finally:
             self.cleanup()
     
-    def receive_messages(self):
-        """Menerima pesan dari client"""
-        while self.running:
-            try:
-                data = self.client_socket.recv(4096).decode('utf-8')
-                if not data:
-                    break
-                
-                message = json.loads(data)
-                self.handle_message(message)
-                
-            except Exception as e:
-                if self.running:
-                    print(f"{Fore.RED}❌ Error menerima pesan: {e}{Style.RESET_ALL}")
-                break
-    
-    def handle_message(self, message):
-        """Menangani pesan yang diterima"""
-        msg_type = message.get('type')
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        
-        if msg_type == 'text':
-            print(f"{Fore.CYAN}[{timestamp}] Client: {message['content']}{Style.RESET_ALL}")
-        
-        elif msg_type == 'file':
-            self.receive_file(message)
-        
-        elif msg_type == 'disconnect':
-            print(f"{Fore.YELLOW}Client telah terputus{Style.RESET_ALL}")
-            self.running = False
-    
-    def receive_file(self, message):
-        """Menerima file dari client"""
-        try:
-            filename = message['filename']
-            file_data = base64.b64decode(message['data'])
-            
-            # Create downloads directory if not exists
-            downloads_dir = "downloads"
-            if not os.path.exists(downloads_dir):
-                os.makedirs(downloads_dir)
-            
-            file_path = os.path.join(downloads_dir, filename)
-            
-            with open(file_path, 'wb') as f:
-                f.write(file_data)
-            
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"{Fore.GREEN}[{timestamp}] 📁 File diterima: {filename} ({len(file_data)} bytes){Style.RESET_ALL}")
-            print(f"{Fore.GREEN}   Disimpan di: {file_path}{Style.RESET_ALL}")
-            
-        except Exception as e:
-            print(f"{Fore.RED}❌ Error menerima file: {e}{Style.RESET_ALL}")
-    
-    def send_messages(self):
-        """Mengirim pesan ke client"""
-        print(f"{Fore.GREEN}✅ Terhubung! Ketik pesan atau gunakan perintah:{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}  /file <path> - Kirim file{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}  /quit - Keluar{Style.RESET_ALL}")
-        print(f"{Fore.YELLOW}  Atau ketik pesan biasa untuk chat{Style.RESET_ALL}")
-        print("-" * 50)
-        
-        while self.running:
-            try:
-                user_input = input()
-                
-                if user_input.lower() == '/quit':
-                    self.send_disconnect()
-                    break
-                
-                elif user_input.startswith('/file '):
-                    file_path = user_input[6:].strip()
-                    self.send_file(file_path)
-                
-                else:
-                    self.send_text_message(user_input)
-                    
-            except KeyboardInterrupt:
-                self.send_disconnect()
-                break
-            except Exception as e:
-                print(f"{Fore.RED}❌ Error mengirim pesan: {e}{Style.RESET_ALL}")
-    
-    def send_text_message(self, text):
-        """Mengirim pesan teks"""
-        try:
-            message = {
-                'type': 'text',
-                'content': text,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            data = json.dumps(message).encode('utf-8')
-            self.client_socket.send(data)
-            
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"{Fore.MAGENTA}[{timestamp}] Anda: {text}{Style.RESET_ALL}")
-            
-        except Exception as e:
-            print(f"{Fore.RED}❌ Error mengirim pesan: {e}{Style.RESET_ALL}")
-    
-    def send_file(self, file_path):
-        """Mengirim file ke client"""
-        try:
-            if not os.path.exists(file_path):
-                print(f"{Fore.RED}❌ File tidak ditemukan: {file_path}{Style.RESET_ALL}")
-                return
-            
-            filename = os.path.basename(file_path)
-            
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
-            
-            file_b64 = base64.b64encode(file_data).decode('utf-8')
-            
-            message = {
-                'type': 'file',
-                'filename': filename,
-                'data': file_b64,
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            data = json.dumps(message).encode('utf-8')
-            self.client_socket.send(data)
-            
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            print(f"{Fore.GREEN}[{timestamp}] 📁 File terkirim: {filename} ({len(file_data)} bytes){Style.RESET_ALL}")
-            
-        except Exception as e:
-            print(f"{Fore.RED}❌ Error mengirim file: {e}{Style.RESET_ALL}")
-    
-    def send_disconnect(self):
-        """Mengirim pesan disconnect"""
-        try:
-            message = {
-                'type': 'disconnect',
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            data = json.dumps(message).encode('utf-8')
-            self.client_socket.send(data)
-            
-        except Exception as e:
-            pass
-        
-        self.running = False
+    def open_link(self):
+        """Menunggu client menyambung ulang setelah koneksi putus"""
+        sock, self.client_info = self.server_socket.accept()
+        self.transport.configure(sock)
+        show(f"{Fore.GREEN}✅ Client terhubung: {self.client_info}{Style.RESET_ALL}")
+        return sock
     
     def cleanup(self):
         """Membersihkan resource"""
         self.running = False
+        # Pesan yang masih di antrean riwayat ditulis sebelum proses keluar
+        if self.history is not None:
+            self.history.flush()
+        # Output sesi yang masih di antrean render ditulis sebelum pesan penutup
+        flush_output()
         
-        if self.client_socket:
-            self.client_socket.close()
+        if self.socket:
+            self.socket.close()
         
         if self.server_socket:
             self.server_socket.close()
         
+        self.transport.cleanup()
+        
         print(f"{Fore.YELLOW}🔴 Server berhenti{Style.RESET_ALL}")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bluetooth Chat Server")
+    add_transport_arguments(parser, "Alamat bind untuk TCP, atau path socket untuk Unix")
+    parser.add_argument('--hub', action='store_true',
+                        help="Mode hub: terus menerima banyak client dan menyebarkan chat")
+    parser.add_argument('--max-clients', type=int, default=DEFAULT_MAX_CLIENTS,
+                        help=f"Jumlah client maksimum di mode hub (default: {DEFAULT_MAX_CLIENTS})")
+    add_session_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None, on_ready=None):
+    """Menjalankan server, return exit status (0 jika berhasil)"""
+    args = parse_args(argv)
+    configure_output(args)
+    
     print(f"{Fore.BLUE}╔══════════════════════════════════════════════════════╗{Style.RESET_ALL}")
     print(f"{Fore.BLUE}║              BLUETOOTH CHAT SERVER                   ║{Style.RESET_ALL}")
     print(f"{Fore.BLUE}║            Chat & File Transfer via Bluetooth       ║{Style.RESET_ALL}")
@@ -220,12 +114,16 @@ def main():
     print()
     
     try:
-        server = BluetoothChatServer()
-        server.start_server()
+        server = BluetoothChatServer(args.port, args.hub, args.max_clients,
+                                     args.transport, args.addr, **session_options(args))
+        server.on_ready = on_ready
+        return 0 if server.start_server() else 1
     except KeyboardInterrupt:
         print(f"\n{Fore.YELLOW}🔴 Server dihentikan oleh user{Style.RESET_ALL}")
+        return 130
     except Exception as e:
         print(f"{Fore.RED}❌ Error: {e}{Style.RESET_ALL}")
+        return 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
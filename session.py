@@ -0,0 +1,1310 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Session
+Logika chat dan transfer file yang dipakai bersama oleh server dan client
+Author: Terminal Chat Bluetooth
+"""
+
+import threading
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+from colorama import init, Fore, Style
+
+from protocol import (CHANNEL_BULK, CHANNEL_CHAT, CHANNEL_CONTROL, CHANNEL_FINAL, DEFAULT_BATCH_SIZE,
+                      FrameReader, SocketWriter, FRAME_BINARY, FRAME_MESSAGE, FRAME_CHUNK,
+                      bulk_channel, can_sendfile, decode_message, encode_chunk_frame, encode_message_frame,
+                      encode_region_frame, frame_size, parse_chunk)
+from compression import DEFAULT_CODEC, DEFAULT_LEVEL, available_codecs, make_compressor
+from dedup import open_index
+from delta import DELTA_MIN_SIZE, block_size_for, compute_delta, make_signatures, parse_signatures
+from heartbeat import DEFAULT_HEARTBEAT_INTERVAL, DEFAULT_HEARTBEAT_TIMEOUT, Heartbeat
+from history import DEFAULT_HISTORY_DIR, handle_command, is_history_command, open_history
+from metrics import MetricsDumper, SessionMetrics
+from reliable import ACK_INTERVAL, Backoff, Delivery
+from renderer import DEFAULT_FPS, FLOOD_THRESHOLD, configure, show, show_chat
+from transfer import (CHUNK_SIZE, OFFER_TIMEOUT, FileSource, IncomingFile, OutgoingTransfer,
+                      TransferError, chunk_checksum, file_sha256, safe_relative_path)
+from wire import WIRE_JSON, WIRE_NAMES, WIRE_VERSION, negotiate, timestamp_now
+
+# Initialize colorama
+init()
+
+ENGINES = ('asyncio', 'thread')
+DEFAULT_ENGINE = 'asyncio'
+DEFAULT_METRICS_INTERVAL = 10.0
+DEFAULT_DOWNLOADS_DIR = "downloads"
+# Ukuran blok stdin yang dibaca sekaligus di mode --bulk
+BULK_READ_SIZE = 64 * 1024
+# Saat buffer kirim ulang penuh, mode --bulk menunggu ack peer per sekian detik
+BULK_ACK_WAIT = 1.0
+# Transfer /file yang berjalan lebih lama dari ini dilaporkan progresnya setiap interval
+PROGRESS_INTERVAL = 5.0
+
+
+def add_session_arguments(parser):
+    """Menambahkan opsi sesi yang sama untuk server dan client"""
+    parser.add_argument('--compress', choices=['none'] + available_codecs(), default=DEFAULT_CODEC,
+                        help=f"Codec kompresi payload (default: {DEFAULT_CODEC})")
+    parser.add_argument('--level', type=int, default=DEFAULT_LEVEL,
+                        help=f"Level kompresi (default: {DEFAULT_LEVEL})")
+    parser.add_argument('--wire', choices=list(WIRE_NAMES), default='binary',
+                        help="Format pesan tertinggi yang ditawarkan ke peer; JSON selalu didukung "
+                             "(default: binary)")
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_ENGINE,
+                        help=f"Engine koneksi (default: {DEFAULT_ENGINE})")
+    parser.add_argument('--metrics-file', default=None,
+                        help="Tulis metrik sesi sebagai JSON lines ke file ini secara periodik")
+    parser.add_argument('--metrics-interval', type=float, default=DEFAULT_METRICS_INTERVAL,
+                        help=f"Interval dump metrik dalam detik (default: {DEFAULT_METRICS_INTERVAL})")
+    parser.add_argument('--heartbeat-interval', type=float, default=DEFAULT_HEARTBEAT_INTERVAL,
+                        help=f"Interval ping dalam detik, 0 untuk mematikan (default: {DEFAULT_HEARTBEAT_INTERVAL})")
+    parser.add_argument('--heartbeat-timeout', type=float, default=DEFAULT_HEARTBEAT_TIMEOUT,
+                        help=f"Putuskan peer yang diam selama ini, dalam detik (default: {DEFAULT_HEARTBEAT_TIMEOUT})")
+    parser.add_argument('--batch-delay', type=float, default=0,
+                        help="Tahan pesan keluar paling lama N milidetik untuk digabung (default: 0)")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Batas byte satu write gabungan (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument('--bulk', action='store_true',
+                        help="Kirim setiap baris stdin (pipe) sebagai pesan, lalu keluar")
+    parser.add_argument('--downloads', default=DEFAULT_DOWNLOADS_DIR,
+                        help=f"Folder penyimpanan file yang diterima (default: {DEFAULT_DOWNLOADS_DIR})")
+    parser.add_argument('--headless', action='store_true',
+                        help="Tanpa input stdin (mis. di bawah supervisor); berjalan sampai peer terputus")
+    parser.add_argument('--plain', action='store_true',
+                        help="Output tanpa warna/kode ANSI (otomatis jika --headless atau stdout bukan terminal)")
+    parser.add_argument('--render-fps', type=float, default=DEFAULT_FPS,
+                        help=f"Batas tulisan ke terminal per detik, 0 tanpa batas (default: {DEFAULT_FPS})")
+    parser.add_argument('--flood-threshold', type=int, default=FLOOD_THRESHOLD,
+                        help=f"Ringkas pesan dari satu pengirim di atas jumlah ini per frame (default: {FLOOD_THRESHOLD})")
+    parser.add_argument('--no-reconnect', action='store_true',
+                        help="Jangan menyambung ulang otomatis saat koneksi putus")
+    parser.add_argument('--outbox', default=None,
+                        help="Simpan pesan yang belum dikonfirmasi peer di file ini (selamat saat program ditutup)")
+    parser.add_argument('--history-dir', default=DEFAULT_HISTORY_DIR,
+                        help=f"Folder riwayat chat (default: {DEFAULT_HISTORY_DIR})")
+    parser.add_argument('--no-history', action='store_true',
+                        help="Jangan simpan riwayat chat")
+
+
+def session_options(args):
+    """Mengubah hasil argparse menjadi keyword argument ChatSession"""
+    return {
+        'compression': args.compress,
+        'compression_level': args.level,
+        'wire': WIRE_NAMES[args.wire],
+        'engine': args.engine,
+        'metrics_file': args.metrics_file,
+        'metrics_interval': args.metrics_interval,
+        'heartbeat_interval': args.heartbeat_interval,
+        'heartbeat_timeout': args.heartbeat_timeout,
+        'batch_delay': args.batch_delay / 1000,
+        'batch_size': args.batch_size,
+        'bulk': args.bulk,
+        'downloads_dir': args.downloads,
+        'headless': args.headless,
+        'history_dir': None if args.no_history else args.history_dir,
+        'reconnect': not args.no_reconnect,
+        'outbox_path': args.outbox,
+    }
+
+
+def configure_output(args):
+    """Mengatur renderer terminal dari opsi command line"""
+    plain = args.plain or args.headless or not sys.stdout.isatty()
+    configure(args.render_fps, args.flood_threshold, plain)
+
+
+def format_progress(name, position, size, sent, elapsed):
+    """Satu baris progres transfer: persen, MB, kecepatan dan perkiraan sisa waktu"""
+    percent = position / size if size else 1.0
+    rate = sent / elapsed if elapsed > 0 else 0
+    remaining = f", sisa ±{(size - position) / rate:.0f} detik" if rate else ""
+    return (f"{name}: {percent:.0%} ({position / (1024 * 1024):.1f}/{size / (1024 * 1024):.1f} MB, "
+            f"{rate / (1024 * 1024):.2f} MB/s{remaining})")
+
+
+class ChatSession:
+    """Sesi chat di atas satu socket yang sudah terhubung"""
+
+    peer_label = "Peer"
+    # Subfolder riwayat jika folder riwayat sedang dipakai proses lain di host yang sama
+    role = None
+    # Subclass yang bisa membuka koneksi baru (open_link) menyambung ulang saat koneksi putus
+    can_reconnect = False
+
+    def __init__(self, compression=DEFAULT_CODEC, compression_level=DEFAULT_LEVEL,
+                 engine=DEFAULT_ENGINE, metrics_file=None,
+                 metrics_interval=DEFAULT_METRICS_INTERVAL,
+                 heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL,
+                 heartbeat_timeout=DEFAULT_HEARTBEAT_TIMEOUT, batch_delay=0,
+                 batch_size=DEFAULT_BATCH_SIZE, bulk=False, downloads_dir=DEFAULT_DOWNLOADS_DIR,
+                 headless=False, history_dir=None, reconnect=True, outbox_path=None,
+                 wire=WIRE_VERSION):
+        self.socket = None
+        self.reader = None
+        self.writer = None
+        self.engine = engine
+        self.async_engine = None
+        self.running = False
+        self.downloads_dir = downloads_dir
+        self.chunk_size = CHUNK_SIZE
+        self.incoming = {}
+        self.incoming_dirs = {}
+        self.outgoing = {}
+        self.next_transfer_id = 1
+        self.transfer_lock = threading.Lock()
+        # Thread pekerjaan latar belakang (engine thread), lihat run_background()
+        self.background = []
+        self.compressor = make_compressor(compression, compression_level)
+        self.peer_codecs = []
+        # Versi format pesan yang ditawarkan, dan yang dipakai ke peer (JSON sampai hello diterima)
+        self.wire = wire
+        self.peer_wire = WIRE_JSON
+        self.peer_dedup = False
+        self.peer_delta = False
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self.metrics = SessionMetrics(self.peer_label)
+        self.metrics.add_gauge('write_queue_bytes', lambda: getattr(self.writer, 'queued_bytes', 0))
+        self.metrics.add_gauge('write_queue_frames', lambda: getattr(self.writer, 'queued_frames', 0))
+        self.metrics.add_gauge('incoming_transfers', lambda: len(self.incoming))
+        self.metrics.add_gauge('outgoing_transfers', lambda: len(self.outgoing))
+        self.metrics.add_gauge('recv_calls', lambda: getattr(self.reader, 'recv_calls', 0))
+        self.metrics.add_gauge('recv_bytes', lambda: getattr(self.reader, 'bytes_received', 0))
+        self.heartbeat = Heartbeat(heartbeat_interval, heartbeat_timeout)
+        self.batch_delay = batch_delay
+        self.batch_size = batch_size
+        self.bulk = bulk
+        self.headless = headless
+        self.history = self.open_history(history_dir)
+        self.reconnect_enabled = reconnect
+        self.delivery = Delivery(outbox_path)
+        self.delivery_lock = threading.Lock()
+        # None sampai hello diterima, False untuk peer lama yang tidak mengirim ack
+        self.peer_reliable = None
+        self.outbox_full = False
+        self.backoff = Backoff()
+        self.reconnected = False
+        self.connected = False
+        # True setelah hello peer diterima dan pesan tertunda dikirim ulang
+        self.link_ready = False
+        # Dipanggil sekali saat aplikasi siap (server listen / client terhubung), lihat main.py
+        self.on_ready = None
+
+    def start_session(self):
+        """Menjalankan sesi dengan engine yang dipilih"""
+        self.attach(self.socket)
+
+        if self.engine == 'asyncio':
+            from engine import run_engine
+            run_engine(self)
+            return
+
+        self.writer = self.make_socket_writer()
+        self.running = True
+        self.start_timers()
+
+        # Start receiving thread
+        receive_thread = threading.Thread(target=self.receive_until_closed)
+        receive_thread.daemon = True
+        receive_thread.start()
+
+        self.send_hello()
+
+        if self.headless:
+            # Tanpa stdin: sesi berjalan sampai peer memutus koneksi
+            receive_thread.join()
+            return
+
+        # Start sending thread
+        self.send_messages()
+
+    def attach(self, sock):
+        """Memasang socket (baru) sebagai koneksi sesi ini"""
+        self.socket = sock
+        self.reader = FrameReader(sock)
+        self.heartbeat.seen()
+        self.connected = True
+        self.link_ready = False
+        # Peer di koneksi baru bisa versi lain: kembali ke JSON sampai hello-nya diterima
+        self.peer_wire = WIRE_JSON
+
+    def should_reconnect(self):
+        return self.running and self.reconnect_enabled and self.can_reconnect
+
+    def open_link(self):
+        """Membuka koneksi baru ke peer yang sama, return socket (lihat client/server)"""
+        return None
+
+    def link_down(self):
+        """Koneksi berakhir, return True jika sesi akan menyambung ulang"""
+        self.connected = self.link_ready = False
+        if not self.should_reconnect():
+            return False
+        show(f"{Fore.YELLOW}🔄 Koneksi ke {self.peer_label} terputus, menyambung ulang... "
+             f"(pesan tetap bisa diketik){Style.RESET_ALL}")
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+        return True
+
+    def reconnect(self):
+        """Membuka ulang koneksi dengan jeda eksponensial, return True jika tersambung"""
+        error = None
+        while self.running:
+            delay = self.backoff.next_delay()
+            if delay:
+                reason = f"Gagal menyambung ({error})" if error else "Koneksi putus lagi"
+                show(f"{Fore.YELLOW}⏳ {reason}, coba lagi dalam {delay:.1f} detik{Style.RESET_ALL}")
+                deadline = time.monotonic() + delay
+                while self.running and time.monotonic() < deadline:
+                    time.sleep(0.1)
+                if not self.running:
+                    break
+            try:
+                sock = self.open_link()
+            except Exception as e:
+                error = e
+                continue
+            if sock is None:
+                return False
+            if not self.running:
+                sock.close()
+                return False
+            self.attach(sock)
+            self.reconnected = True
+            show(f"{Fore.GREEN}✅ Tersambung kembali ke {self.peer_label}{Style.RESET_ALL}")
+            return True
+        return False
+
+    def receive_until_closed(self):
+        """Engine thread: menerima pesan, dan menyambung ulang jika koneksi putus"""
+        while True:
+            self.receive_messages()
+            if not (self.link_down() and self.reconnect()):
+                break
+            self.writer = self.make_socket_writer()
+            self.send_hello()
+
+    @classmethod
+    def open_history(cls, history_dir):
+        """Riwayat chat bersama untuk folder ini, None jika dimatikan atau gagal dibuka"""
+        if history_dir is None:
+            return None
+        try:
+            return open_history(history_dir, cls.role)
+        except OSError as e:
+            show(f"{Fore.YELLOW}⚠️  Riwayat chat tidak bisa dibuka: {e}{Style.RESET_ALL}")
+            return None
+
+    def notify_ready(self):
+        if self.on_ready is not None:
+            self.on_ready()
+
+    def make_socket_writer(self):
+        """Writer blocking untuk engine thread dengan kebijakan batch sesi ini"""
+        return SocketWriter(self.socket, self.metrics, self.batch_delay, self.batch_size)
+
+    def receive_messages(self):
+        """Menerima pesan dari peer"""
+        try:
+            for kind, payload in self.reader.frames():
+                self.dispatch_frame(kind, payload)
+                if not self.running:
+                    break
+        except Exception as e:
+            self.report_receive_error(e)
+        finally:
+            self.close_incoming()
+
+    def report_receive_error(self, error):
+        if self.running:
+            show(f"{Fore.RED}❌ Error menerima pesan: {error}{Style.RESET_ALL}")
+
+    def dispatch_frame(self, kind, payload):
+        """Meneruskan frame yang diterima ke handler sesuai jenisnya"""
+        self.heartbeat.seen()
+        if kind == FRAME_CHUNK:
+            self.metrics.record_received('chunk', len(payload))
+            self.handle_chunk(payload)
+        elif kind == FRAME_MESSAGE or kind == FRAME_BINARY:
+            started = time.perf_counter()
+            message = decode_message(payload, kind)
+            self.metrics.record_time('decode', time.perf_counter() - started)
+            self.metrics.record_received(message.get('type'), len(payload))
+            self.handle_message(message)
+
+    def schedule_every(self, interval, callback):
+        """Memanggil callback berkala: di event loop (asyncio) atau thread daemon"""
+        if self.async_engine is not None:
+            self.async_engine.schedule_every(interval, callback)
+            return
+
+        def loop():
+            while self.running:
+                time.sleep(interval)
+                if self.running:
+                    callback()
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def start_timers(self):
+        """Mulai heartbeat, ack pesan chat, progres transfer dan dump metrik ke --metrics-file
+        secara periodik"""
+        self.schedule_every(ACK_INTERVAL, self.ack_tick)
+        self.schedule_every(PROGRESS_INTERVAL, self.progress_tick)
+        if self.heartbeat.enabled:
+            self.schedule_every(self.heartbeat.interval, self.heartbeat_tick)
+        if self.metrics_file:
+            dumper = MetricsDumper(self.metrics_file, lambda: [self.metrics])
+            self.schedule_every(self.metrics_interval, dumper.dump)
+
+    def heartbeat_tick(self):
+        """Memeriksa peer dan transfer yang macet, lalu mengirim ping"""
+        if not self.running or not self.connected:
+            return
+
+        if self.heartbeat.is_dead():
+            show(f"{Fore.RED}❌ {self.peer_label} tidak merespons selama "
+                  f"{self.heartbeat.silence():.0f} detik, koneksi diputus{Style.RESET_ALL}")
+            self.disconnect()
+            return
+
+        timeout = self.heartbeat.transfer_timeout(OFFER_TIMEOUT)
+        for transfer in list(self.outgoing.values()):
+            stalled = transfer.stalled_for()
+            if stalled > timeout:
+                # Pengirim tertahan di socket; state penerima tetap tersimpan untuk dilanjutkan
+                show(f"{Fore.RED}❌ Transfer macet selama {stalled:.0f} detik, koneksi diputus{Style.RESET_ALL}")
+                self.disconnect()
+                return
+
+        if not self.heartbeat.peer_enabled:
+            return
+        try:
+            # Jangan menunggu socket yang sedang dipakai transfer; data lain tetap mengalir
+            self.send_message(self.heartbeat.make_ping(), blocking=False)
+        except ConnectionError:
+            pass
+
+    def disconnect(self):
+        """Memutus koneksi dari sisi kita; thread/task penerima berhenti karena EOF
+
+        Dengan auto-reconnect sesi tetap berjalan dan koneksi dibuka ulang.
+        """
+        if not (self.reconnect_enabled and self.can_reconnect):
+            self.running = False
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except (OSError, AttributeError):
+            self.socket.close()
+
+    def send_ping(self):
+        """Perintah /ping: kirim ping dan tampilkan RTT saat pong tiba"""
+        if not self.heartbeat.peer_enabled:
+            show(f"{Fore.YELLOW}{self.peer_label} tidak mendukung ping{Style.RESET_ALL}")
+            return
+        self.send_message(self.heartbeat.make_ping(probe=True))
+
+    def print_stats(self):
+        """Menampilkan ringkasan metrik sesi"""
+        lines = self.metrics.summary_lines()
+        show(f"{Fore.GREEN}{lines[0]}{Style.RESET_ALL}")
+        for line in lines[1:]:
+            show(f"{Fore.CYAN}{line}{Style.RESET_ALL}")
+
+    def handle_message(self, message):
+        """Menangani pesan yang diterima, return False jika pesan chat duplikat dibuang"""
+        msg_type = message.get('type')
+        timestamp = datetime.now().strftime('%H:%M:%S')
+
+        if msg_type == 'hello':
+            self.peer_codecs = message.get('compression', [])
+            self.heartbeat.peer_enabled = bool(message.get('heartbeat'))
+            self.peer_dedup = bool(message.get('dedup'))
+            self.peer_delta = bool(message.get('delta'))
+            self.peer_wire = negotiate(self.wire, message)
+            self.resume_delivery(message)
+
+        elif msg_type == 'ack':
+            self.delivery.ack(message['seq'])
+
+        elif msg_type == 'ping':
+            self.send_message({'type': 'pong', 'id': message['id'], 'sent': message['sent']})
+
+        elif msg_type == 'pong':
+            rtt, probe = self.heartbeat.handle_pong(message)
+            if probe:
+                show(f"{Fore.GREEN}🏓 Pong dari {self.peer_label}: {rtt * 1000:.2f} ms{Style.RESET_ALL}")
+                show(f"{Fore.CYAN}   {self.heartbeat.summary()}{Style.RESET_ALL}")
+
+        elif msg_type == 'text':
+            if 'seq' in message and not self.accept_sequenced(message['seq']):
+                return False
+            sender = message.get('sender', self.peer_label)
+            show_chat(sender, f"{Fore.CYAN}[{timestamp}] {sender}: {message['content']}{Style.RESET_ALL}")
+            if self.history is not None:
+                self.history.append(sender, message['content'])
+
+        elif msg_type == 'file_offer':
+            self.start_receive_file(message)
+
+        elif msg_type == 'file_copy':
+            self.handle_file_copy(message)
+
+        elif msg_type == 'file_end':
+            self.receive_file(message)
+
+        elif msg_type == 'dir_offer':
+            message['received'] = message['received_bytes'] = message['deduplicated'] = 0
+            message['started'] = time.monotonic()
+            self.incoming_dirs[message['dir_id']] = message
+            show(f"{Fore.YELLOW}📦 Menerima folder {message['name']} ({message['files']} file, "
+                  f"{message['size']} bytes){Style.RESET_ALL}")
+
+        elif msg_type == 'dir_end':
+            self.finish_receive_dir(message)
+
+        elif msg_type == 'file_abort':
+            incoming = self.incoming.pop(message['transfer_id'], None)
+            if incoming:
+                incoming.close()
+                show(f"{Fore.RED}❌ Transfer dibatalkan oleh {self.peer_label}: {incoming.filename}{Style.RESET_ALL}")
+
+        elif msg_type == 'file_accept':
+            transfer = self.outgoing.get(message['transfer_id'])
+            if transfer:
+                transfer.accept(message['offset'])
+
+        elif msg_type == 'file_delta':
+            transfer = self.outgoing.get(message['transfer_id'])
+            if transfer:
+                transfer.delta(message['block_size'], message['signatures'])
+
+        elif msg_type == 'file_have':
+            transfer = self.outgoing.get(message['transfer_id'])
+            if transfer:
+                transfer.have()
+
+        elif msg_type == 'file_reject':
+            transfer = self.outgoing.get(message['transfer_id'])
+            if transfer:
+                transfer.reject(message.get('reason', 'Ditolak oleh penerima'))
+
+        elif msg_type == 'disconnect':
+            show(f"{Fore.YELLOW}{self.peer_label} telah terputus{Style.RESET_ALL}")
+            self.running = False
+
+        return True
+
+    def find_delivery(self, peer_session):
+        """State pengiriman untuk sesi peer ini (hub memakai state per client)"""
+        return self.delivery
+
+    def resume_delivery(self, hello):
+        """Hello dari peer: terapkan ack-nya lalu kirim ulang chat yang belum diterima"""
+        peer_session = hello.get('session')
+        with self.delivery_lock:
+            if peer_session is None:
+                # Peer lama tanpa ack: pesan tertunda dikirim sekali tanpa disimpan lagi
+                self.peer_reliable = False
+                pending = self.delivery.pending()
+                self.delivery.forget_unacked()
+            else:
+                self.peer_reliable = True
+                self.delivery = self.find_delivery(peer_session)
+                self.delivery.peer_hello(peer_session)
+                if hello.get('peer_session') == self.delivery.session_id:
+                    self.delivery.ack(hello.get('received', 0))
+                pending = self.delivery.pending()
+            for message in pending:
+                self.send_message(message, channel=CHANNEL_CHAT)
+            self.link_ready = True
+        # Koneksi terbukti sehat: reconnect berikutnya dimulai tanpa jeda
+        self.backoff.reset()
+        if pending and self.reconnected:
+            show(f"{Fore.YELLOW}🔁 {len(pending)} pesan yang belum diterima {self.peer_label} "
+                 f"dikirim ulang{Style.RESET_ALL}")
+
+    def accept_sequenced(self, seq):
+        """Pesan chat bernomor: False jika duplikat dari kirim ulang"""
+        if not self.delivery.accept(seq):
+            self.metrics.record_received('duplicate', 0)
+            return False
+        self.send_ack(self.delivery.ack_due())
+        return True
+
+    def ack_tick(self):
+        """Ack kumulatif untuk pesan yang diterima sejak ack terakhir"""
+        if self.connected:
+            self.send_ack(self.delivery.ack_due(force=True))
+
+    def send_ack(self, seq):
+        if seq is None:
+            return
+        try:
+            self.send_message({'type': 'ack', 'seq': seq}, blocking=False)
+        except OSError:
+            # Hello berikutnya membawa nomor yang sama
+            pass
+
+    def start_receive_file(self, message):
+        """Menyiapkan file sementara dan menjawab offset untuk dilanjutkan"""
+        if self.peer_dedup:
+            existing = self.find_in_index(message)
+            if existing is not None:
+                # Menyalin atau meng-hash ulang file bernama sama bisa membaca seluruh file
+                self.run_background(self.receive_from_index, message, existing)
+                return
+
+        incoming = self.prepare_incoming(message)
+        if incoming is None:
+            return
+        if incoming.resumable or (self.peer_delta and self.has_delta_basis(incoming)):
+            # Verifikasi chunk lama dan signature delta membaca seluruh file:
+            # di latar belakang agar chat, heartbeat dan ack tidak tertahan
+            self.run_background(self.accept_incoming, message['transfer_id'], incoming)
+        else:
+            self.accept_incoming(message['transfer_id'], incoming)
+
+    def prepare_incoming(self, message):
+        """IncomingFile untuk tawaran file yang dicatat di self.incoming, None jika ditolak"""
+        transfer_id = message['transfer_id']
+        try:
+            incoming = IncomingFile(self.downloads_dir, message['filename'], message['size'],
+                                    message['sha256'], message['chunk_size'])
+        except Exception as e:
+            self.reject_incoming(transfer_id, e)
+            return None
+
+        incoming.dir_id = message.get('dir_id')
+        self.incoming[transfer_id] = incoming
+        return incoming
+
+    def accept_incoming(self, transfer_id, incoming):
+        """Membuka file sementara lalu menjawab offset untuk dilanjutkan atau meminta delta"""
+        try:
+            incoming.open()
+        except Exception as e:
+            incoming.close()
+            if self.incoming.get(transfer_id) is incoming:
+                del self.incoming[transfer_id]
+                self.reject_incoming(transfer_id, e)
+            return
+        if self.incoming.get(transfer_id) is not incoming:
+            # Transfer dibatalkan atau koneksi putus selama verifikasi
+            incoming.close()
+            return
+
+        if incoming.resumed_from:
+            show(f"{Fore.YELLOW}⏩ Melanjutkan {incoming.filename} dari {incoming.resumed_from}/{incoming.size} bytes{Style.RESET_ALL}")
+        elif self.peer_delta and self.has_delta_basis(incoming):
+            self.offer_delta(transfer_id, incoming)
+            return
+        try:
+            self.send_message({'type': 'file_accept', 'transfer_id': transfer_id, 'offset': incoming.offset})
+        except OSError:
+            # Koneksi putus; pengirim mengulang tawaran setelah tersambung kembali
+            pass
+
+    def reject_incoming(self, transfer_id, error):
+        """Menolak file yang tidak bisa diterima dan memberi tahu pengirim"""
+        show(f"{Fore.RED}❌ Error menerima file: {error}{Style.RESET_ALL}")
+        try:
+            self.send_message({'type': 'file_reject', 'transfer_id': transfer_id, 'reason': str(error)})
+        except OSError:
+            pass
+
+    @staticmethod
+    def has_delta_basis(incoming):
+        """True jika versi lama file yang cukup besar untuk delta sync ada di downloads/"""
+        basis_path = incoming.file_path
+        try:
+            return (incoming.size >= DELTA_MIN_SIZE and os.path.isfile(basis_path)
+                    and os.path.getsize(basis_path) >= DELTA_MIN_SIZE)
+        except OSError:
+            return False
+
+    def offer_delta(self, transfer_id, incoming):
+        """Meminta delta terhadap versi lama file di downloads/ (dijalankan di latar belakang)
+
+        Penerima mengirim signature blok file lama (file_delta); pengirim hanya
+        mengirim data baru dan referensi blok (file_copy) yang disalin dari file lama.
+        Jika signature gagal dibuat, file diterima utuh.
+        """
+        basis_path = incoming.file_path
+        try:
+            block_size = block_size_for(os.path.getsize(basis_path))
+            signatures = make_signatures(basis_path, block_size)
+            if self.incoming.get(transfer_id) is not incoming:
+                # Transfer dibatalkan atau koneksi putus selama signature dihitung
+                return
+            incoming.basis = open(basis_path, 'rb')
+            incoming.block_size = block_size
+            message = {'type': 'file_delta', 'transfer_id': transfer_id,
+                       'block_size': block_size, 'signatures': signatures}
+            # Signature bisa besar; dikirim di kanal bulk agar tidak menahan chat
+            channel = bulk_channel(transfer_id)
+        except OSError as e:
+            show(f"{Fore.YELLOW}⚠️  Delta sync tidak dipakai: {e}{Style.RESET_ALL}")
+            message = {'type': 'file_accept', 'transfer_id': transfer_id, 'offset': incoming.offset}
+            channel = CHANNEL_CONTROL
+
+        try:
+            self.send_message(message, channel=channel)
+        except OSError:
+            # Koneksi putus; pengirim mengulang tawaran setelah tersambung kembali
+            pass
+
+    def find_in_index(self, message):
+        """Path file di downloads/ dengan isi yang ditawarkan, None jika tidak ada
+
+        Hanya membaca index di memori dan stat file, jadi aman di jalur penerima.
+        """
+        try:
+            return open_index(self.downloads_dir).lookup(message['sha256'], message['size'])
+        except OSError as e:
+            show(f"{Fore.YELLOW}⚠️  Index downloads tidak dipakai: {e}{Style.RESET_ALL}")
+            return None
+
+    def receive_from_index(self, message, existing):
+        """Menyalin lokal file yang isinya sudah ada lalu menjawab file_have (di latar belakang)
+
+        Jika gagal, file diterima seperti biasa.
+        """
+        try:
+            index = open_index(self.downloads_dir)
+            target = os.path.join(self.downloads_dir, safe_relative_path(message['filename']))
+            file_path = index.materialize(existing, target, message['sha256'])
+            if file_path != existing:
+                index.add(file_path, message['sha256'])
+        except (OSError, TransferError) as e:
+            show(f"{Fore.YELLOW}⚠️  Index downloads tidak dipakai: {e}{Style.RESET_ALL}")
+            incoming = self.prepare_incoming(message)
+            if incoming is not None:
+                self.accept_incoming(message['transfer_id'], incoming)
+            return
+
+        # Dihitung sebelum file_have dikirim: dir_end dari pengirim bisa diproses
+        # thread penerima segera setelahnya
+        directory = self.incoming_dirs.get(message.get('dir_id'))
+        if directory is not None:
+            directory['received'] += 1
+            directory['deduplicated'] += 1
+        try:
+            self.send_message({'type': 'file_have', 'transfer_id': message['transfer_id']})
+        except OSError:
+            # Koneksi putus; pengirim mengulang tawaran setelah tersambung kembali
+            return
+        if directory is not None:
+            return
+
+        timestamp = datetime.now().strftime('%H:%M:%S')
+        show(f"{Fore.GREEN}[{timestamp}] 📁 File sudah ada, tidak dikirim ulang: {message['filename']} "
+              f"({message['size']} bytes){Style.RESET_ALL}")
+        show(f"{Fore.GREEN}   Disimpan di: {file_path}{Style.RESET_ALL}")
+
+    def handle_chunk(self, payload):
+        """Memverifikasi dan menulis potongan data file yang diterima"""
+        transfer_id, offset, checksum, data = parse_chunk(payload)
+        incoming = self.incoming.get(transfer_id)
+        if incoming is None:
+            return
+
+        try:
+            incoming.write(offset, checksum, data)
+        except Exception as e:
+            # Chunk valid sebelumnya tetap tersimpan untuk dilanjutkan nanti
+            self.incoming.pop(transfer_id).close()
+            show(f"{Fore.RED}❌ Error menerima file: {e}{Style.RESET_ALL}")
+            self.send_message({'type': 'file_reject', 'transfer_id': transfer_id, 'reason': str(e)})
+
+    def handle_file_copy(self, message):
+        """Menyalin blok dari file lama ke file baru (delta sync)"""
+        transfer_id = message['transfer_id']
+        incoming = self.incoming.get(transfer_id)
+        if incoming is None:
+            return
+
+        try:
+            incoming.copy(message['offset'], message['block'], message['count'])
+        except Exception as e:
+            self.incoming.pop(transfer_id).close()
+            show(f"{Fore.RED}❌ Error menerima file: {e}{Style.RESET_ALL}")
+            self.send_message({'type': 'file_reject', 'transfer_id': transfer_id, 'reason': str(e)})
+
+    def receive_file(self, message):
+        """Menyelesaikan file yang diterima dari peer"""
+        incoming = self.incoming.pop(message['transfer_id'], None)
+        if incoming is None:
+            return
+
+        try:
+            file_path = incoming.finish()
+            self.metrics.record_transfer('received', incoming.received,
+                                         time.monotonic() - incoming.started)
+            try:
+                open_index(self.downloads_dir).add(file_path, incoming.sha256)
+            except OSError as e:
+                show(f"{Fore.YELLOW}⚠️  Gagal memperbarui index downloads: {e}{Style.RESET_ALL}")
+
+            directory = self.incoming_dirs.get(incoming.dir_id)
+            if directory is not None:
+                # File bagian dari /senddir dilaporkan sekali di akhir folder
+                directory['received'] += 1
+                directory['received_bytes'] += incoming.received
+                return
+
+            timestamp = datetime.now().strftime('%H:%M:%S')
+            resumed = f", dilanjutkan dari {incoming.resumed_from} bytes" if incoming.resumed_from else ""
+            if incoming.basis is not None:
+                resumed += f", {incoming.copied} bytes disalin dari versi lama"
+            show(f"{Fore.GREEN}[{timestamp}] 📁 File diterima: {incoming.filename} ({incoming.size} bytes{resumed}){Style.RESET_ALL}")
+            show(f"{Fore.GREEN}   Disimpan di: {file_path}{Style.RESET_ALL}")
+
+        except Exception as e:
+            show(f"{Fore.RED}❌ Error menerima file: {e}{Style.RESET_ALL}")
+
+    def finish_receive_dir(self, message):
+        """Ringkasan folder yang diterima lewat /senddir"""
+        directory = self.incoming_dirs.pop(message['dir_id'], None)
+        if directory is None:
+            return
+        elapsed = max(time.monotonic() - directory['started'], 1e-6)
+        throughput = directory['received_bytes'] / elapsed / (1024 * 1024)
+        timestamp = datetime.now().strftime('%H:%M:%S')
+        deduplicated = f", {directory['deduplicated']} sudah ada" if directory['deduplicated'] else ""
+        show(f"{Fore.GREEN}[{timestamp}] 📦 Folder diterima: {directory['name']} "
+              f"({directory['received']}/{directory['files']} file{deduplicated}, "
+              f"{directory['received_bytes']} bytes, {throughput:.2f} MB/s){Style.RESET_ALL}")
+        show(f"{Fore.GREEN}   Disimpan di: {os.path.join(self.downloads_dir, directory['name'])}{Style.RESET_ALL}")
+
+    def close_incoming(self):
+        """Menutup transfer yang belum selesai; state disimpan untuk dilanjutkan"""
+        for incoming in list(self.incoming.values()):
+            incoming.close()
+        self.incoming.clear()
+        self.incoming_dirs.clear()
+
+        for transfer in self.outgoing.values():
+            transfer.reject("Koneksi terputus")
+
+    def print_help(self):
+        """Menampilkan daftar perintah chat"""
+        show(f"{Fore.GREEN}✅ Terhubung! Ketik pesan atau gunakan perintah:{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /file <path> - Kirim file{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /senddir <path> - Kirim folder beserta isinya{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /transfers - Progres transfer yang sedang berjalan{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /ping - Ukur RTT ke peer{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /stats - Statistik koneksi{Style.RESET_ALL}")
+        if self.history is not None:
+            show(f"{Fore.YELLOW}  /history [n] - Tampilkan n pesan terakhir{Style.RESET_ALL}")
+            show(f"{Fore.YELLOW}  /search <kata> - Cari pesan di riwayat{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  /quit - Keluar{Style.RESET_ALL}")
+        show(f"{Fore.YELLOW}  Atau ketik pesan biasa untuk chat{Style.RESET_ALL}")
+        show("-" * 50)
+
+    def send_messages(self):
+        """Mengirim pesan ke peer"""
+        if self.bulk:
+            self.send_bulk()
+            self.send_disconnect()
+            return
+
+        self.print_help()
+
+        while self.running:
+            try:
+                user_input = input()
+                if user_input.lower() == '/quit':
+                    # Transfer yang masih berjalan diselesaikan sebelum keluar
+                    self.wait_background()
+                if not self.handle_command(user_input):
+                    break
+
+            except EOFError:
+                self.wait_background()
+                self.send_disconnect()
+                break
+
+            except KeyboardInterrupt:
+                self.send_disconnect()
+                break
+
+    def handle_command(self, user_input):
+        """Menjalankan satu baris input pengguna, return False untuk keluar"""
+        try:
+            if user_input.lower() == '/quit':
+                self.send_disconnect()
+                return False
+
+            elif user_input.startswith('/file '):
+                file_path = user_input[6:].strip()
+                self.run_background(self.send_file, file_path)
+
+            elif user_input.startswith('/senddir '):
+                self.run_background(self.send_directory, user_input[9:].strip())
+
+            elif user_input == '/transfers':
+                self.print_transfers()
+
+            elif user_input == '/ping':
+                self.send_ping()
+
+            elif user_input == '/stats':
+                self.print_stats()
+
+            elif is_history_command(user_input):
+                self.handle_history_command(user_input)
+
+            else:
+                self.send_text_message(user_input)
+
+        except Exception as e:
+            show(f"{Fore.RED}❌ Error mengirim pesan: {e}{Style.RESET_ALL}")
+        return True
+
+    def handle_history_command(self, user_input):
+        """/history [n] dan /search <kata>; pembacaan disk berjalan di latar belakang"""
+        if self.history is None:
+            show(f"{Fore.YELLOW}Riwayat chat tidak aktif (--no-history){Style.RESET_ALL}")
+            return
+        handle_command(self.history, user_input, self.run_background)
+
+    def run_background(self, func, *args):
+        """Menjalankan pekerjaan panjang (transfer, pencarian riwayat) tanpa memblokir input"""
+        if self.async_engine is not None:
+            self.async_engine.run_background(func, *args)
+            return
+        self.background = [thread for thread in self.background if thread.is_alive()]
+        thread = threading.Thread(target=func, args=args, daemon=True)
+        self.background.append(thread)
+        thread.start()
+
+    def wait_background(self):
+        """Engine thread: menunggu pekerjaan latar belakang selesai sebelum keluar"""
+        threads = [thread for thread in self.background if thread.is_alive()]
+        if threads:
+            show(f"{Fore.YELLOW}⏳ Menunggu {len(threads)} transfer selesai...{Style.RESET_ALL}")
+        for thread in threads:
+            thread.join()
+
+    def progress_tick(self):
+        """Melaporkan progres transfer /file yang sudah berjalan lama"""
+        now = time.monotonic()
+        for transfer in list(self.outgoing.values()):
+            # File bagian dari /senddir dilaporkan per folder oleh DirectorySender
+            if (transfer.dir_id is None and transfer.started is not None
+                    and now - transfer.started >= PROGRESS_INTERVAL):
+                progress = format_progress(transfer.name, transfer.position, transfer.size,
+                                           transfer.sent, now - transfer.started)
+                show(f"{Fore.YELLOW}📤 {progress}{Style.RESET_ALL}")
+
+    def print_transfers(self):
+        """Perintah /transfers: progres semua transfer keluar dan masuk"""
+        now = time.monotonic()
+        lines = []
+        for transfer in list(self.outgoing.values()):
+            if transfer.started is not None:
+                progress = format_progress(transfer.name, transfer.position, transfer.size,
+                                           transfer.sent, now - transfer.started)
+                lines.append(f"{Fore.CYAN}  📤 {progress}{Style.RESET_ALL}")
+        for incoming in list(self.incoming.values()):
+            progress = format_progress(incoming.filename, incoming.offset, incoming.size,
+                                       incoming.received, now - incoming.started)
+            lines.append(f"{Fore.CYAN}  📥 {progress}{Style.RESET_ALL}")
+        if not lines:
+            show(f"{Fore.YELLOW}Tidak ada transfer dengan {self.peer_label} yang sedang berjalan{Style.RESET_ALL}")
+            return
+        header = f"{Fore.GREEN}🔄 {len(lines)} transfer dengan {self.peer_label}:{Style.RESET_ALL}"
+        show("\n".join([header] + lines))
+
+    @property
+    def zero_copy(self):
+        """True jika chunk file bisa dikirim dengan sendfile di koneksi ini"""
+        return can_sendfile(self.socket)
+
+    @property
+    def peer_compressor(self):
+        """Compressor yang disepakati dengan peer, None jika tidak ada"""
+        if self.compressor and self.compressor.name in self.peer_codecs:
+            return self.compressor
+        return None
+
+    def send_hello(self):
+        """Mengumumkan codec kompresi, versi format pesan, interval heartbeat, dukungan
+        dedup dan delta, serta sesi pengiriman andal dan nomor pesan terakhir yang
+        diterima dari peer. Sebelum hello peer diterima, pesan dikirim sebagai JSON."""
+        self.send_message({'type': 'hello', 'compression': available_codecs(), 'wire': self.wire,
+                           'heartbeat': self.heartbeat.interval, 'dedup': True, 'delta': True,
+                           'session': self.delivery.session_id,
+                           'peer_session': self.delivery.peer_session,
+                           'received': self.delivery.received})
+
+    def send_message(self, message, blocking=True, channel=CHANNEL_CONTROL):
+        """Mengirim satu pesan sebagai frame di kanal `channel`, return byte di jalur
+        (0 jika dilewati)"""
+        started = time.perf_counter()
+        parts = encode_message_frame(message, self.peer_compressor, self.peer_wire)
+        self.metrics.record_time('encode', time.perf_counter() - started)
+        if not self.writer.write(parts, blocking=blocking, channel=channel):
+            return 0
+        size = frame_size(parts)
+        self.metrics.record_sent(message.get('type'), size)
+        return size
+
+    def send_chunk(self, transfer_id, offset, data, compressor=None, source=None, channel=CHANNEL_BULK):
+        """Mengirim satu chunk file beserta checksum-nya, return byte di jalur
+
+        Jika `source` diberikan dan chunk tidak dikompresi, data chunk dikirim
+        dengan sendfile dari file sumber; `data` hanya dipakai untuk checksum.
+        Tanpa sendfile (mis. RFCOMM) buffer chunk masuk antrean writer tanpa
+        disalin, dan `source` membaca chunk berikutnya ke buffer baru.
+        """
+        started = time.perf_counter()
+        if compressor is None and source is not None and self.zero_copy:
+            parts = encode_region_frame(transfer_id, offset, chunk_checksum(data),
+                                        source.region(offset, len(data)))
+        else:
+            parts = encode_chunk_frame(transfer_id, offset, chunk_checksum(data), data, compressor)
+            if source is not None and self.writer.retains_parts and parts[-1] is data:
+                source.detach()
+        self.metrics.record_time('encode_chunk', time.perf_counter() - started)
+        self.writer.write(parts, channel=channel)
+        size = frame_size(parts)
+        self.metrics.record_sent('chunk', size)
+        return size
+
+    def send_text_message(self, text):
+        """Mengirim pesan teks"""
+        try:
+            message = {
+                'type': 'text',
+                'content': text,
+                'timestamp': timestamp_now()
+            }
+
+            self.send_reliable(message)
+
+            timestamp = datetime.now().strftime('%H:%M:%S')
+            show(f"{Fore.MAGENTA}[{timestamp}] Anda: {text}{Style.RESET_ALL}")
+            if self.history is not None:
+                self.history.append("Anda", text)
+
+        except Exception as e:
+            show(f"{Fore.RED}❌ Error mengirim pesan: {e}{Style.RESET_ALL}")
+
+    def stamp_reliable(self, message):
+        """Memberi nomor urut pada pesan chat keluar, dipanggil di bawah `delivery_lock`
+
+        Return True jika pesan disimpan untuk dikirim ulang; jika buffer penuh
+        pesan tetap dikirim tanpa jaminan dan peringatan tampil sekali.
+        """
+        stamped = self.peer_reliable is not False and self.delivery.stamp(message)
+        if not stamped and self.peer_reliable is not False and not self.outbox_full:
+            show(f"{Fore.YELLOW}⚠️  Buffer kirim ulang penuh ({self.delivery.limit} pesan belum "
+                 f"dikonfirmasi), pesan baru dikirim tanpa jaminan{Style.RESET_ALL}")
+        self.outbox_full = self.peer_reliable is not False and not stamped
+        return stamped
+
+    def send_reliable(self, message):
+        """Mengirim pesan chat bernomor; disimpan sampai di-ack dan dikirim ulang
+        setelah reconnect, jadi tidak pernah menunggu koneksi yang sedang putus"""
+        with self.delivery_lock:
+            stamped = self.stamp_reliable(message)
+            if stamped and not self.link_ready:
+                # Dikirim oleh resume_delivery setelah hello peer diterima
+                if not self.connected:
+                    show(f"{Fore.YELLOW}⏳ Pesan disimpan, dikirim setelah tersambung kembali{Style.RESET_ALL}")
+                return
+            try:
+                self.send_message(message, channel=CHANNEL_CHAT)
+            except OSError:
+                if not stamped:
+                    raise
+                show(f"{Fore.YELLOW}⏳ Pesan disimpan, dikirim setelah tersambung kembali{Style.RESET_ALL}")
+
+    def send_text_batch(self, texts):
+        """Mengirim banyak pesan teks sekaligus dalam satu write, urutan tetap
+
+        Setiap pesan tetap bernomor dan dicatat di riwayat seperti send_reliable;
+        pesan yang tersimpan di buffer kirim ulang tidak hilang jika write gagal.
+        """
+        compressor = self.peer_compressor
+        timestamp = timestamp_now()
+        parts = []
+        with self.delivery_lock:
+            saved = True
+            for text in texts:
+                message = {'type': 'text', 'content': text, 'timestamp': timestamp}
+                stamped = self.stamp_reliable(message)
+                saved = saved and stamped
+                if self.history is not None:
+                    self.history.append("Anda", text)
+                if stamped and not self.link_ready:
+                    # Dikirim oleh resume_delivery setelah hello peer diterima
+                    continue
+                frame = encode_message_frame(message, compressor, self.peer_wire)
+                self.metrics.record_sent('text', frame_size(frame))
+                parts.extend(frame)
+            if parts:
+                try:
+                    self.writer.write(parts, channel=CHANNEL_CHAT)
+                except OSError:
+                    if not saved:
+                        raise
+                    show(f"{Fore.YELLOW}⏳ Pesan disimpan, dikirim setelah tersambung kembali{Style.RESET_ALL}")
+        return len(texts)
+
+    def send_lines(self, texts):
+        """Mengirim baris --bulk tanpa melebihi buffer kirim ulang
+
+        Saat buffer penuh, pesan yang sudah diantre di-flush lalu pengiriman
+        menunggu ack peer, sehingga setiap baris tetap bernomor. Return jumlah
+        baris yang terkirim atau tersimpan.
+        """
+        count = 0
+        while texts:
+            room = len(texts)
+            if self.peer_reliable is not False:
+                room = min(room, self.delivery.room())
+                if not room and self.link_ready:
+                    self.writer.flush()
+                # Selama tersambung ulang, buffer dikirim ulang oleh resume_delivery lalu di-ack
+                while not room and self.running:
+                    room = min(len(texts), self.delivery.wait_room(BULK_ACK_WAIT))
+                if not room:
+                    break
+            count += self.send_text_batch(texts[:room])
+            texts = texts[room:]
+        return count
+
+    def send_bulk(self, stream=None):
+        """Mode --bulk: setiap baris stdin dikirim sebagai pesan teks
+
+        Stdin dibaca per blok yang sudah tersedia, jadi input yang cepat dikirim
+        dalam write besar, sedangkan input yang lambat tetap langsung terkirim.
+        """
+        stream = stream or sys.stdin.buffer
+        count = 0
+        rest = b''
+        started = time.monotonic()
+        try:
+            while self.running:
+                data = stream.read1(BULK_READ_SIZE)
+                if not data:
+                    break
+                lines = (rest + data).split(b'\n')
+                rest = lines.pop()
+                count += self.send_lines([line.decode('utf-8', 'replace').rstrip('\r')
+                                          for line in lines if line.strip()])
+            if rest.strip():
+                count += self.send_lines([rest.decode('utf-8', 'replace')])
+            self.writer.flush()
+        except Exception as e:
+            show(f"{Fore.RED}❌ Error mengirim pesan: {e}{Style.RESET_ALL}")
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        show(f"{Fore.GREEN}📤 {count} pesan dikirim dalam {elapsed:.2f} detik "
+              f"({count / elapsed:.0f} pesan/detik){Style.RESET_ALL}")
+        return count
+
+    def send_file(self, file_path):
+        """Mengirim file ke peer per chunk, melanjutkan dari offset penerima"""
+        try:
+            if not os.path.exists(file_path):
+                show(f"{Fore.RED}❌ File tidak ditemukan: {file_path}{Style.RESET_ALL}")
+                return
+
+            filename = os.path.basename(file_path)
+            size = os.path.getsize(file_path)
+            started = time.monotonic()
+            transfer = self.new_transfer()
+
+            try:
+                self.send_file_offer(transfer, filename, size, file_sha256(file_path, self.chunk_size))
+
+                start = self.wait_file_accept(transfer)
+                if transfer.already_have:
+                    timestamp = datetime.now().strftime('%H:%M:%S')
+                    show(f"{Fore.GREEN}[{timestamp}] 📁 {self.peer_label} sudah punya {filename}, "
+                          f"tidak ada data yang dikirim ({size} bytes dihemat){Style.RESET_ALL}")
+                    return
+                if start:
+                    show(f"{Fore.YELLOW}⏩ Melanjutkan {filename} dari {start}/{size} bytes{Style.RESET_ALL}")
+
+                wire_bytes = self.send_file_data(transfer, file_path, start)
+                self.send_file_end(transfer, size)
+            finally:
+                self.outgoing.pop(transfer.transfer_id, None)
+
+            sent = size - start
+            elapsed = max(time.monotonic() - started, 1e-6)
+            self.metrics.record_transfer('sent', sent, elapsed)
+            ratio = wire_bytes / sent if sent else 1.0
+            throughput = sent / elapsed / (1024 * 1024)
+
+            timestamp = datetime.now().strftime('%H:%M:%S')
+            show(f"{Fore.GREEN}[{timestamp}] 📁 File terkirim: {filename} ({sent} dari {size} bytes, "
+                  f"rasio {ratio:.1%}, {throughput:.2f} MB/s){Style.RESET_ALL}")
+            if transfer.signatures is not None:
+                # Signature yang diunggah penerima juga lewat di jalur
+                saved = size - wire_bytes - transfer.signature_bytes
+                show(f"{Fore.GREEN}   Delta: {transfer.literal_bytes} bytes baru, {transfer.copied_bytes} bytes "
+                      f"disalin dari versi lama di penerima, {wire_bytes} bytes di jalur + "
+                      f"{transfer.signature_bytes} bytes signature dari penerima "
+                      f"(hemat {saved} bytes, {saved / size if size else 0:.1%}){Style.RESET_ALL}")
+
+        except Exception as e:
+            show(f"{Fore.RED}❌ Error mengirim file: {e}{Style.RESET_ALL}")
+
+    def allocate_transfer_id(self):
+        """Id transfer (atau folder) baru; transfer bisa dimulai dari beberapa thread"""
+        with self.transfer_lock:
+            transfer_id = self.next_transfer_id
+            self.next_transfer_id += 1
+            return transfer_id
+
+    def new_transfer(self, channel=None):
+        """Mendaftarkan transfer keluar baru, dengan kanal bulk sendiri kecuali `channel` diisi"""
+        transfer_id = self.allocate_transfer_id()
+        transfer = OutgoingTransfer(transfer_id, bulk_channel(transfer_id) if channel is None else channel)
+        self.outgoing[transfer_id] = transfer
+        return transfer
+
+    def send_file_offer(self, transfer, filename, size, sha256, **extra):
+        """Menawarkan file; penerima menjawab file_accept dengan offset awal"""
+        transfer.name = filename
+        transfer.size = size
+        transfer.dir_id = extra.get('dir_id')
+        self.send_message({
+            'type': 'file_offer',
+            'transfer_id': transfer.transfer_id,
+            'filename': filename,
+            'size': size,
+            'sha256': sha256,
+            'chunk_size': self.chunk_size,
+            'timestamp': timestamp_now(),
+            **extra
+        }, channel=transfer.channel)
+
+    def wait_file_accept(self, transfer):
+        """Menunggu offset awal dari penerima dengan timeout berdasarkan RTT"""
+        return transfer.wait(self.heartbeat.transfer_timeout(OFFER_TIMEOUT))
+
+    def send_file_end(self, transfer, size):
+        # Di kanal transfer itu sendiri, jadi selalu tiba setelah chunk terakhirnya
+        self.send_message({
+            'type': 'file_end',
+            'transfer_id': transfer.transfer_id,
+            'size': size,
+            'timestamp': timestamp_now()
+        }, channel=transfer.channel)
+
+    def send_directory(self, dir_path):
+        """Mengirim semua file di bawah folder, dengan pipeline baca/kompresi paralel"""
+        try:
+            if not os.path.isdir(dir_path):
+                show(f"{Fore.RED}❌ Folder tidak ditemukan: {dir_path}{Style.RESET_ALL}")
+                return
+            from dirtransfer import DirectorySender
+            DirectorySender(self, dir_path).send()
+        except Exception as e:
+            show(f"{Fore.RED}❌ Error mengirim folder: {e}{Style.RESET_ALL}")
+
+    def send_file_data(self, transfer, file_path, start):
+        """Mengirim isi file: delta jika penerima punya versi lama, jika tidak per chunk"""
+        if transfer.signatures is not None:
+            return self.send_file_delta(transfer, file_path)
+        return self.send_file_chunks(transfer, file_path, start)
+
+    def send_file_delta(self, transfer, file_path):
+        """Mengirim data baru sebagai chunk dan blok yang sama sebagai file_copy"""
+        compressor = self.peer_compressor
+        block_size = transfer.block_size
+        table = parse_signatures(transfer.signatures)
+        wire_bytes = 0
+        source = FileSource(file_path)
+        transfer.progress()
+        try:
+            for op in compute_delta(file_path, block_size, table):
+                transfer.check()
+                if op[0] == 'copy':
+                    _, offset, block, count = op
+                    wire_bytes += self.send_message({'type': 'file_copy', 'transfer_id': transfer.transfer_id,
+                                                     'offset': offset, 'block': block, 'count': count},
+                                                    channel=transfer.channel)
+                    transfer.copied_bytes += count * block_size
+                    transfer.progress(count * block_size)
+                    continue
+
+                _, offset, length = op
+                for offset, data in source.chunks(self.chunk_size, offset, offset + length):
+                    if compressor is not None and not transfer.literal_bytes \
+                            and not compressor.is_compressible(data):
+                        compressor = None
+                    wire_bytes += self.send_chunk(transfer.transfer_id, offset, data, compressor, source,
+                                                  transfer.channel)
+                    transfer.literal_bytes += len(data)
+                    transfer.progress(len(data))
+            return wire_bytes
+        except TransferError:
+            raise
+        except Exception:
+            self.abort_file(transfer)
+            raise
+        finally:
+            source.close()
+
+    def send_file_chunks(self, transfer, file_path, start):
+        """Mengirim chunk file mulai dari offset `start`, return byte di jalur"""
+        compressor = self.peer_compressor
+        wire_bytes = 0
+        source = FileSource(file_path)
+        transfer.progress()
+        try:
+            for offset, data in source.chunks(self.chunk_size, start):
+                transfer.check()
+                if compressor is not None and offset == start and not compressor.is_compressible(data):
+                    # Data sudah terkompresi (JPEG, ZIP, ...), kirim mentah
+                    compressor = None
+                wire_bytes += self.send_chunk(transfer.transfer_id, offset, data, compressor, source,
+                                              transfer.channel)
+                transfer.progress(len(data))
+            return wire_bytes
+        except TransferError:
+            raise
+        except Exception:
+            self.abort_file(transfer)
+            raise
+        finally:
+            source.close()
+
+    def abort_file(self, transfer):
+        try:
+            self.send_message({'type': 'file_abort', 'transfer_id': transfer.transfer_id},
+                              channel=transfer.channel)
+        except Exception:
+            pass
+
+    def send_disconnect(self):
+        """Mengirim pesan disconnect"""
+        try:
+            message = {
+                'type': 'disconnect',
+                'timestamp': timestamp_now()
+            }
+
+            # Kanal final: tiba setelah semua chat dan chunk file yang masih mengantre
+            self.send_message(message, channel=CHANNEL_FINAL)
+            # Pesan yang masih tertahan di batch harus terkirim sebelum keluar
+            self.writer.flush()
+
+        except Exception as e:
+            pass
+
+        self.running = False
@@ -0,0 +1,71 @@
+"""Konfigurasi pytest: modul aplikasi ada di root repo, bukan paket"""
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Batas waktu menunggu output atau proses selesai di tes loopback
+WAIT_TIMEOUT = 15
+
+
+class Program:
+    """main.py yang berjalan sebagai proses terpisah, output dicatat ke file"""
+
+    def __init__(self, args, log_path):
+        self.log_path = log_path
+        env = dict(os.environ, PYTHONUNBUFFERED='1')
+        with open(log_path, 'wb') as log:
+            self.process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'main.py'), *args],
+                                            stdin=subprocess.PIPE, stdout=log, stderr=subprocess.STDOUT,
+                                            cwd=os.path.dirname(log_path), env=env)
+
+    def output(self):
+        with open(self.log_path, encoding='utf-8', errors='replace') as f:
+            return f.read()
+
+    def wait_for(self, text, timeout=WAIT_TIMEOUT):
+        """Menunggu `text` muncul di output"""
+        deadline = time.monotonic() + timeout
+        while True:
+            # Status proses dicek sebelum output agar baris terakhir proses yang keluar tetap terbaca
+            exited = self.process.poll() is not None
+            if text in self.output():
+                return
+            if exited or time.monotonic() > deadline:
+                raise AssertionError(f"{text!r} tidak muncul di output:\n{self.output()}")
+            time.sleep(0.05)
+
+    def send(self, line):
+        self.process.stdin.write(line.encode('utf-8') + b"\n")
+        self.process.stdin.flush()
+
+    def wait(self, timeout=WAIT_TIMEOUT):
+        """Exit status proses; gagal jika tidak selesai dalam `timeout` detik"""
+        try:
+            return self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            raise AssertionError(f"Proses tidak berhenti:\n{self.output()}") from None
+
+
+@pytest.fixture
+def spawn(tmp_path):
+    """Menjalankan main.py dengan argumen tertentu; proses yang tersisa dihentikan di akhir tes"""
+    programs = []
+
+    def start(name, *args):
+        program = Program(list(args), str(tmp_path / f"{name}.log"))
+        programs.append(program)
+        return program
+
+    yield start
+    for program in programs:
+        if program.process.poll() is None:
+            program.process.kill()
+            program.process.wait()
+        program.process.stdin.close()
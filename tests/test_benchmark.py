@@ -0,0 +1,26 @@
+"""Benchmark mengukur jalur kirim yang sebenarnya: pesan bernomor dan di-ack"""
+
+import pytest
+
+from benchmark import Link, bench_text
+from wire import WIRE_BINARY
+
+
+@pytest.fixture
+def link(tmp_path):
+    link = Link('tcp', {'compression': 'none', 'batch_delay': 0, 'wire': WIRE_BINARY}, str(tmp_path))
+    yield link
+    link.close()
+
+
+@pytest.mark.parametrize('bulk', [False, True])
+def test_outbox_is_empty_after_text_benchmark(link, bulk):
+    # Lebih dari OUTBOX_LIMIT: tanpa ack buffer kirim ulang penuh
+    result = bench_text(link, 3000, bulk=bulk)
+
+    sender, receiver = link.client, link.server
+    assert result['unacked'] == 0
+    assert sender.delivery.pending() == []
+    assert not sender.outbox_full
+    assert receiver.delivery.received == 3000
+    assert len(receiver.latencies) == 3000
@@ -0,0 +1,37 @@
+"""Kompresi: batas ukuran hasil dekompresi dan payload rusak"""
+
+import zlib
+
+import pytest
+
+from compression import CODEC_IDS, Compressor, DecompressError, available_codecs, decompress
+from protocol import FRAME_MESSAGE, HEADER, MAX_FRAME_SIZE, FrameReader, ProtocolError
+
+
+class OneShotSocket:
+    """Socket palsu yang mengembalikan seluruh stream sekaligus"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def recv(self, size):
+        data, self.data = self.data[:size], self.data[size:]
+        return data
+
+
+def test_decompression_bomb_is_protocol_error():
+    bomb = zlib.compress(b'\0' * (MAX_FRAME_SIZE + 1024), 9)
+    stream = HEADER.pack(FRAME_MESSAGE, CODEC_IDS['zlib'], len(bomb)) + bomb
+    with pytest.raises(ProtocolError):
+        list(FrameReader(OneShotSocket(stream), buffer_size=4096).frames())
+
+
+@pytest.mark.parametrize('codec', available_codecs())
+def test_decompress_limit_and_corruption(codec):
+    compressor = Compressor(codec)
+    payload = compressor.compress(b'a' * 10_000)
+    assert decompress(CODEC_IDS[codec], payload, 10_000) == b'a' * 10_000
+    with pytest.raises(DecompressError):
+        decompress(CODEC_IDS[codec], payload, 9_999)
+    with pytest.raises(DecompressError):
+        decompress(CODEC_IDS[codec], payload[:len(payload) // 2], 10_000)
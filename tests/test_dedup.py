@@ -0,0 +1,70 @@
+"""Index isi downloads/: file yang sudah ada dipakai ulang tanpa dikirim"""
+
+import os
+import shutil
+
+from dedup import ContentIndex
+from transfer import file_sha256
+
+
+def make_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return file_sha256(path)
+
+
+def test_lookup_and_materialize(tmp_path):
+    downloads = str(tmp_path)
+    original = os.path.join(downloads, 'a.bin')
+    sha256 = make_file(original, os.urandom(5000))
+    index = ContentIndex(downloads)
+    index.add(original, sha256)
+
+    existing = index.lookup(sha256, 5000)
+    assert existing == original
+    assert index.lookup(sha256, 4999) is None
+
+    target = index.materialize(existing, os.path.join(downloads, 'sub', 'b.bin'), sha256)
+    assert open(target, 'rb').read() == open(original, 'rb').read()
+    # Index disimpan dan dibaca ulang tanpa memindai folder
+    assert ContentIndex(downloads).lookup(sha256, 5000) == original
+
+
+def test_same_named_copy_is_reused(tmp_path):
+    downloads = str(tmp_path)
+    original = os.path.join(downloads, 'a.bin')
+    sha256 = make_file(original, os.urandom(5000))
+    # Salinan yang belum tercatat di index
+    shutil.copyfile(original, os.path.join(downloads, 'f.bin'))
+    index = ContentIndex(downloads)
+    index.add(original, sha256)
+
+    target = index.materialize(original, os.path.join(downloads, 'f.bin'), sha256)
+    assert target == os.path.join(downloads, 'f.bin')
+    assert not os.path.exists(os.path.join(downloads, 'f (1).bin'))
+
+
+def test_different_file_is_not_overwritten(tmp_path):
+    downloads = str(tmp_path)
+    original = os.path.join(downloads, 'a.bin')
+    sha256 = make_file(original, os.urandom(5000))
+    other = os.urandom(5000)
+    make_file(os.path.join(downloads, 'f.bin'), other)
+    index = ContentIndex(downloads)
+    index.add(original, sha256)
+
+    target = index.materialize(original, os.path.join(downloads, 'f.bin'), sha256)
+    assert target == os.path.join(downloads, 'f (1).bin')
+    assert open(os.path.join(downloads, 'f.bin'), 'rb').read() == other
+
+
+def test_changed_file_is_not_returned(tmp_path):
+    downloads = str(tmp_path)
+    original = os.path.join(downloads, 'a.bin')
+    sha256 = make_file(original, b'x' * 100)
+    index = ContentIndex(downloads)
+    index.add(original, sha256)
+    with open(original, 'ab') as f:
+        f.write(b'y')
+    assert index.lookup(sha256, 100) is None
@@ -0,0 +1,107 @@
+"""Delta sync: file baru direkonstruksi dari file lama dan operasi delta"""
+
+import base64
+import hashlib
+import os
+import random
+
+import pytest
+
+from delta import block_size_for, compute_delta, make_signatures, parse_signatures
+from transfer import CHUNK_SIZE, IncomingFile, chunk_checksum
+
+
+def mutate(data, seed):
+    """Salinan `data` dengan sisipan, penghapusan dan penggantian di beberapa tempat"""
+    rng = random.Random(seed)
+    data = bytearray(data)
+    for _ in range(5):
+        position = rng.randrange(len(data))
+        action = rng.choice(('insert', 'delete', 'replace'))
+        if action == 'insert':
+            data[position:position] = rng.randbytes(rng.randint(1, 5000))
+        elif action == 'delete':
+            del data[position:position + rng.randint(1, 5000)]
+        else:
+            data[position:position + 100] = rng.randbytes(100)
+    return bytes(data)
+
+
+def apply_delta(downloads, basis_data, new_path, signatures_as_base64=False):
+    """Menjalankan delta seperti pengirim dan penerima, return (path hasil, byte literal)"""
+    os.makedirs(downloads, exist_ok=True)
+    basis_path = os.path.join(downloads, 'data.bin')
+    with open(basis_path, 'wb') as f:
+        f.write(basis_data)
+    with open(new_path, 'rb') as f:
+        new_data = f.read()
+
+    incoming = IncomingFile(downloads, 'data.bin', len(new_data),
+                            hashlib.sha256(new_data).hexdigest(), CHUNK_SIZE)
+    incoming.open()
+    block_size = block_size_for(len(basis_data))
+    signatures = make_signatures(basis_path, block_size)
+    if signatures_as_base64:
+        signatures = base64.b64encode(signatures).decode('ascii')
+    incoming.basis = open(basis_path, 'rb')
+    incoming.block_size = block_size
+
+    literal = 0
+    for op in compute_delta(new_path, block_size, parse_signatures(signatures)):
+        if op[0] == 'copy':
+            _, offset, block, count = op
+            incoming.copy(offset, block, count)
+            continue
+        _, offset, length = op
+        end = offset + length
+        while offset < end:
+            data = new_data[offset:min(offset + CHUNK_SIZE, end)]
+            incoming.write(offset, chunk_checksum(data), data)
+            offset += len(data)
+        literal += length
+    return incoming.finish(), literal
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_delta_reconstructs_modified_file(tmp_path, seed):
+    basis = random.Random(seed).randbytes(3 * 1024 * 1024)
+    new_data = mutate(basis, seed)
+    new_path = tmp_path / 'new.bin'
+    new_path.write_bytes(new_data)
+    downloads = tmp_path / 'downloads'
+
+    file_path, literal = apply_delta(str(downloads), basis, str(new_path), signatures_as_base64=seed == 0)
+
+    assert open(file_path, 'rb').read() == new_data
+    # Hasil menggantikan file lama, tidak ada salinan bernama lain
+    assert file_path == os.path.join(str(downloads), 'data.bin')
+    assert sorted(os.listdir(downloads)) == ['data.bin']
+    assert literal < len(new_data) // 10
+
+
+def test_delta_of_unrelated_file_is_all_literal(tmp_path):
+    basis = random.Random(1).randbytes(1024 * 1024)
+    new_data = random.Random(2).randbytes(1024 * 1024 + 123)
+    new_path = tmp_path / 'new.bin'
+    new_path.write_bytes(new_data)
+
+    file_path, literal = apply_delta(str(tmp_path / 'downloads'), basis, str(new_path))
+
+    assert open(file_path, 'rb').read() == new_data
+    assert literal == len(new_data)
+
+
+def test_delta_ops_cover_whole_file(tmp_path):
+    basis = random.Random(3).randbytes(2 * 1024 * 1024)
+    basis_path = tmp_path / 'old.bin'
+    basis_path.write_bytes(basis)
+    new_path = tmp_path / 'new.bin'
+    new_path.write_bytes(mutate(basis, 3))
+    block_size = block_size_for(len(basis))
+
+    position = 0
+    table = parse_signatures(make_signatures(str(basis_path), block_size))
+    for op in compute_delta(str(new_path), block_size, table):
+        assert op[1] == position
+        position += op[3] * block_size if op[0] == 'copy' else op[2]
+    assert position == new_path.stat().st_size
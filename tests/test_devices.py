@@ -0,0 +1,105 @@
+"""Cache perangkat dengan pencarian palsu yang disuntikkan ke DeviceDiscovery"""
+
+import pytest
+
+from devices import REFRESH_AFTER, DeviceCache, DeviceDiscovery
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeDiscover:
+    """Pengganti transport.discover_devices yang mengembalikan daftar tetap"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'devices.json')
+
+
+def test_discovery_fills_and_persists_cache(cache_path, clock):
+    cache = DeviceCache(cache_path, clock=clock)
+    assert cache.entries() == [] and cache.is_stale()
+
+    discover = FakeDiscover([('AA:AA', 'Laptop'), ('BB:BB', 'HP Budi')])
+    discovery = DeviceDiscovery(cache, discover)
+    discovery.run()
+    assert sorted(discovery.new) == ['AA:AA', 'BB:BB']
+    assert not cache.is_stale()
+
+    reloaded = DeviceCache(cache_path, clock=clock)
+    assert sorted(reloaded.entries()) == [('AA:AA', 'Laptop'), ('BB:BB', 'HP Budi')]
+    clock.now += REFRESH_AFTER + 1
+    assert reloaded.is_stale()
+
+
+def test_connected_devices_come_first(cache_path, clock):
+    cache = DeviceCache(cache_path, clock=clock)
+    DeviceDiscovery(cache, FakeDiscover([('AA:AA', 'Laptop'), ('BB:BB', 'HP Budi')])).run()
+    clock.now += 1
+    cache.connected('BB:BB')
+    assert [addr for addr, _ in cache.entries()] == ['BB:BB', 'AA:AA']
+
+
+def test_find_by_name_or_unique_prefix(cache_path, clock):
+    cache = DeviceCache(cache_path, clock=clock)
+    cache.update([('AA:AA', 'Laptop Kantor'), ('BB:BB', 'HP Budi'), ('CC:CC', 'HP Sari')])
+    assert cache.find('laptop kantor') == 'AA:AA'
+    assert cache.find('bb:bb') == 'BB:BB'
+    assert cache.find('budi') == 'BB:BB'
+    # Ambigu atau tidak ada
+    assert cache.find('hp') is None
+    assert cache.find('tablet') is None
+
+
+def test_expired_devices_are_dropped(cache_path, clock):
+    cache = DeviceCache(cache_path, ttl=100, clock=clock)
+    cache.update([('AA:AA', 'Lama')])
+    cache.save()
+    clock.now += 101
+    assert DeviceCache(cache_path, ttl=100, clock=clock).entries() == []
+
+
+def test_background_refresh_reports_new_devices(cache_path, clock):
+    cache = DeviceCache(cache_path, clock=clock)
+    discover = FakeDiscover([('AA:AA', 'Laptop')], [('AA:AA', 'Laptop'), ('CC:CC', None)])
+    discovery = DeviceDiscovery(cache, discover)
+    discovery.run()
+
+    finished = []
+    discovery.start(on_done=finished.append)
+    assert discovery.wait(5)
+    assert discovery.new == ['CC:CC']
+    assert finished == [discovery]
+    assert ('CC:CC', 'CC:CC') in cache.entries()
+    assert discover.calls == 2
+
+
+def test_discovery_error_keeps_cache(cache_path, clock):
+    cache = DeviceCache(cache_path, clock=clock)
+    cache.update([('AA:AA', 'Laptop')])
+    discovery = DeviceDiscovery(cache, FakeDiscover(OSError("adapter mati")))
+    with pytest.raises(OSError):
+        discovery.run()
+    assert cache.entries() == [('AA:AA', 'Laptop')]
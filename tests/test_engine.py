@@ -0,0 +1,46 @@
+"""Engine asyncio lewat Unix socket: chat, /quit dan Ctrl+C memberi tahu peer"""
+
+import signal
+import socket
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="butuh Unix socket")
+
+
+@pytest.fixture
+def server(spawn, tmp_path):
+    server = spawn('server', 'server', '--transport', 'unix', '--addr', str(tmp_path / 'chat.sock'),
+                   '--engine', 'asyncio', '--headless', '--no-history', '--downloads', str(tmp_path / 'downloads'))
+    server.wait_for("Menunggu koneksi client")
+    return server
+
+
+@pytest.fixture
+def client(spawn, tmp_path, server):
+    client = spawn('client', 'client', '--transport', 'unix', '--addr', str(tmp_path / 'chat.sock'),
+                   '--engine', 'asyncio', '--no-history')
+    client.wait_for("Terhubung!")
+    return client
+
+
+def test_chat_and_quit(server, client):
+    client.send("halo dari client")
+    server.wait_for("Client: halo dari client")
+
+    client.send("/quit")
+    assert client.wait() == 0
+    assert server.wait() == 0
+    server.wait_for("Client telah terputus")
+
+
+def test_interrupt_sends_disconnect(server, client):
+    client.send("halo dari client")
+    server.wait_for("Client: halo dari client")
+
+    client.process.send_signal(signal.SIGINT)
+    client.wait()
+    # Tanpa pesan disconnect server menunggu client menyambung ulang
+    assert server.wait() == 0
+    server.wait_for("Client telah terputus")
+    assert "Traceback" not in client.output()
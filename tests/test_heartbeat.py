@@ -0,0 +1,77 @@
+"""Heartbeat: estimasi RTT bergulir dan deteksi peer yang diam"""
+
+import time
+
+import pytest
+
+from heartbeat import MAX_TRANSFER_TIMEOUT, MIN_TRANSFER_TIMEOUT, Heartbeat, RttEstimator
+
+
+def test_first_sample_sets_srtt_and_rttvar():
+    rtt = RttEstimator()
+    assert rtt.rto is None
+    rtt.update(0.1)
+    assert rtt.srtt == pytest.approx(0.1)
+    assert rtt.rttvar == pytest.approx(0.05)
+    assert rtt.rto == pytest.approx(0.1 + 4 * 0.05)
+
+
+def test_update_follows_rfc6298():
+    rtt = RttEstimator()
+    rtt.update(0.1)
+    rtt.update(0.3)
+    # RTTVAR dihitung dengan SRTT lama, baru setelah itu SRTT diperbarui
+    assert rtt.rttvar == pytest.approx(0.75 * 0.05 + 0.25 * 0.2)
+    assert rtt.srtt == pytest.approx(0.875 * 0.1 + 0.125 * 0.3)
+    assert (rtt.last, rtt.min, rtt.samples) == (0.3, 0.1, 2)
+
+
+def test_stable_rtt_converges():
+    rtt = RttEstimator()
+    for _ in range(200):
+        rtt.update(0.02)
+    assert rtt.srtt == pytest.approx(0.02)
+    assert rtt.rttvar == pytest.approx(0, abs=1e-6)
+
+
+def test_silent_peer_is_dead_only_with_heartbeat():
+    heartbeat = Heartbeat(interval=1, timeout=3)
+    heartbeat.last_seen -= 10
+    # Peer lama tanpa heartbeat tidak dinilai dari diamnya
+    assert not heartbeat.is_dead()
+    heartbeat.peer_enabled = True
+    assert heartbeat.is_dead()
+    heartbeat.seen()
+    assert not heartbeat.is_dead()
+
+
+def test_timeout_is_at_least_two_intervals():
+    heartbeat = Heartbeat(interval=5, timeout=3)
+    heartbeat.peer_enabled = True
+    assert heartbeat.timeout == 10
+    heartbeat.last_seen -= 6
+    assert not heartbeat.is_dead()
+
+
+def test_pong_updates_rtt_and_marks_probe():
+    heartbeat = Heartbeat()
+    ping = heartbeat.make_ping()
+    probe = heartbeat.make_ping(probe=True)
+    assert probe['id'] == ping['id'] + 1
+
+    rtt, is_probe = heartbeat.handle_pong({'id': ping['id'], 'sent': time.monotonic() - 0.05})
+    assert rtt >= 0.05 and not is_probe
+    _, is_probe = heartbeat.handle_pong(probe)
+    assert is_probe
+    assert heartbeat.rtt.samples == 2
+    # Setiap probe hanya dilaporkan sekali
+    assert heartbeat.handle_pong(probe)[1] is False
+
+
+def test_transfer_timeout_is_clamped():
+    heartbeat = Heartbeat()
+    assert heartbeat.transfer_timeout(30) == 30
+    heartbeat.rtt.update(0.001)
+    assert heartbeat.transfer_timeout(30) == MIN_TRANSFER_TIMEOUT
+    heartbeat.rtt.update(10)
+    assert heartbeat.transfer_timeout(30) == MAX_TRANSFER_TIMEOUT
@@ -0,0 +1,111 @@
+"""Riwayat chat bersegmen: pembacaan lintas segmen dan perbaikan index setelah crash"""
+
+import os
+
+import pytest
+
+from history import OFFSET, ChatHistory
+
+
+def close(history):
+    """Menunggu penulisan selesai lalu melepas kunci folder, seperti proses yang keluar"""
+    history.flush()
+    history.log.close()
+    history.index.close()
+    history.lock_file.close()
+
+
+@pytest.fixture
+def segmented(tmp_path):
+    """50 pesan dengan segmen kecil dan cache kecil, jadi pembacaan lewat disk"""
+    history = ChatHistory(str(tmp_path), segment_size=300, cache_size=5)
+    for i in range(50):
+        history.append("Client" if i % 2 else "Anda", f"pesan {i}")
+        # Rotasi segmen dicek per batch tulis
+        history.flush()
+    return history
+
+
+def test_messages_span_several_segments(segmented):
+    assert len(segmented.segments) > 3
+    assert segmented.total == 50
+
+
+def test_last_reads_across_segment_boundaries(segmented):
+    entries = list(segmented.last(30))
+    assert [entry.text for entry in entries] == [f"pesan {i}" for i in range(20, 50)]
+    # Dari cache
+    assert [entry.text for entry in segmented.last(3)] == ["pesan 47", "pesan 48", "pesan 49"]
+
+
+def test_read_starts_inside_a_segment(segmented):
+    for start in range(50):
+        entries = list(segmented.read(start, 3))
+        assert [entry.text for entry in entries] == [f"pesan {i}" for i in range(start, min(start + 3, 50))]
+
+
+def test_search_finds_newest_matches_in_all_segments(segmented):
+    # "pesan 1" cocok dengan 1, 10-19
+    matches = segmented.search("PESAN 1")
+    assert [entry.text for entry in matches] == ["pesan 1"] + [f"pesan {i}" for i in range(10, 20)]
+
+    matches = segmented.search("pesan", limit=4)
+    assert [entry.text for entry in matches] == [f"pesan {i}" for i in range(46, 50)]
+
+    # Nama pengirim ikut dicari, timestamp tidak
+    assert len(segmented.search("client", limit=50)) == 25
+    assert len(segmented.search("2", limit=50)) == 14
+
+
+def test_reopen_keeps_messages(segmented, tmp_path):
+    close(segmented)
+    reopened = ChatHistory(str(tmp_path), segment_size=300, cache_size=5)
+    assert reopened.total == 50
+    assert [entry.text for entry in reopened.last(2)] == ["pesan 48", "pesan 49"]
+
+
+def test_truncated_index_is_repaired(tmp_path):
+    history = ChatHistory(str(tmp_path))
+    for i in range(10):
+        history.append("Anda", f"pesan {i}")
+    close(history)
+    segment = history.segments[-1]
+
+    # Crash di tengah penulisan: baris log tanpa entri index dan entri index terpotong
+    with open(segment.log_path, 'ab') as f:
+        f.write(b'["2024-01-01T00:00:00","Anda","tidak tercatat"]\n')
+    with open(segment.index_path, 'ab') as f:
+        f.write(OFFSET.pack(os.path.getsize(segment.log_path))[:2])
+
+    reopened = ChatHistory(str(tmp_path))
+    assert reopened.total == 10
+    assert os.path.getsize(segment.index_path) == 10 * OFFSET.size
+
+    reopened.append("Client", "pesan baru")
+    reopened.flush()
+    assert [entry.text for entry in reopened.read(8, 3)] == ["pesan 8", "pesan 9", "pesan baru"]
+    assert [entry.text for entry in reopened.search("baru")] == ["pesan baru"]
+
+
+def test_truncated_last_line_is_dropped(tmp_path):
+    history = ChatHistory(str(tmp_path))
+    for i in range(3):
+        history.append("Anda", f"pesan {i}")
+    close(history)
+    segment = history.segments[-1]
+
+    # Index sudah mencatat baris terakhir, tapi lognya terpotong
+    with open(segment.log_path, 'r+b') as f:
+        f.truncate(os.path.getsize(segment.log_path) - 5)
+
+    reopened = ChatHistory(str(tmp_path))
+    assert reopened.total == 2
+    assert [entry.text for entry in reopened.last(5)] == ["pesan 0", "pesan 1"]
+
+
+def test_flush_writes_everything_before_exit(tmp_path):
+    history = ChatHistory(str(tmp_path))
+    for i in range(5000):
+        history.append("Anda", f"pesan {i}")
+    close(history)
+    assert ChatHistory(str(tmp_path)).total == 5000
@@ -0,0 +1,91 @@
+"""Mode hub lewat Unix socket: pesan disebarkan ke semua client lain dan /quit mengakhiri semuanya"""
+
+import socket
+import time
+
+import pytest
+
+from engine import DRAIN_TIMEOUT
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="butuh Unix socket")
+
+
+@pytest.fixture
+def address(tmp_path):
+    return str(tmp_path / 'hub.sock')
+
+
+@pytest.fixture
+def hub(spawn, address):
+    hub = spawn('hub', 'server', '--transport', 'unix', '--addr', address, '--hub', '--no-history')
+    hub.wait_for("Menunggu koneksi client")
+    return hub
+
+
+def join(spawn, hub, address, name, engine, count):
+    client = spawn(name, 'client', '--transport', 'unix', '--addr', address,
+                   '--engine', engine, '--no-history')
+    client.wait_for("Terhubung!")
+    hub.wait_for(f"({count} client)")
+    return client
+
+
+def test_fan_out_between_clients(spawn, hub, address):
+    first = join(spawn, hub, address, 'client1', 'asyncio', 1)
+    second = join(spawn, hub, address, 'client2', 'thread', 2)
+    third = join(spawn, hub, address, 'client3', 'asyncio', 3)
+
+    first.send("halo dari satu")
+    hub.wait_for("Client 1: halo dari satu")
+    second.wait_for("Client 1: halo dari satu")
+    third.wait_for("Client 1: halo dari satu")
+
+    hub.send("dari hub")
+    for client in (first, second, third):
+        client.wait_for("Server: dari hub")
+    hub.wait_for("Anda → 3 client: dari hub")
+
+    # Pengirim tidak menerima pesannya sendiri kembali
+    assert "Client 1: halo dari satu" not in first.output()
+
+    hub.send("/quit")
+    assert hub.wait() == 0
+    for client in (first, second, third):
+        client.wait_for("Server telah terputus")
+    # Engine thread baru keluar setelah input() berikutnya kembali
+    second.process.stdin.close()
+    for client in (first, second, third):
+        assert client.wait() == 0
+
+
+def test_hub_drops_client_that_left(spawn, hub, address):
+    first = join(spawn, hub, address, 'client1', 'asyncio', 1)
+    second = join(spawn, hub, address, 'client2', 'asyncio', 2)
+
+    first.send("/quit")
+    assert first.wait() == 0
+    hub.wait_for("1 client terhubung")
+
+    hub.send("masih ada")
+    second.wait_for("Server: masih ada")
+    hub.wait_for("Anda → 1 client: masih ada")
+
+    hub.send("/quit")
+    assert hub.wait() == 0
+    assert second.wait() == 0
+
+
+def test_quit_does_not_wait_for_client_that_stopped_reading(hub, address):
+    stalled = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    stalled.connect(address)
+    try:
+        hub.wait_for("(1 client)")
+        for _ in range(50):
+            hub.send("x" * 60000)
+        hub.send("/quit")
+        started = time.monotonic()
+        assert hub.wait() == 0
+        assert time.monotonic() - started < DRAIN_TIMEOUT + 5
+    finally:
+        stalled.close()
@@ -0,0 +1,144 @@
+"""Framing: perakitan frame dari potongan recv sembarang dan penjadwalan kanal"""
+
+import os
+import random
+import zlib
+
+import pytest
+
+from compression import Compressor, available_codecs
+from protocol import (CHANNEL_CHAT, CHANNEL_CONTROL, CHANNEL_FINAL, FRAME_BINARY, FRAME_CHUNK,
+                      FRAME_MESSAGE, HEADER, MAX_FRAME_SIZE, FrameReader, FrameScheduler,
+                      ProtocolError, bulk_channel, decode_message, encode_chunk_frame,
+                      encode_message_frame, parse_chunk)
+from wire import WIRE_BINARY, WIRE_JSON
+
+
+class SplitSocket:
+    """Socket palsu yang mengembalikan stream dalam potongan berukuran acak"""
+
+    def __init__(self, data, seed, max_split=7000):
+        self.data = memoryview(data)
+        self.random = random.Random(seed)
+        self.max_split = max_split
+        self.position = 0
+
+    def _next(self, limit):
+        count = min(limit, self.random.randint(1, self.max_split), len(self.data) - self.position)
+        start = self.position
+        self.position += count
+        return self.data[start:self.position]
+
+    def recv(self, size):
+        return bytes(self._next(size))
+
+
+class SplitSocketInto(SplitSocket):
+    """Seperti SplitSocket, tetapi dibaca lewat recv_into"""
+
+    def recv_into(self, buffer):
+        data = self._next(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def build_stream(compressor=None):
+    """Stream beberapa frame pesan dan chunk, beserta frame yang diharapkan"""
+    rng = random.Random(1)
+    expected = []
+    parts = []
+    for index in range(40):
+        if index % 3 == 2:
+            # Chunk besar yang bisa dikompresi dan yang tidak (acak)
+            data = os.urandom(rng.randint(1, 200_000)) if index % 2 else b'abc' * rng.randint(1, 60_000)
+            parts += encode_chunk_frame(index, index * 1000, zlib.crc32(data), data, compressor)
+            expected.append((FRAME_CHUNK, (index, index * 1000, zlib.crc32(data), data)))
+        else:
+            wire = WIRE_BINARY if index % 2 else WIRE_JSON
+            message = {'type': 'text', 'content': 'x' * rng.randint(0, 20_000), 'seq': index}
+            parts += encode_message_frame(message, compressor, wire)
+            expected.append((FRAME_BINARY if wire == WIRE_BINARY else FRAME_MESSAGE, message))
+    return b''.join(bytes(part) for part in parts), expected
+
+
+def read_all(sock):
+    frames = []
+    for kind, payload in FrameReader(sock, buffer_size=4096).frames():
+        if kind == FRAME_CHUNK:
+            transfer_id, offset, checksum, data = parse_chunk(payload)
+            frames.append((kind, (transfer_id, offset, checksum, bytes(data))))
+        else:
+            frames.append((kind, decode_message(payload, kind)))
+    return frames
+
+
+@pytest.mark.parametrize('codec', [None] + available_codecs())
+@pytest.mark.parametrize('socket_class', [SplitSocket, SplitSocketInto])
+@pytest.mark.parametrize('seed', range(3))
+def test_frames_survive_arbitrary_recv_splits(codec, socket_class, seed):
+    compressor = Compressor(codec) if codec else None
+    stream, expected = build_stream(compressor)
+    assert read_all(socket_class(stream, seed)) == expected
+
+
+def test_byte_by_byte_recv():
+    stream, expected = build_stream()
+    assert read_all(SplitSocketInto(stream, 0, max_split=1)) == expected
+
+
+def test_eof_inside_frame_is_protocol_error():
+    stream, _ = build_stream()
+    with pytest.raises(ProtocolError):
+        read_all(SplitSocket(stream[:-10], 0))
+
+
+def test_oversized_frame_header_is_rejected():
+    stream = HEADER.pack(FRAME_MESSAGE, 0, MAX_FRAME_SIZE + 1)
+    with pytest.raises(ProtocolError):
+        read_all(SplitSocket(stream, 0))
+
+
+def drain(scheduler):
+    items = []
+    while True:
+        entry = scheduler.pop()
+        if entry is None:
+            return items
+        items.append(entry[0])
+
+
+def test_scheduler_priority_and_bulk_round_robin():
+    scheduler = FrameScheduler()
+    scheduler.push('final', 1, CHANNEL_FINAL)
+    for index in range(3):
+        scheduler.push(f'a{index}', 10, bulk_channel(1))
+        scheduler.push(f'b{index}', 10, bulk_channel(2))
+    scheduler.push('chat', 1, CHANNEL_CHAT)
+    scheduler.push('control', 1, CHANNEL_CONTROL)
+    assert len(scheduler) == 9
+    assert scheduler.queued_bytes == 63
+
+    assert drain(scheduler) == ['control', 'chat', 'a0', 'b0', 'a1', 'b1', 'a2', 'b2', 'final']
+    assert len(scheduler) == 0
+    assert scheduler.queued_bytes == 0
+
+
+def test_scheduler_chat_overtakes_queued_bulk():
+    scheduler = FrameScheduler()
+    for index in range(5):
+        scheduler.push(f'chunk{index}', 64, bulk_channel(1))
+    assert scheduler.pop()[0] == 'chunk0'
+    scheduler.push('chat', 1, CHANNEL_CHAT)
+    assert drain(scheduler) == ['chat', 'chunk1', 'chunk2', 'chunk3', 'chunk4']
+
+
+def test_scheduler_pop_batch_respects_limit():
+    scheduler = FrameScheduler()
+    for index in range(4):
+        scheduler.push(index, 40, CHANNEL_CHAT)
+    assert [item for item, _ in scheduler.pop_batch(100)] == [0, 1]
+    # Entri pertama selalu diambil walaupun lebih besar dari batas
+    scheduler.push('big', 500, CHANNEL_CONTROL)
+    assert [item for item, _ in scheduler.pop_batch(100)] == ['big']
+    assert [item for item, _ in scheduler.pop_batch(100)] == [2, 3]
+    assert scheduler.pop_batch(100) == []
@@ -0,0 +1,150 @@
+"""Pengiriman andal: ack kumulatif, buang duplikat, journal dan batas buffer kirim ulang"""
+
+import threading
+
+import pytest
+
+from reliable import ACK_BATCH, COMPACT_SLACK, OUTBOX_LIMIT, Backoff, Delivery
+
+
+def text(content):
+    return {'type': 'text', 'content': content}
+
+
+def stamp_all(delivery, count, start=0):
+    messages = [text(f"pesan {i}") for i in range(start, start + count)]
+    for message in messages:
+        assert delivery.stamp(message)
+    return messages
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / 'outbox.jsonl')
+
+
+def test_stamp_numbers_messages_in_order():
+    delivery = Delivery()
+    messages = stamp_all(delivery, 3)
+    assert [message['seq'] for message in messages] == [1, 2, 3]
+    assert delivery.pending() == messages
+
+
+def test_ack_is_cumulative():
+    delivery = Delivery()
+    stamp_all(delivery, 5)
+    assert delivery.ack(3) == 3
+    assert [message['seq'] for message in delivery.pending()] == [4, 5]
+    # Ack lama atau berulang tidak mengubah apa-apa
+    assert delivery.ack(2) == 0
+    assert delivery.ack(3) == 0
+    assert delivery.ack(10) == 2
+    assert delivery.pending() == []
+
+
+def test_receiver_drops_duplicates():
+    receiver = Delivery()
+    receiver.peer_hello('sesi-a')
+    assert [receiver.accept(seq) for seq in (1, 2, 3)] == [True, True, True]
+    # Kirim ulang setelah reconnect: nomor yang sudah diterima dibuang
+    assert [receiver.accept(seq) for seq in (2, 3, 4)] == [False, False, True]
+    assert receiver.received == 4
+
+
+def test_new_peer_session_resets_numbering():
+    receiver = Delivery()
+    receiver.peer_hello('sesi-a')
+    receiver.accept(7)
+    receiver.peer_hello('sesi-a')
+    assert not receiver.accept(7)
+    receiver.peer_hello('sesi-b')
+    assert receiver.accept(1)
+
+
+def test_ack_due_batches_acks():
+    receiver = Delivery()
+    receiver.peer_hello('sesi-a')
+    for seq in range(1, ACK_BATCH):
+        receiver.accept(seq)
+    assert receiver.ack_due() is None
+    receiver.accept(ACK_BATCH)
+    assert receiver.ack_due() == ACK_BATCH
+    assert receiver.ack_due(force=True) is None
+    receiver.accept(ACK_BATCH + 1)
+    assert receiver.ack_due(force=True) == ACK_BATCH + 1
+
+
+def test_outbox_limit_overflow():
+    delivery = Delivery()
+    stamp_all(delivery, OUTBOX_LIMIT)
+    assert delivery.room() == 0
+
+    overflow = text("tanpa jaminan")
+    assert not delivery.stamp(overflow)
+    assert 'seq' not in overflow
+    assert len(delivery.pending()) == OUTBOX_LIMIT
+
+    delivery.ack(10)
+    assert delivery.room() == 10
+    assert delivery.stamp(overflow)
+    assert overflow['seq'] == OUTBOX_LIMIT + 1
+
+
+def test_wait_room_wakes_up_on_ack():
+    delivery = Delivery(limit=2)
+    stamp_all(delivery, 2)
+    assert delivery.wait_room(0.01) == 0
+
+    threading.Timer(0.05, delivery.ack, (1,)).start()
+    assert delivery.wait_room(5) == 1
+
+
+def test_journal_replays_unacked_after_restart(journal):
+    sender = Delivery(journal)
+    messages = stamp_all(sender, 5)
+    sender.ack(2)
+
+    restarted = Delivery(journal)
+    assert restarted.session_id == sender.session_id
+    assert restarted.pending() == messages[2:]
+    # Nomor berikutnya melanjutkan, bukan mengulang dari 1
+    assert stamp_all(restarted, 1, start=5)[0]['seq'] == 6
+
+
+def test_journal_keeps_receiver_position(journal):
+    receiver = Delivery(journal)
+    receiver.peer_hello('sesi-a')
+    for seq in (1, 2, 3):
+        receiver.accept(seq)
+    receiver.ack_due(force=True)
+
+    restarted = Delivery(journal)
+    assert restarted.peer_session == 'sesi-a'
+    assert not restarted.accept(3)
+    assert restarted.accept(4)
+
+
+def test_journal_is_compacted(journal):
+    sender = Delivery(journal)
+    for _ in range(3):
+        stamp_all(sender, COMPACT_SLACK // 2)
+        sender.ack(sender.next_seq - 1)
+    assert sender.lines < COMPACT_SLACK
+
+    kept = stamp_all(sender, 2)
+    assert Delivery(journal).pending() == kept
+
+
+def test_journal_skips_damaged_lines(journal):
+    sender = Delivery(journal)
+    messages = stamp_all(sender, 2)
+    with open(journal, 'a') as f:
+        f.write('{"seq": 3, "mess')
+    assert Delivery(journal).pending() == messages
+
+
+def test_backoff_grows_and_resets():
+    backoff = Backoff(initial=1, maximum=4, jitter=0)
+    assert [backoff.next_delay() for _ in range(5)] == [0, 1, 2, 4, 4]
+    backoff.reset()
+    assert backoff.next_delay() == 0
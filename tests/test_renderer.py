@@ -0,0 +1,75 @@
+"""Renderer: ringkasan banjir pesan per pengirim dan output --plain tanpa kode warna"""
+
+import io
+import re
+
+from colorama import Fore, Style
+
+from renderer import FLOOD_SHOWN, Renderer
+
+
+def chat(sender, count, start=0):
+    return [(f"{sender}: pesan {i}", sender) for i in range(start, start + count)]
+
+
+def test_lines_below_threshold_are_kept():
+    renderer = Renderer(flood_threshold=5)
+    items = chat("Budi", 5) + [("info", None)]
+    assert renderer.render(items, {}) == "\n".join(text for text, _ in items) + "\n"
+
+
+def test_flood_is_summarized_per_sender():
+    renderer = Renderer(flood_threshold=5)
+    items = chat("Budi", 3) + chat("Sari", 2) + [("⚠️  info", None)] + chat("Budi", 7, start=3)
+
+    lines = renderer.render(items, {}).splitlines()
+    skipped = 10 - FLOOD_SHOWN
+    assert lines == ([f"💬 ... {skipped} pesan dari Budi diringkas (lihat /history)"]
+                     + [text for text, _ in chat("Sari", 2)] + ["⚠️  info"]
+                     + [text for text, _ in chat("Budi", FLOOD_SHOWN, start=10 - FLOOD_SHOWN)])
+
+
+def test_dropped_messages_are_counted_in_summary():
+    renderer = Renderer(flood_threshold=5)
+    # Satu pesan masuk antrean, 50 lainnya hanya dihitung karena antrean penuh
+    lines = renderer.render(chat("Budi", 1), {"Budi": 50}).splitlines()
+    assert lines == ["💬 ... 50 pesan dari Budi diringkas (lihat /history)", "Budi: pesan 0"]
+
+    lines = renderer.render([], {"Sari": 8}).splitlines()
+    assert lines == ["💬 ... 8 pesan dari Sari diringkas (lihat /history)"]
+
+
+def test_plain_strips_ansi_codes():
+    colored = f"{Fore.GREEN}✅ Terhubung{Style.RESET_ALL}"
+    assert Renderer().render([(colored, None)], {}) == colored + "\n"
+    assert Renderer(plain=True).render([(colored, None)], {}) == "✅ Terhubung\n"
+
+
+def test_show_writes_all_lines_in_order():
+    stream = io.StringIO()
+    renderer = Renderer(stream=stream, fps=0, flood_threshold=1000, plain=True)
+    for i in range(500):
+        renderer.show(f"{Fore.CYAN}baris {i}{Style.RESET_ALL}", group="Budi")
+    assert renderer.flush(5)
+    assert stream.getvalue().splitlines() == [f"baris {i}" for i in range(500)]
+
+
+def test_full_queue_counts_chat_but_keeps_other_lines():
+    stream = io.StringIO()
+    renderer = Renderer(stream=stream, fps=0, flood_threshold=5, max_pending=0)
+    renderer.show("❌ error")
+    for i in range(10):
+        renderer.show(f"pesan {i}", group="Budi")
+    assert renderer.flush(5)
+    output = stream.getvalue()
+    assert "❌ error" in output
+    assert "pesan 0" not in output
+    # Bisa terbagi ke beberapa frame, tapi tidak ada pesan yang hilang dari hitungan
+    counts = re.findall(r"(\d+) pesan dari Budi diringkas", output)
+    assert sum(map(int, counts)) == 10
+
+
+def test_few_dropped_messages_are_still_summarized():
+    renderer = Renderer(flood_threshold=5)
+    lines = renderer.render(chat("Budi", 2), {"Budi": 1}).splitlines()
+    assert lines == ["💬 ... 1 pesan dari Budi diringkas (lihat /history)", "Budi: pesan 0", "Budi: pesan 1"]
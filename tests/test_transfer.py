@@ -0,0 +1,98 @@
+"""File sementara dan file state: transfer yang putus dilanjutkan dari chunk terakhir yang valid"""
+
+import hashlib
+import os
+
+import pytest
+
+from transfer import IncomingFile, TransferError, chunk_checksum
+
+CHUNK = 4096
+
+
+@pytest.fixture
+def payload():
+    return os.urandom(10 * CHUNK + 123)
+
+
+def new_incoming(downloads, payload, chunk_size=CHUNK):
+    incoming = IncomingFile(str(downloads), 'file.bin', len(payload),
+                            hashlib.sha256(payload).hexdigest(), chunk_size)
+    incoming.open()
+    return incoming
+
+
+def write_chunks(incoming, payload, start, end):
+    for offset in range(start, end, incoming.chunk_size):
+        data = payload[offset:offset + incoming.chunk_size]
+        incoming.write(offset, chunk_checksum(data), data)
+
+
+def test_resume_from_state_file(tmp_path, payload):
+    incoming = new_incoming(tmp_path, payload)
+    write_chunks(incoming, payload, 0, 4 * CHUNK)
+    incoming.close()
+    assert os.path.exists(incoming.state_path)
+
+    resumed = IncomingFile(str(tmp_path), 'file.bin', len(payload),
+                           hashlib.sha256(payload).hexdigest(), CHUNK)
+    assert resumed.resumable
+    resumed.open()
+    assert resumed.resumed_from == 4 * CHUNK
+    write_chunks(resumed, payload, resumed.offset, len(payload))
+
+    file_path = resumed.finish()
+    assert open(file_path, 'rb').read() == payload
+    assert not os.path.exists(resumed.temp_path)
+    assert not os.path.exists(resumed.state_path)
+
+
+def test_resume_stops_at_corrupted_chunk(tmp_path, payload):
+    incoming = new_incoming(tmp_path, payload)
+    write_chunks(incoming, payload, 0, 5 * CHUNK)
+    incoming.close()
+    with open(incoming.temp_path, 'r+b') as f:
+        f.seek(2 * CHUNK + 10)
+        f.write(b'rusak')
+
+    resumed = new_incoming(tmp_path, payload)
+    assert resumed.offset == 2 * CHUNK
+    write_chunks(resumed, payload, resumed.offset, len(payload))
+    assert open(resumed.finish(), 'rb').read() == payload
+
+
+def test_resume_ignores_state_of_other_file(tmp_path, payload):
+    incoming = new_incoming(tmp_path, payload)
+    write_chunks(incoming, payload, 0, 3 * CHUNK)
+    incoming.close()
+
+    other = payload[:-1] + b'!'
+    restarted = new_incoming(tmp_path, other)
+    assert restarted.offset == 0
+    write_chunks(restarted, other, 0, len(other))
+    assert open(restarted.finish(), 'rb').read() == other
+
+
+def test_out_of_order_and_corrupt_chunks_are_rejected(tmp_path, payload):
+    incoming = new_incoming(tmp_path, payload)
+    with pytest.raises(TransferError):
+        incoming.write(CHUNK, chunk_checksum(payload[CHUNK:2 * CHUNK]), payload[CHUNK:2 * CHUNK])
+    with pytest.raises(TransferError):
+        incoming.write(0, chunk_checksum(payload[:CHUNK]) ^ 1, payload[:CHUNK])
+    incoming.discard()
+    assert not os.path.exists(incoming.temp_path)
+
+
+def test_hash_mismatch_discards_file(tmp_path, payload):
+    incoming = IncomingFile(str(tmp_path), 'file.bin', len(payload), '0' * 64, CHUNK)
+    incoming.open()
+    write_chunks(incoming, payload, 0, len(payload))
+    with pytest.raises(TransferError):
+        incoming.finish()
+    assert os.listdir(tmp_path) == []
+
+
+def test_unsafe_paths_are_rejected(tmp_path):
+    for name in ('../keluar.bin', '/etc/passwd', 'C:/x.bin'):
+        with pytest.raises(TransferError):
+            IncomingFile(str(tmp_path), name, 1, '0' * 64)
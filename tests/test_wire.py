@@ -0,0 +1,50 @@
+"""Format pesan biner dan JSON"""
+
+import pytest
+
+from wire import (MESSAGE_HEADER, WIRE_BINARY, WIRE_JSON, WireError, decode_binary, decode_json,
+                  encode_binary, encode_json, negotiate, timestamp_now)
+
+MESSAGES = [
+    {'type': 'text', 'content': 'halo 👋', 'sender': 'Server', 'seq': 7, 'timestamp': 1700000000123},
+    {'type': 'file_offer', 'transfer_id': 3, 'filename': 'dir/foto.jpg', 'size': 5 * 2 ** 32,
+     'sha256': 'ab' * 32, 'chunk_size': 65536, 'offset': 0},
+    {'type': 'file_delta', 'transfer_id': 1, 'block_size': 2048, 'signatures': bytes(range(256))},
+    {'type': 'hello', 'compression': ['zlib', 'lzma'], 'heartbeat': 2.5, 'dedup': True,
+     'delta': False, 'session': None, 'wire': 1},
+    {'type': 'dir_offer', 'dir_id': 2, 'name': 'foto',
+     'files': [{'name': 'a.jpg', 'size': 1}, {'name': 'b.jpg', 'size': -2 ** 40}]},
+    # Tipe dan field yang tidak ada di tabel kode ditulis sebagai string
+    {'type': 'future_type', 'unknown_field': {'nested': [1, 'dua', 3.5]}},
+    {'content': 'tanpa tipe'},
+]
+
+
+@pytest.mark.parametrize('message', MESSAGES)
+def test_binary_round_trip(message):
+    assert decode_binary(encode_binary(message)) == message
+
+
+def test_binary_is_smaller_than_json():
+    message = MESSAGES[0]
+    assert len(encode_binary(message)) < len(encode_json(message))
+
+
+def test_json_timestamp_and_bytes_are_compatible():
+    message = {'type': 'text', 'timestamp': timestamp_now(), 'signatures': b'\x00\xff'}
+    decoded = decode_json(encode_json(message))
+    assert isinstance(decoded['timestamp'], str)
+    assert decoded['signatures'] == 'AP8='
+
+
+@pytest.mark.parametrize('cut', [1, MESSAGE_HEADER.size + 1, -1])
+def test_truncated_binary_payload_raises(cut):
+    payload = encode_binary(MESSAGES[0])
+    with pytest.raises(WireError):
+        decode_binary(payload[:cut])
+
+
+def test_negotiate_falls_back_to_json_for_old_peers():
+    assert negotiate(WIRE_BINARY, {'type': 'hello'}) == WIRE_JSON
+    assert negotiate(WIRE_BINARY, {'type': 'hello', 'wire': WIRE_BINARY}) == WIRE_BINARY
+    assert negotiate(WIRE_JSON, {'type': 'hello', 'wire': WIRE_BINARY}) == WIRE_JSON
@@ -0,0 +1,166 @@
+"""Penggabungan write: SocketWriter dan QueueWriter dengan max_delay dan max_batch"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from engine import QueueWriter
+from protocol import CHANNEL_BULK, CHANNEL_CHAT, SocketWriter
+
+
+def frame(label, size=30):
+    """Frame palsu satu bagian: label diikuti pengisi sampai `size` byte"""
+    return [label.encode().ljust(size, b'.')]
+
+
+class FakeSocket:
+    """Socket yang mencatat setiap write"""
+
+    def __init__(self):
+        self.writes = []
+        self.written = threading.Event()
+
+    def sendall(self, data):
+        self.writes.append(bytes(data))
+        self.written.set()
+
+
+def labels(data, size=30):
+    return [data[i:i + size].rstrip(b'.').decode() for i in range(0, len(data), size)]
+
+
+def test_socket_writer_sends_each_frame_without_delay():
+    sock = FakeSocket()
+    writer = SocketWriter(sock)
+    for label in ('a', 'b', 'c'):
+        writer.write(frame(label))
+    assert [labels(data) for data in sock.writes] == [['a'], ['b'], ['c']]
+
+
+def test_socket_writer_holds_frames_for_max_delay():
+    sock = FakeSocket()
+    writer = SocketWriter(sock, max_delay=0.05)
+    started = time.monotonic()
+    for label in ('a', 'b', 'c'):
+        writer.write(frame(label))
+    assert sock.writes == []
+    assert writer.queued_frames == 3
+
+    assert sock.written.wait(5)
+    assert time.monotonic() - started >= 0.05
+    # Ketiga frame dikirim dalam satu write, urutan tetap
+    assert [labels(data) for data in sock.writes] == [['a', 'b', 'c']]
+    writer.close()
+
+
+def test_socket_writer_flushes_when_max_batch_is_reached():
+    sock = FakeSocket()
+    writer = SocketWriter(sock, max_delay=10, max_batch=100)
+    for label in ('a', 'b', 'c'):
+        writer.write(frame(label))
+    assert sock.writes == []
+    # Frame keempat membuat antrean mencapai max_batch: langsung dikirim tanpa menunggu
+    writer.write(frame('d'))
+    assert [labels(data) for data in sock.writes] == [['a', 'b', 'c'], ['d']]
+    assert writer.queued_frames == 0
+    writer.close()
+
+
+def test_socket_writer_flush_sends_chat_before_queued_chunks():
+    sock = FakeSocket()
+    writer = SocketWriter(sock, max_delay=10, max_batch=1000)
+    for label in ('c1', 'c2', 'c3'):
+        writer.write(frame(label), channel=CHANNEL_BULK)
+    writer.write(frame('chat'), channel=CHANNEL_CHAT)
+    writer.flush()
+    assert [labels(data) for data in sock.writes] == [['chat', 'c1', 'c2', 'c3']]
+    writer.close()
+
+
+class RecordingLoop:
+    """Event loop asli yang mencatat setiap sock_sendall dari QueueWriter"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.writes = []
+
+    def __getattr__(self, name):
+        return getattr(self.loop, name)
+
+    async def sock_sendall(self, sock, data):
+        self.writes.append((time.monotonic(), bytes(data)))
+
+
+def run_writer(writes, **options):
+    """Menjalankan QueueWriter di event loop baru, return [(waktu relatif, label frame)]"""
+    async def main():
+        loop = RecordingLoop(asyncio.get_running_loop())
+        writer = QueueWriter(loop, sock=None, **options)
+        task = asyncio.create_task(writer.run())
+        started = time.monotonic()
+        sent = []
+        await writes(writer, sent)
+        await asyncio.wait_for(writer.drain(), 5)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return [(when - started, labels(data)) for when, data in loop.writes], sent
+
+    return asyncio.run(main())
+
+
+def test_queue_writer_batches_within_max_delay():
+    async def writes(writer, sent):
+        for label in ('a', 'b', 'c'):
+            writer.write(frame(label), on_sent=lambda label=label: sent.append(label))
+            await asyncio.sleep(0.005)
+
+    batches, sent = run_writer(writes, max_delay=0.1)
+    assert [batch for _, batch in batches] == [['a', 'b', 'c']]
+    assert batches[0][0] >= 0.1
+    assert sent == ['a', 'b', 'c']
+
+
+def test_queue_writer_splits_batches_at_max_batch():
+    async def writes(writer, sent):
+        for label in ('a', 'b', 'c', 'd'):
+            writer.write(frame(label))
+
+    batches, _ = run_writer(writes, max_batch=100)
+    assert [batch for _, batch in batches] == [['a', 'b', 'c'], ['d']]
+
+
+def test_queue_writer_does_not_wait_once_max_batch_is_queued():
+    async def writes(writer, sent):
+        for label in ('a', 'b', 'c', 'd'):
+            writer.write(frame(label))
+
+    batches, _ = run_writer(writes, max_delay=10, max_batch=100)
+    assert [batch for _, batch in batches] == [['a', 'b', 'c'], ['d']]
+    assert batches[-1][0] < 1
+
+
+def test_queue_writer_flush_skips_max_delay():
+    async def writes(writer, sent):
+        writer.write(frame('a'))
+        writer.write(frame('b'), channel=CHANNEL_BULK)
+        writer.write(frame('chat'), channel=CHANNEL_CHAT)
+        writer.flush()
+
+    batches, _ = run_writer(writes, max_delay=10)
+    assert [batch for _, batch in batches] == [['a', 'chat', 'b']]
+    assert batches[0][0] < 1
+
+
+@pytest.mark.parametrize('max_delay', [0, 0.01])
+def test_queue_writer_keeps_order_for_writes_from_threads(max_delay):
+    async def writes(writer, sent):
+        def produce():
+            for i in range(200):
+                writer.write(frame(str(i)), channel=CHANNEL_CHAT)
+        await asyncio.get_running_loop().run_in_executor(None, produce)
+
+    batches, _ = run_writer(writes, max_delay=max_delay, max_batch=300)
+    assert [label for _, batch in batches for label in batch] == [str(i) for i in range(200)]
+    assert all(len(batch) <= 10 for _, batch in batches)
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Transfer
+Transfer file bertahap (streaming) yang bisa dilanjutkan setelah koneksi putus
+Author: Terminal Chat Bluetooth
+"""
+
+import os
+import json
+import hashlib
+import threading
+import time
+import zlib
+
+from protocol import FileRegion
+
+# Ukuran potongan data per frame; memori puncak hanya beberapa chunk
+CHUNK_SIZE = 64 * 1024
+# Batas waktu menunggu jawaban penerima atas tawaran file
+OFFER_TIMEOUT = 30
+
+
+class TransferError(Exception):
+    """Transfer file gagal atau data rusak"""
+
+
+def chunk_checksum(data):
+    """Checksum per chunk (CRC32)"""
+    return zlib.crc32(data) & 0xFFFFFFFF
+
+
+def file_sha256(file_path, chunk_size=CHUNK_SIZE):
+    """Hash SHA-256 seluruh isi file"""
+    digest = hashlib.sha256()
+    for _, data in iter_file_chunks(file_path, chunk_size):
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def safe_relative_path(path):
+    """Path relatif dari peer yang aman dipakai di bawah downloads/
+
+    Pemisah '/' dan '\\' diterima; path absolut, huruf drive dan komponen '..'
+    ditolak agar file tidak pernah ditulis di luar folder downloads.
+    """
+    parts = [part for part in path.replace('\\', '/').split('/') if part not in ('', '.')]
+    if not parts or path.startswith(('/', '\\')) or ':' in parts[0] or '..' in parts:
+        raise TransferError(f"Path tidak aman: {path}")
+    return os.path.join(*parts)
+
+
+def unique_path(path):
+    """Path yang belum dipakai: 'foto.jpg' -> 'foto (1).jpg', 'foto (2).jpg', ..."""
+    if not os.path.exists(path):
+        return path
+    stem, ext = os.path.splitext(path)
+    counter = 1
+    while os.path.exists(f"{stem} ({counter}){ext}"):
+        counter += 1
+    return f"{stem} ({counter}){ext}"
+
+
+def iter_file_chunks(file_path, chunk_size=CHUNK_SIZE, offset=0):
+    """Membaca file per chunk ke buffer yang dipakai ulang, yield (offset, data)"""
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            yield offset, view[:count]
+            offset += count
+
+
+def write_at(file, offset, data):
+    """Menulis data di posisi `offset` langsung ke file (os.pwrite), tanpa buffer Python"""
+    if not hasattr(os, 'pwrite'):
+        file.seek(offset)
+        file.write(data)
+        return
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(file.fileno(), view, offset)
+        view = view[written:]
+        offset += written
+
+
+def preallocate(file, size):
+    """Memesan ruang file tujuan sekaligus agar penulisan per chunk tidak memperbesar file"""
+    if size and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(file.fileno(), 0, size)
+        except OSError:
+            # Filesystem tanpa dukungan alokasi; file tumbuh seperti biasa
+            pass
+
+
+class FileSource:
+    """File yang dikirim, dibaca per chunk dengan readinto ke buffer yang dipakai ulang
+
+    Memori tetap beberapa chunk berapapun ukuran file. Buffer chunk hanya
+    diganti jika chunk terakhir diserahkan apa adanya ke writer yang menahan
+    frame sampai terkirim (lihat detach()); selain itu buffer yang sama diisi
+    ulang.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.file = open(file_path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.buffer = None
+        # sendfile memindahkan posisi file, jadi region memakai objek file
+        # sendiri agar tidak mengganggu pembacaan chunk yang berurutan
+        self.region_file = None
+
+    def region(self, offset, count):
+        """Bagian file untuk sendfile; file tetap terbuka selama region masih mengantre di writer"""
+        if self.region_file is None:
+            self.region_file = open(self.file_path, 'rb')
+        return FileRegion(self.region_file, offset, count)
+
+    def detach(self):
+        """Buffer chunk terakhir dipegang writer sampai terkirim; chunk berikutnya memakai buffer baru"""
+        self.buffer = None
+
+    def chunks(self, chunk_size, start=0, end=None):
+        """Yield (offset, data) dari `start` sampai `end`; data hanya valid sampai chunk berikutnya,
+        kecuali detach() dipanggil"""
+        end = self.size if end is None else min(end, self.size)
+        self.file.seek(start)
+        offset = start
+        while offset < end:
+            if self.buffer is None or len(self.buffer) < chunk_size:
+                self.buffer = memoryview(bytearray(chunk_size))
+            count = self.file.readinto(self.buffer[:min(chunk_size, end - offset)])
+            if not count:
+                break
+            yield offset, self.buffer[:count]
+            offset += count
+
+    def close(self):
+        """Menutup file; file region ditutup bersama region terakhir yang masih mengantre"""
+        self.file.close()
+
+
+class OutgoingTransfer:
+    """Status transfer keluar: jawaban penerima dan progres pengiriman"""
+
+    def __init__(self, transfer_id, channel):
+        self.transfer_id = transfer_id
+        # Kanal bulk tempat semua frame transfer ini diantrekan (lihat protocol.FrameScheduler)
+        self.channel = channel
+        self.name = None
+        self.size = 0
+        self.dir_id = None
+        self.offset = 0
+        self.sent = 0
+        self.started = None
+        self.error = None
+        self.answered = threading.Event()
+        self.last_progress = None
+        self.already_have = False
+        self.block_size = None
+        self.signatures = None
+        # Byte signature yang dikirim penerima; ikut dihitung sebagai biaya delta
+        self.signature_bytes = 0
+        self.literal_bytes = 0
+        self.copied_bytes = 0
+
+    def accept(self, offset):
+        self.offset = offset
+        self.answered.set()
+
+    def delta(self, block_size, signatures):
+        """Penerima punya versi lama file; kirim delta terhadap signature bloknya"""
+        self.block_size = block_size
+        self.signatures = signatures
+        # Bytes mentah (codec biner) atau base64 (JSON): ukuran yang benar-benar lewat di jalur
+        self.signature_bytes = len(signatures)
+        self.offset = 0
+        self.answered.set()
+
+    def have(self):
+        """Penerima sudah punya isi file yang sama; tidak ada data yang perlu dikirim"""
+        self.already_have = True
+        self.answered.set()
+
+    def progress(self, count=0):
+        """Dipanggil saat pengiriman chunk dimulai dan setiap chunk diserahkan ke socket,
+        dengan `count` byte isi file yang tercakup chunk itu"""
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+        self.last_progress = now
+        self.sent += count
+
+    @property
+    def position(self):
+        """Byte file yang sudah sampai di penerima atau sudah diserahkan ke socket"""
+        return self.offset + self.sent
+
+    def stalled_for(self):
+        """Detik sejak chunk terakhir terkirim; 0 jika pengiriman belum dimulai"""
+        if self.last_progress is None:
+            return 0
+        return time.monotonic() - self.last_progress
+
+    def reject(self, reason):
+        self.error = reason
+        self.answered.set()
+
+    def wait(self, timeout=OFFER_TIMEOUT):
+        """Menunggu offset awal dari penerima"""
+        if not self.answered.wait(timeout):
+            raise TransferError("Penerima tidak menjawab tawaran file")
+        self.check()
+        return self.offset
+
+    def check(self):
+        if self.error:
+            raise TransferError(self.error)
+
+
+class IncomingFile:
+    """File yang sedang diterima, dengan file state di samping file sementara
+
+    Data ditulis ke downloads/.<nama>.part, sedangkan downloads/.<nama>.part.state
+    menyimpan metadata transfer dan checksum setiap chunk yang sudah terverifikasi.
+    Jika koneksi putus, transfer berikutnya untuk file yang sama dilanjutkan dari
+    chunk terakhir yang valid.
+    """
+
+    def __init__(self, downloads_dir, filename, size, sha256, chunk_size=CHUNK_SIZE):
+        # Create downloads directory if not exists
+        os.makedirs(downloads_dir, exist_ok=True)
+
+        self.filename = safe_relative_path(filename)
+        self.size = size
+        self.sha256 = sha256
+        self.chunk_size = chunk_size
+        self.file_path = os.path.join(downloads_dir, self.filename)
+        # Symlink di dalam downloads/ juga tidak boleh membawa file keluar
+        root = os.path.realpath(downloads_dir)
+        if not os.path.realpath(self.file_path).startswith(root + os.sep):
+            raise TransferError(f"Path tidak aman: {filename}")
+        target_dir, name = os.path.split(self.file_path)
+        os.makedirs(target_dir, exist_ok=True)
+        self.temp_path = os.path.join(target_dir, f".{name}.part")
+        self.state_path = self.temp_path + ".state"
+
+        self.digest = hashlib.sha256()
+        self.offset = 0
+        self.resumed_from = 0
+        self.received = 0
+        self.copied = 0
+        self.started = time.monotonic()
+        # Versi lama file untuk delta sync (lihat delta.py)
+        self.basis = None
+        self.block_size = None
+        self.file = None
+        self.state = None
+
+    @property
+    def resumable(self):
+        """True jika ada file sementara dan state dari transfer sebelumnya"""
+        return os.path.exists(self.state_path) and os.path.exists(self.temp_path)
+
+    def open(self):
+        """Memverifikasi chunk yang sudah ada lalu membuka file sementara dan state
+
+        Verifikasi membaca ulang seluruh file sementara, jadi untuk transfer
+        yang dilanjutkan sebaiknya dipanggil di latar belakang.
+        """
+        self.offset = self._resume_offset()
+        self.resumed_from = self.offset
+
+        # Tanpa buffer Python: chunk ditulis dengan os.pwrite langsung dari buffer penerima
+        self.file = open(self.temp_path, 'r+b' if self.offset else 'wb', buffering=0)
+        self.file.truncate(self.offset)
+        preallocate(self.file, self.size)
+
+        self.state = open(self.state_path, 'a' if self.offset else 'w')
+        if not self.offset:
+            self.state.write(json.dumps(self._metadata()) + "\n")
+            self.state.flush()
+
+    def _metadata(self):
+        return {'size': self.size, 'sha256': self.sha256, 'chunk_size': self.chunk_size}
+
+    def _resume_offset(self):
+        """Membaca file state dan memverifikasi ulang chunk yang sudah ada"""
+        if not self.resumable:
+            return 0
+
+        try:
+            with open(self.state_path) as f:
+                if json.loads(f.readline()) != self._metadata():
+                    return 0
+                checksums = [line.split() for line in f if line.strip()]
+        except (ValueError, OSError):
+            return 0
+
+        offset = 0
+        with open(self.temp_path, 'rb') as part:
+            for chunk_offset, checksum in checksums:
+                data = part.read(self.chunk_size)
+                if (int(chunk_offset) != offset or len(data) != self.chunk_size
+                        or chunk_checksum(data) != int(checksum, 16)):
+                    break
+                self.digest.update(data)
+                offset += len(data)
+
+        if offset < len(checksums) * self.chunk_size:
+            # Tulis ulang state agar hanya berisi chunk yang valid
+            with open(self.state_path, 'w') as f:
+                f.write(json.dumps(self._metadata()) + "\n")
+                for chunk_offset in range(0, offset, self.chunk_size):
+                    f.write(" ".join(checksums[chunk_offset // self.chunk_size]) + "\n")
+        return offset
+
+    def write(self, offset, checksum, data):
+        """Memverifikasi lalu menulis satu chunk"""
+        if offset != self.offset:
+            raise TransferError(f"Chunk tidak berurutan: offset {offset}, harap {self.offset}")
+        if chunk_checksum(data) != checksum:
+            raise TransferError(f"Checksum chunk pada offset {offset} tidak cocok")
+
+        # Data harus sampai di disk sebelum chunk dicatat sebagai terverifikasi
+        write_at(self.file, offset, data)
+        self.digest.update(data)
+        self.offset += len(data)
+        self.received += len(data)
+
+        self.state.write(f"{offset} {checksum:08x}\n")
+        self.state.flush()
+
+    def copy(self, offset, block, count):
+        """Menyalin `count` blok dari file lama ke posisi `offset` file baru"""
+        if self.basis is None:
+            raise TransferError("Tidak ada file lama untuk delta")
+        self.basis.seek(block * self.block_size)
+        remaining = count * self.block_size
+        while remaining:
+            data = self.basis.read(min(self.chunk_size, remaining))
+            if not data:
+                raise TransferError(f"Blok {block} di luar file lama")
+            self.write(offset, chunk_checksum(data), data)
+            offset += len(data)
+            remaining -= len(data)
+            self.copied += len(data)
+
+    def finish(self):
+        """Memeriksa ukuran dan hash lalu memindahkan file ke downloads/
+
+        Hasil delta sync menggantikan file lama secara atomik, jadi versi
+        terbaru selalu menjadi dasar delta berikutnya.
+        """
+        self.close()
+        if self.offset != self.size:
+            raise TransferError(f"Ukuran tidak cocok: {self.offset}/{self.size} bytes")
+        if self.digest.hexdigest() != self.sha256:
+            self.discard()
+            raise TransferError("Hash file tidak cocok, file dibuang")
+
+        if self.basis is None:
+            # File lain dengan nama yang sama tidak ditimpa
+            self.file_path = unique_path(self.file_path)
+        os.replace(self.temp_path, self.file_path)
+        os.remove(self.state_path)
+        return self.file_path
+
+    def close(self):
+        """Menutup file; file sementara dan state disimpan untuk dilanjutkan"""
+        if self.file is not None:
+            self.file.close()
+        if self.state is not None:
+            self.state.close()
+        if self.basis is not None:
+            self.basis.close()
+
+    def discard(self):
+        """Menutup dan menghapus file sementara beserta state-nya"""
+        self.close()
+        for path in (self.temp_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Transport
+Pembuatan socket (bind, accept, connect) untuk RFCOMM, TCP dan Unix socket
+Author: Terminal Chat Bluetooth
+"""
+
+import os
+import socket
+import tempfile
+
+DEFAULT_TRANSPORT = 'rfcomm'
+# Batas data yang belum terkirim di buffer kernel: urutan prioritas writer (chat
+# sebelum chunk file) hanya berlaku untuk data yang belum masuk buffer kernel
+TCP_NOTSENT_LOWAT = 128 * 1024
+RFCOMM_SEND_BUFFER = 64 * 1024
+
+
+class Transport:
+    """Antarmuka transport: membuat socket server dan client"""
+
+    name = None
+    label = None
+    default_port = None
+    default_address = None
+
+    def listen(self, port=None, backlog=1, address=None):
+        """Membuat socket server yang sudah bind dan listen"""
+        raise NotImplementedError
+
+    def connect(self, address=None, port=None):
+        """Membuat socket yang terhubung ke server"""
+        raise NotImplementedError
+
+    def configure(self, sock):
+        """Mengatur opsi socket yang baru terhubung (hasil accept atau connect)"""
+        return sock
+
+    def describe(self, address=None, port=None):
+        """Deskripsi alamat untuk ditampilkan ke pengguna"""
+        return f"port {self.port(port)}"
+
+    def port(self, port=None):
+        return self.default_port if port is None else port
+
+    def discover_devices(self):
+        """Daftar (alamat, nama) perangkat yang bisa dihubungi"""
+        return []
+
+    def cleanup(self):
+        """Membersihkan resource transport setelah server berhenti"""
+
+
+class RfcommTransport(Transport):
+    """Bluetooth RFCOMM lewat PyBluez (default)"""
+
+    name = 'rfcomm'
+    label = "Bluetooth"
+    default_port = 3
+
+    @staticmethod
+    def _bluetooth():
+        import bluetooth
+        return bluetooth
+
+    def listen(self, port=None, backlog=1, address=None):
+        bluetooth = self._bluetooth()
+        sock = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
+        sock.bind(("", self.port(port)))
+        sock.listen(backlog)
+        return sock
+
+    def connect(self, address=None, port=None):
+        bluetooth = self._bluetooth()
+        sock = bluetooth.BluetoothSocket(bluetooth.RFCOMM)
+        sock.connect((address, self.port(port)))
+        return self.configure(sock)
+
+    def configure(self, sock):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, RFCOMM_SEND_BUFFER)
+        except (OSError, AttributeError):
+            # Stack Bluetooth tanpa dukungan opsi ini; buffer bawaan dipakai
+            pass
+        return sock
+
+    def discover_devices(self, duration=8):
+        return self._bluetooth().discover_devices(duration=duration, lookup_names=True)
+
+
+class TcpTransport(Transport):
+    """TCP, untuk pengujian dan profiling tanpa adaptor Bluetooth"""
+
+    name = 'tcp'
+    label = "TCP"
+    default_port = 5003
+    default_address = '127.0.0.1'
+
+    def listen(self, port=None, backlog=1, address=None):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((address or self.default_address, self.port(port)))
+        sock.listen(backlog)
+        return sock
+
+    def connect(self, address=None, port=None):
+        sock = socket.create_connection((address or self.default_address, self.port(port)))
+        return self.configure(sock)
+
+    def configure(self, sock):
+        # Frame kecil (chat) langsung dikirim, tidak ditahan algoritma Nagle
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if hasattr(socket, 'TCP_NOTSENT_LOWAT'):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NOTSENT_LOWAT, TCP_NOTSENT_LOWAT)
+        return sock
+
+    def describe(self, address=None, port=None):
+        return f"{address or self.default_address}:{self.port(port)}"
+
+
+class UnixTransport(Transport):
+    """Unix domain socket, transport lokal paling cepat"""
+
+    name = 'unix'
+    label = "Unix socket"
+    default_address = os.path.join(tempfile.gettempdir(), "bluetooth-chat.sock")
+
+    def __init__(self):
+        self.bound_path = None
+
+    def _path(self, address, port):
+        path = address or self.default_address
+        # Port dipakai sebagai akhiran agar beberapa server bisa jalan bersamaan
+        return f"{path}.{port}" if port is not None else path
+
+    def listen(self, port=None, backlog=1, address=None):
+        path = self._path(address, port)
+        if os.path.exists(path):
+            os.remove(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        sock.listen(backlog)
+        self.bound_path = path
+        return sock
+
+    def connect(self, address=None, port=None):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self._path(address, port))
+        return sock
+
+    def describe(self, address=None, port=None):
+        return self._path(address, port)
+
+    def cleanup(self):
+        if self.bound_path and os.path.exists(self.bound_path):
+            os.remove(self.bound_path)
+        self.bound_path = None
+
+
+TRANSPORTS = {
+    RfcommTransport.name: RfcommTransport,
+    TcpTransport.name: TcpTransport,
+}
+if hasattr(socket, 'AF_UNIX'):
+    TRANSPORTS[UnixTransport.name] = UnixTransport
+
+
+def get_transport(name=DEFAULT_TRANSPORT):
+    """Membuat transport berdasarkan namanya"""
+    try:
+        return TRANSPORTS[name]()
+    except KeyError:
+        raise ValueError(f"Transport tidak dikenal: {name}")
+
+
+def add_transport_arguments(parser, address_help):
+    """Menambahkan opsi transport, alamat dan port"""
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS), default=DEFAULT_TRANSPORT,
+                        help=f"Transport koneksi (default: {DEFAULT_TRANSPORT})")
+    parser.add_argument('--addr', default=None, help=address_help)
+    parser.add_argument('--port', type=int, default=None,
+                        help="Port (default: 3 untuk RFCOMM, 5003 untuk TCP)")
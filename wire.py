@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Bluetooth Chat Application - Wire Format
+Format pesan di jalur: JSON (kompatibel dengan versi lama) atau biner ringkas
+Author: Terminal Chat Bluetooth
+"""
+
+import base64
+import json
+import struct
+import time
+from datetime import datetime
+
+# Versi format pesan, disepakati lewat hello: kedua sisi memakai versi
+# tertinggi yang didukung keduanya. Peer lama tanpa field 'wire' berarti JSON.
+WIRE_JSON = 0
+WIRE_BINARY = 1
+WIRE_VERSION = WIRE_BINARY
+WIRE_NAMES = {'json': WIRE_JSON, 'binary': WIRE_BINARY}
+
+# Payload biner: kode tipe (1 byte), timestamp milidetik sejak epoch (8 byte,
+# 0 jika pesan tidak punya timestamp), lalu field sampai akhir payload
+MESSAGE_HEADER = struct.Struct('!Bq')
+# Satu field: kode nama field (1 byte, 0 berarti nama ditulis sebagai string) lalu nilai bertag
+TAG = struct.Struct('!B')
+KEY_TAG = struct.Struct('!BB')
+# Tag nilai diikuti panjang/isi sesuai tipenya
+INT32 = struct.Struct('!Bi')
+INT64 = struct.Struct('!Bq')
+FLOAT = struct.Struct('!Bd')
+SIZED = struct.Struct('!BI')
+
+TAG_NONE = 0
+TAG_FALSE = 1
+TAG_TRUE = 2
+TAG_INT32 = 3
+TAG_INT64 = 4
+TAG_FLOAT = 5
+TAG_STR = 6
+TAG_BYTES = 7
+TAG_LIST = 8
+TAG_DICT = 9
+
+# Kode hanya boleh ditambah di akhir; kode yang sudah dipakai tidak boleh diubah
+MESSAGE_TYPES = ('hello', 'ack', 'ping', 'pong', 'text', 'file_offer', 'file_accept',
+                 'file_reject', 'file_delta', 'file_have', 'file_copy', 'file_end',
+                 'file_abort', 'dir_offer', 'dir_end', 'disconnect')
+FIELDS = ('type', 'content', 'sender', 'seq', 'transfer_id', 'filename', 'size', 'sha256',
+          'chunk_size', 'offset', 'reason', 'block_size', 'signatures', 'block', 'count',
+          'id', 'sent', 'compression', 'heartbeat', 'dedup', 'delta', 'session',
+          'peer_session', 'received', 'dir_id', 'name', 'files', 'wire')
+
+TYPE_CODES = {name: code for code, name in enumerate(MESSAGE_TYPES, 1)}
+FIELD_CODES = {name: code for code, name in enumerate(FIELDS, 1)}
+INT32_MIN = -2 ** 31
+INT32_MAX = 2 ** 31 - 1
+
+
+class WireError(ValueError):
+    """Payload pesan biner tidak valid"""
+
+
+def timestamp_now():
+    """Timestamp pesan: milidetik sejak epoch"""
+    return time.time_ns() // 1_000_000
+
+
+def timestamp_ms(timestamp):
+    """Timestamp pesan (int milidetik atau string ISO dari peer/journal lama) sebagai int"""
+    if timestamp is None:
+        return 0
+    if isinstance(timestamp, str):
+        return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+    return timestamp
+
+
+def _json_default(value):
+    # Field biner mentah (mis. signature delta) dikirim sebagai base64 untuk peer JSON
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode('ascii')
+    raise TypeError(f"Tipe tidak bisa di-encode: {type(value).__name__}")
+
+
+def encode_json(message):
+    """Payload JSON; timestamp integer diubah ke string ISO seperti versi lama"""
+    timestamp = message.get('timestamp')
+    if type(timestamp) is int:
+        iso = datetime.fromtimestamp(timestamp / 1000).isoformat()
+        message = dict(message, timestamp=iso)
+    return json.dumps(message, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def decode_json(payload):
+    return json.loads(payload)
+
+
+def _encode_value(value, parts):
+    kind = type(value)
+    if kind is str:
+        data = value.encode('utf-8')
+        parts.append(SIZED.pack(TAG_STR, len(data)))
+        parts.append(data)
+    elif kind is int:
+        if INT32_MIN <= value <= INT32_MAX:
+            parts.append(INT32.pack(TAG_INT32, value))
+        else:
+            parts.append(INT64.pack(TAG_INT64, value))
+    elif kind is bool:
+        parts.append(TAG.pack(TAG_TRUE if value else TAG_FALSE))
+    elif value is None:
+        parts.append(TAG.pack(TAG_NONE))
+    elif kind is float:
+        parts.append(FLOAT.pack(TAG_FLOAT, value))
+    elif kind in (bytes, bytearray, memoryview):
+        parts.append(SIZED.pack(TAG_BYTES, len(value)))
+        parts.append(value)
+    elif kind in (list, tuple):
+        parts.append(SIZED.pack(TAG_LIST, len(value)))
+        for item in value:
+            _encode_value(item, parts)
+    elif kind is dict:
+        parts.append(SIZED.pack(TAG_DICT, len(value)))
+        for key, item in value.items():
+            _encode_value(key, parts)
+            _encode_value(item, parts)
+    else:
+        raise TypeError(f"Tipe tidak bisa di-encode: {kind.__name__}")
+
+
+def encode_binary(message):
+    """Payload biner: header struct, lalu setiap field dengan kode nama dan nilai bertag"""
+    type_code = TYPE_CODES.get(message.get('type'), 0)
+    parts = [MESSAGE_HEADER.pack(type_code, timestamp_ms(message.get('timestamp')))]
+    for key, value in message.items():
+        if key == 'timestamp' or (key == 'type' and type_code):
+            continue
+        code = FIELD_CODES.get(key)
+        if code is None:
+            parts.append(TAG.pack(0))
+            _encode_value(key, parts)
+        else:
+            parts.append(TAG.pack(code))
+        _encode_value(value, parts)
+    return b''.join(parts)
+
+
+def _decode_value(data, position):
+    """(nilai, posisi setelah nilai) dari nilai bertag di `position`"""
+    tag = data[position]
+    position += 1
+    if tag == TAG_STR or tag == TAG_BYTES:
+        size, = struct.unpack_from('!I', data, position)
+        position += 4
+        end = position + size
+        if end > len(data):
+            raise WireError("Field terpotong")
+        value = data[position:end]
+        return (str(value, 'utf-8') if tag == TAG_STR else bytes(value)), end
+    if tag == TAG_INT32:
+        return struct.unpack_from('!i', data, position)[0], position + 4
+    if tag == TAG_INT64:
+        return struct.unpack_from('!q', data, position)[0], position + 8
+    if tag == TAG_TRUE:
+        return True, position
+    if tag == TAG_FALSE:
+        return False, position
+    if tag == TAG_NONE:
+        return None, position
+    if tag == TAG_FLOAT:
+        return struct.unpack_from('!d', data, position)[0], position + 8
+    if tag == TAG_LIST:
+        count, = struct.unpack_from('!I', data, position)
+        position += 4
+        items = []
+        for _ in range(count):
+            item, position = _decode_value(data, position)
+            items.append(item)
+        return items, position
+    if tag == TAG_DICT:
+        count, = struct.unpack_from('!I', data, position)
+        position += 4
+        items = {}
+        for _ in range(count):
+            key, position = _decode_value(data, position)
+            items[key], position = _decode_value(data, position)
+        return items, position
+    raise WireError(f"Tag nilai tidak dikenal: {tag}")
+
+
+def decode_binary(payload):
+    """Dict pesan dari payload biner; timestamp tetap integer milidetik"""
+    try:
+        type_code, timestamp = MESSAGE_HEADER.unpack_from(payload)
+        message = {}
+        if type_code:
+            message['type'] = MESSAGE_TYPES[type_code - 1]
+        if timestamp:
+            message['timestamp'] = timestamp
+        position = MESSAGE_HEADER.size
+        end = len(payload)
+        while position < end:
+            code = payload[position]
+            position += 1
+            if code:
+                key = FIELDS[code - 1]
+            else:
+                key, position = _decode_value(payload, position)
+            message[key], position = _decode_value(payload, position)
+        return message
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise WireError(f"Pesan biner tidak valid: {e}") from e
+
+
+def negotiate(own, peer_hello):
+    """Versi format yang dipakai untuk mengirim ke peer setelah hello-nya diterima"""
+    return min(own, peer_hello.get('wire', WIRE_JSON))